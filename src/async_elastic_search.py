@@ -0,0 +1,99 @@
+import logging
+from collections.abc import Iterable
+from itertools import batched
+from typing import Any
+
+from src.bulk import AsyncBulkIndexer, BulkAction, BulkStats
+from src.cache import get_result_cache
+from src.config import get_search_body
+from src.constants import MSEARCH_BATCH_SIZE
+from src.elastic_search import (
+    EmbeddingLookup,
+    build_msearch_body,
+    get_index_body,
+    parse_msearch_response,
+    prepare_document,
+)
+from src.es_client import get_async_client
+
+
+async def create_index(index_name: str) -> None:
+    """Асинхронное создание индекса в Elasticsearch"""
+    es = get_async_client()
+    if not await es.indices.exists(index=index_name):
+        await es.indices.create(index=index_name, body=get_index_body())
+        logging.info('Индекс создан.')
+    else:
+        logging.warning('Индекс уже существует. Пропускаем создание.')
+
+
+async def index_internships(
+    json_data: Iterable[dict],
+    index_name: str,
+    embedding_store: EmbeddingLookup | None = None,
+) -> BulkStats:
+    """Асинхронное индексирование данных о стажировках через _bulk API"""
+    actions = (
+        BulkAction(
+            'index',
+            internship['uuid'],
+            prepare_document(internship, embedding_store=embedding_store),
+        )
+        for internship in json_data
+    )
+    stats = await AsyncBulkIndexer(get_async_client(), index_name).run(
+        actions,
+    )
+    get_result_cache().invalidate()
+    return stats
+
+
+async def search_internships(
+    query: str,
+    index_name: str,
+    size: int = 10,
+) -> list[dict[str, Any]]:
+    """
+    Асинхронный поиск стажировок с тем же телом запроса,
+    что и в синхронной версии
+    """
+    result_cache = get_result_cache()
+    key = result_cache.make_key('elastic', index_name, query, size)
+    cached = result_cache.get(key)
+    if cached is not None:
+        return cached
+
+    body = get_search_body(query)
+    body['size'] = size
+    response = await get_async_client().search(index=index_name, body=body)
+    hits = response['hits']['hits']
+
+    result_cache.set(key, hits)
+    return hits
+
+
+async def search_internships_many(
+    queries: list[str],
+    index_name: str,
+    size: int = 10,
+) -> list[list[dict[str, Any]]]:
+    """Асинхронный поиск по нескольким запросам через _msearch"""
+    result_cache = get_result_cache()
+    keys = [
+        result_cache.make_key('elastic', index_name, query, size)
+        for query in queries
+    ]
+    results = [result_cache.get(key) for key in keys]
+    missing = [idx for idx, hits in enumerate(results) if hits is None]
+
+    for batch in batched(missing, MSEARCH_BATCH_SIZE):
+        batch_queries = tuple(queries[idx] for idx in batch)
+        response = await get_async_client().msearch(
+            searches=build_msearch_body(batch_queries, index_name, size),
+        )
+        batch_results = parse_msearch_response(batch_queries, response)
+        for idx, hits in zip(batch, batch_results, strict=True):
+            result_cache.set(keys[idx], hits)
+            results[idx] = hits
+
+    return results
@@ -0,0 +1,146 @@
+"""
+Сравнение реализаций JSON на сохраненных результатах парсера
+(по умолчанию - файл, который возвращает resolve_documents_path):
+разбор JSON Lines построчно и всех документов одним JSON-массивом.
+
+Запуск: python -m src.bench.json_backends [путь до результатов парсера]
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from collections.abc import Callable
+
+from src.schema import decode_publications, msgspec
+from src.serialization import available_backends
+from src.storage import open_text, resolve_documents_path
+
+
+def _best_time(func: Callable[[], object], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark(path: str, repeat: int = 5) -> list[dict[str, float | str]]:
+    """
+    Время разбора и сериализации всех документов каждой реализацией.
+
+    Args:
+        path: Файл с результатами парсера (JSON Lines)
+        repeat: Количество повторов, берется лучшее время
+
+    Returns:
+        Строки отчета по реализациям
+    """
+    with open_text(path, 'r') as f:
+        lines = [line.encode() for line in f if line.strip()]
+    size_mb = sum(map(len, lines)) / 2**20
+
+    report = []
+    for name, backend in available_backends().items():
+        documents = [backend.loads(line) for line in lines]
+        decode = _best_time(
+            lambda backend=backend: [backend.loads(line) for line in lines],
+            repeat,
+        )
+        encode = _best_time(
+            lambda backend=backend: [backend.dumps(doc) for doc in documents],
+            repeat,
+        )
+        report.append({
+            'backend': name,
+            'decode_ms': decode * 1000,
+            'encode_ms': encode * 1000,
+            'decode_mb_s': size_mb / decode,
+        })
+    return report
+
+
+def _read_array(path: str) -> bytes:
+    """Все документы файла одним JSON-массивом"""
+    if path.endswith('.json'):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    with open_text(path, 'r') as f:
+        lines = [line.strip().encode() for line in f if line.strip()]
+    return b'[' + b','.join(lines) + b']'
+
+
+def benchmark_artifact(
+    path: str,
+    repeat: int = 5,
+) -> list[dict[str, float | str]]:
+    """
+    Время разбора и сериализации всех документов одним JSON-массивом.
+
+    Кроме реализаций JSON замеряется разбор по схеме Publication
+    (decode_publications), если установлен msgspec.
+
+    Args:
+        path: Файл с результатами парсера (JSON Lines или JSON-массив)
+        repeat: Количество повторов, берется лучшее время
+
+    Returns:
+        Строки отчета по реализациям
+    """
+    body = _read_array(path)
+    size_mb = len(body) / 2**20
+
+    report = []
+    for name, backend in available_backends().items():
+        documents = backend.loads(body)
+        decode = _best_time(lambda backend=backend: backend.loads(body), repeat)
+        encode = _best_time(
+            lambda backend=backend: backend.dumps(documents),
+            repeat,
+        )
+        report.append({
+            'backend': name,
+            'decode_ms': decode * 1000,
+            'encode_ms': encode * 1000,
+            'decode_mb_s': size_mb / decode,
+        })
+
+    if msgspec is not None:
+        decode = _best_time(lambda: decode_publications(body), repeat)
+        report.append({
+            'backend': 'schema',
+            'decode_ms': decode * 1000,
+            'encode_ms': float('nan'),
+            'decode_mb_s': size_mb / decode,
+        })
+    return report
+
+
+def _print_report(title: str, report: list[dict[str, float | str]]) -> None:
+    print(title)
+    print(f'{"backend":<10}{"decode, ms":>12}{"encode, ms":>12}{"MB/s":>10}')
+    for row in report:
+        print(
+            f'{row["backend"]:<10}{row["decode_ms"]:>12.1f}'
+            f'{row["encode_ms"]:>12.1f}{row["decode_mb_s"]:>10.1f}',
+        )
+
+
+if __name__ == '__main__':
+    documents_path = (
+        sys.argv[1] if len(sys.argv) > 1 else resolve_documents_path()
+    )
+    if documents_path is None:
+        sys.exit('Результаты парсера не найдены, сначала запустите main.py')
+
+    if not documents_path.endswith('.json'):
+        _print_report(
+            f'{documents_path} (JSON Lines)',
+            benchmark(documents_path),
+        )
+    _print_report(
+        f'{documents_path} (JSON-массив)',
+        benchmark_artifact(documents_path),
+    )
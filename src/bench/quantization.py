@@ -0,0 +1,188 @@
+"""
+Сравнение int8-квантованной модели BERT с исходной.
+
+Кандидаты по EVALUATION_QUERIES запрашиваются из Elasticsearch один раз
+так же, как в main.py: гибридным поиском, если хранилище эмбеддингов
+документов из EMBEDDING_STORE_DIR построено моделью, выбранной
+BERT_QUANTIZED_INFERENCE, иначе - по BM25. Затем одни и те же кандидаты
+переранжируются обеими моделями на CPU без хранилища эмбеддингов, так
+что обе модели кодируют все документы и разница в NDCG, Precision
+и времени переранжирования определяется только квантованием.
+
+Запуск: python -m src.bench.quantization <путь до веса модели>
+"""
+
+from __future__ import annotations
+
+import statistics
+import sys
+import time
+from typing import Any
+
+import torch
+
+from src.bert.embedding_store import DocumentEmbeddingStore, model_fingerprint
+from src.bert.model import BERTSearchEngine
+from src.constants import (
+    BERT_QUANTIZED_INFERENCE,
+    EMBEDDING_STORE_DIR,
+    EVALUATION_QUERIES,
+    INDEX_NAME,
+)
+from src.eval.evaluate import SearchEvaluator
+
+# Допустимое падение среднего NDCG квантованной модели
+NDCG_TOLERANCE = 0.01
+
+
+def _make_engine(checkpoint_path: str, quantized: bool) -> BERTSearchEngine:
+    engine = BERTSearchEngine(
+        model=BERTSearchEngine.serialize_model_from_checkpoint(
+            checkpoint_path,
+            quantized=quantized,
+        ),
+        use_cache=False,
+        quantized=quantized,
+    )
+    # Обе модели сравниваются на CPU
+    engine.device = torch.device('cpu')
+    engine.model.cpu()
+    return engine
+
+
+def retrieve_candidates(
+    engines: dict[str, BERTSearchEngine],
+    checkpoint_path: str,
+    elastic_size: int = 50,
+    embedding_store_dir: str = EMBEDDING_STORE_DIR,
+) -> tuple[str, list[list[dict[str, Any]]]]:
+    """
+    Кандидаты по EVALUATION_QUERIES, найденные так же, как в main.py.
+
+    Args:
+        engines: Модели сравнения ('fp32' и 'int8')
+        checkpoint_path: Путь до чекпоинта дообученной модели
+        elastic_size: Количество кандидатов на запрос
+        embedding_store_dir: Каталог хранилища эмбеддингов документов
+
+    Returns:
+        Способ поиска кандидатов ('bm25' или 'hybrid') и кандидаты
+        по каждому запросу
+    """
+    embedding_store = DocumentEmbeddingStore.open(embedding_store_dir)
+    # Хранилище, построенное другой моделью, не используется (см. main.py)
+    fingerprint = model_fingerprint(
+        checkpoint_path,
+        quantized=BERT_QUANTIZED_INFERENCE,
+    )
+    if (
+        embedding_store is not None
+        and embedding_store.fingerprint != fingerprint
+    ):
+        embedding_store = None
+
+    # Запросы для kNN кодирует модель, которой построено хранилище
+    retriever = BERTSearchEngine(
+        model=engines['int8' if BERT_QUANTIZED_INFERENCE else 'fp32'].model,
+        use_cache=False,
+        embedding_store=embedding_store,
+        quantized=BERT_QUANTIZED_INFERENCE,
+        retrieval_mode='hybrid' if embedding_store is not None else 'bm25',
+    )
+    # Модель общая с переранжированием и должна остаться на CPU
+    retriever.device = torch.device('cpu')
+    retriever.model.cpu()
+    return retriever.retrieval_mode, retriever.retrieve_candidates(
+        EVALUATION_QUERIES,
+        INDEX_NAME,
+        size=elastic_size,
+    )
+
+
+def _rerank_all(
+    engine: BERTSearchEngine,
+    queries: list[str],
+    candidates: list[list[dict[str, Any]]],
+    rerank_size: int,
+) -> tuple[dict[str, list[dict[str, Any]]], list[float]]:
+    results = {}
+    latencies = []
+    for query, hits in zip(queries, candidates, strict=True):
+        start = time.perf_counter()
+        results[query] = engine.rerank_results(
+            query,
+            [dict(hit) for hit in hits],
+            top_n=rerank_size,
+        )
+        latencies.append(time.perf_counter() - start)
+    return results, latencies
+
+
+def benchmark(
+    engines: dict[str, BERTSearchEngine],
+    candidates: list[list[dict[str, Any]]],
+    rerank_size: int = 10,
+) -> dict[str, dict[str, float]]:
+    """
+    Качество и время переранжирования одних и тех же кандидатов
+    исходной и квантованной моделью.
+
+    Args:
+        engines: Модели сравнения без хранилища эмбеддингов документов
+        candidates: Кандидаты по каждому запросу EVALUATION_QUERIES
+        rerank_size: Количество результатов после переранжирования
+
+    Returns:
+        Метрики по моделям: avg_ndcg, avg_precision, p50_ms, p95_ms
+    """
+    report = {}
+    for name, engine in engines.items():
+        # Прогрев: первые вызовы включают инициализацию ядер
+        _rerank_all(engine, EVALUATION_QUERIES[:1], candidates[:1], rerank_size)
+
+        results, latencies = _rerank_all(
+            engine,
+            EVALUATION_QUERIES,
+            candidates,
+            rerank_size,
+        )
+        evaluations = SearchEvaluator.evaluate_multiple_queries(results)
+        latencies_ms = sorted(seconds * 1000 for seconds in latencies)
+        report[name] = {
+            'avg_ndcg': evaluations['avg_ndcg'],
+            'avg_precision': evaluations['avg_precision'],
+            'p50_ms': statistics.median(latencies_ms),
+            'p95_ms': latencies_ms[
+                min(len(latencies_ms) - 1, int(len(latencies_ms) * 0.95))
+            ],
+        }
+
+    return report
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit('Использование: python -m src.bench.quantization <чекпоинт>')
+
+    engines = {
+        'fp32': _make_engine(sys.argv[1], quantized=False),
+        'int8': _make_engine(sys.argv[1], quantized=True),
+    }
+    retrieval_mode, candidates = retrieve_candidates(engines, sys.argv[1])
+    print(f'Кандидаты: {retrieval_mode}, одни и те же для обеих моделей')
+
+    report = benchmark(engines, candidates)
+    for name, metrics in report.items():
+        print(
+            f'{name:<6}'
+            f'NDCG {metrics["avg_ndcg"]:.4f}  '
+            f'Precision {metrics["avg_precision"]:.4f}  '
+            f'p50 {metrics["p50_ms"]:>8.1f} ms  '
+            f'p95 {metrics["p95_ms"]:>8.1f} ms',
+        )
+
+    ndcg_drop = report['fp32']['avg_ndcg'] - report['int8']['avg_ndcg']
+    speedup = report['fp32']['p50_ms'] / report['int8']['p50_ms']
+    print(f'Падение NDCG: {ndcg_drop:.4f}, ускорение p50: {speedup:.2f}x')
+    if ndcg_drop > NDCG_TOLERANCE:
+        sys.exit(f'NDCG квантованной модели ниже более чем на {NDCG_TOLERANCE}')
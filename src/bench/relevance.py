@@ -0,0 +1,89 @@
+"""
+Сравнение пакетной оценки релевантности с RelevanceCalculator.
+
+Каждый запрос EVALUATION_QUERIES оценивается против всех сохраненных
+стажировок: сначала проверяется совпадение оценок, затем замеряется
+время обеих реализаций.
+
+Запуск: python -m src.bench.relevance [путь до результатов]
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from typing import Any
+
+from src.constants import EVALUATION_QUERIES
+from src.eval.batch_relevance import BatchRelevanceLabeller, check_parity
+from src.eval.relevance_calculator import RelevanceCalculator
+from src.features import with_features
+from src.storage import iter_documents, resolve_documents_path
+
+
+def _queries_results(path: str) -> dict[str, list[dict[str, Any]]]:
+    results = [
+        {'_id': document['uuid'], '_source': with_features(document)}
+        for document in iter_documents(path)
+    ]
+    return {query: results for query in EVALUATION_QUERIES}
+
+
+def benchmark(
+    queries_results: dict[str, list[dict[str, Any]]],
+    repeat: int = 3,
+) -> dict[str, float]:
+    """
+    Время оценки всех пар (запрос, документ) каждой реализацией.
+
+    Args:
+        queries_results: Результаты поиска по запросам
+        repeat: Количество повторов, берется лучшее время
+
+    Returns:
+        Лучшее время в миллисекундах по реализациям
+    """
+    best = {
+        'RelevanceCalculator': float('inf'),
+        'BatchRelevanceLabeller': float('inf'),
+    }
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for query, results in queries_results.items():
+            for result in results:
+                RelevanceCalculator.calculate_relevance(query, result)
+        best['RelevanceCalculator'] = min(
+            best['RelevanceCalculator'],
+            time.perf_counter() - start,
+        )
+
+        # Признаки документов каждый раз вычисляются заново
+        start = time.perf_counter()
+        BatchRelevanceLabeller().label_results(queries_results)
+        best['BatchRelevanceLabeller'] = min(
+            best['BatchRelevanceLabeller'],
+            time.perf_counter() - start,
+        )
+
+    return {name: seconds * 1000 for name, seconds in best.items()}
+
+
+if __name__ == '__main__':
+    documents_path = (
+        sys.argv[1] if len(sys.argv) > 1 else resolve_documents_path()
+    )
+    if documents_path is None:
+        sys.exit('Результаты парсера не найдены, сначала запустите main.py')
+
+    queries_results = _queries_results(documents_path)
+
+    mismatches = check_parity(queries_results)
+    for query, document_id, expected, actual in mismatches[:10]:
+        print(f'{query!r} {document_id}: {expected} != {actual}')
+    if mismatches:
+        sys.exit(f'Оценки расходятся для {len(mismatches)} пар')
+
+    pairs = sum(len(results) for results in queries_results.values())
+    print(f'Оценки совпадают для {pairs} пар')
+    for name, milliseconds in benchmark(queries_results).items():
+        print(f'{name:<25}{milliseconds:>10.1f} ms')
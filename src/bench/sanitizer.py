@@ -0,0 +1,65 @@
+"""
+Сравнение очистки документов: sanitize_document против remove_bad_words.
+
+Запуск: python -m src.bench.sanitizer [путь до результатов]
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+
+from src.constants import BAD_WORDS
+from src.sanitizer import sanitize_document
+from src.serialization import dumps, loads
+from src.storage import iter_documents, resolve_documents_path
+from src.utils import remove_bad_words
+
+
+def benchmark(path: str, repeat: int = 5) -> dict[str, float]:
+    """
+    Время очистки всех документов каждой реализацией.
+
+    Обе функции получают свежую копию документов, копирование
+    в замер не входит.
+
+    Args:
+        path: Файл с результатами парсера
+        repeat: Количество повторов, берется лучшее время
+
+    Returns:
+        Лучшее время в миллисекундах по реализациям
+    """
+    serialized = [dumps(document) for document in iter_documents(path)]
+
+    best = {'remove_bad_words': float('inf'), 'sanitize_document': float('inf')}
+    for _ in range(repeat):
+        documents = [loads(line) for line in serialized]
+        start = time.perf_counter()
+        remove_bad_words(documents, BAD_WORDS)
+        best['remove_bad_words'] = min(
+            best['remove_bad_words'],
+            time.perf_counter() - start,
+        )
+
+        documents = [loads(line) for line in serialized]
+        start = time.perf_counter()
+        for document in documents:
+            sanitize_document(document)
+        best['sanitize_document'] = min(
+            best['sanitize_document'],
+            time.perf_counter() - start,
+        )
+
+    return {name: seconds * 1000 for name, seconds in best.items()}
+
+
+if __name__ == '__main__':
+    documents_path = (
+        sys.argv[1] if len(sys.argv) > 1 else resolve_documents_path()
+    )
+    if documents_path is None:
+        sys.exit('Результаты парсера не найдены, сначала запустите main.py')
+
+    for name, milliseconds in benchmark(documents_path).items():
+        print(f'{name:<20}{milliseconds:>10.1f} ms')
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import random
+from collections.abc import Iterator
+
+import numpy as np
+from torch.utils.data import Sampler
+
+
+def token_budget_batches(
+    lengths: np.ndarray,
+    max_tokens: int,
+    max_batch_size: int | None = None,
+) -> list[list[int]]:
+    """
+    Разбиение примеров на пачки по длине с ограничением на число токенов.
+
+    Примеры сортируются по длине, и соседние объединяются в пачку, пока
+    размер пачки после дополнения (количество примеров, умноженное
+    на длину самого длинного) не превышает max_tokens. Пачка всегда
+    содержит хотя бы один пример.
+
+    Args:
+        lengths: Длины примеров, shape (n,). Если пример состоит из
+            нескольких последовательностей, дополняемых отдельно
+            (запрос и документ), - shape (n, k)
+        max_tokens: Максимальное количество токенов в пачке
+        max_batch_size: Максимальное количество примеров в пачке
+
+    Returns:
+        Номера примеров каждой пачки
+    """
+    lengths = np.asarray(lengths, dtype=np.int64)
+    if lengths.ndim == 1:
+        lengths = lengths[:, None]
+
+    order = np.argsort(lengths.sum(axis=1), kind='stable')
+
+    batches = []
+    batch: list[int] = []
+    batch_max = np.zeros(lengths.shape[1], dtype=np.int64)
+    for idx in order.tolist():
+        new_max = np.maximum(batch_max, lengths[idx])
+        if batch and (
+            (len(batch) + 1) * int(new_max.sum()) > max_tokens
+            or (max_batch_size is not None and len(batch) >= max_batch_size)
+        ):
+            batches.append(batch)
+            batch = []
+            new_max = lengths[idx].copy()
+        batch.append(idx)
+        batch_max = new_max
+
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class LengthBucketSampler(Sampler[list[int]]):
+    """
+    Сэмплер пачек для DataLoader(batch_sampler=...), группирующий
+    примеры близкой длины (см. token_budget_batches).
+
+    При shuffle=True примеры каждую эпоху перемешиваются и делятся
+    на группы по bucket_size, пачки строятся внутри групп, а затем
+    перемешиваются. Так пачки остаются случайными, а дополнение -
+    небольшим.
+    """
+
+    def __init__(
+        self,
+        lengths: np.ndarray,
+        max_tokens: int,
+        max_batch_size: int | None = None,
+        shuffle: bool = True,
+        bucket_size: int = 1024,
+        seed: int = 42,
+    ) -> None:
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.max_tokens = max_tokens
+        self.max_batch_size = max_batch_size
+        self.shuffle = shuffle
+        self.bucket_size = bucket_size
+        self.random = random.Random(seed)
+        self.batches = self._make_batches()
+        self._iterated = False
+
+    def _make_batches(self) -> list[list[int]]:
+        if not self.shuffle:
+            return token_budget_batches(
+                self.lengths,
+                self.max_tokens,
+                self.max_batch_size,
+            )
+
+        indices = list(range(len(self.lengths)))
+        self.random.shuffle(indices)
+
+        batches = []
+        for start in range(0, len(indices), self.bucket_size):
+            bucket = np.array(indices[start : start + self.bucket_size])
+            batches.extend(
+                bucket[batch].tolist()
+                for batch in token_budget_batches(
+                    self.lengths[bucket],
+                    self.max_tokens,
+                    self.max_batch_size,
+                )
+            )
+        self.random.shuffle(batches)
+        return batches
+
+    def __iter__(self) -> Iterator[list[int]]:
+        # Каждая следующая эпоха строит пачки из новой перестановки
+        if self.shuffle and self._iterated:
+            self.batches = self._make_batches()
+        self._iterated = True
+        return iter(self.batches)
+
+    def __len__(self) -> int:
+        return len(self.batches)
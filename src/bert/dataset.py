@@ -1,62 +1,143 @@
 
+import numpy as np
 import torch
 from torch.utils.data import Dataset
 
-from src.constants import EVALUATION_QUERIES, INDEX_NAME
-from src.elastic_search import search_internships
-from src.eval.relevance_calculator import (
-    RelevanceCalculator,
-    calculate_result_relevance,
+from src.bert.token_store import TokenStore
+from src.constants import (
+    BERT_MAX_LENGTH,
+    EVALUATION_QUERIES,
+    INDEX_NAME,
+    TOKEN_STORE_DIR,
 )
+from src.elastic_search import search_internships_many
+from src.eval.batch_relevance import BatchRelevanceLabeller
+from src.features import get_features
 
 
 class InternshipDataset(Dataset):
+    """
+    Пары (запрос, документ) с оценкой релевантности.
+
+    Уникальные запросы и документы токенизируются один раз
+    и хранятся в TokenStore, поэтому __getitem__ только берет срезы
+    токенов. Последовательности не дополняются до max_length:
+    пачки собираются через pad_collate.
+    """
+
     def __init__(
         self,
-        queries,
-        texts,
-        labels,
+        queries: list[str],
+        texts: list[str],
+        labels: list[float],
         tokenizer,
-        max_length: int = 512,
+        cache_name: str,
+        max_length: int = BERT_MAX_LENGTH,
+        cache_dir: str = TOKEN_STORE_DIR,
     ) -> None:
-        self.queries = queries
-        self.texts = texts
         self.labels = labels
-        self.tokenizer = tokenizer
-        self.max_length = max_length
+        self.pad_token_id = tokenizer.pad_token_id
+
+        # Номер каждого запроса и документа среди уникальных текстов
+        unique_texts: dict[str, int] = {}
+        self.query_ids = [
+            unique_texts.setdefault(query, len(unique_texts))
+            for query in queries
+        ]
+        self.text_ids = [
+            unique_texts.setdefault(text, len(unique_texts)) for text in texts
+        ]
+        self.tokens = TokenStore.load_or_build(
+            cache_dir,
+            cache_name,
+            list(unique_texts),
+            tokenizer,
+            max_length,
+        )
 
     def __len__(self) -> int:
-        return len(self.queries)
+        return len(self.labels)
 
     def __getitem__(self, idx):
-        query = self.queries[idx]
-        text = self.texts[idx]
-        label = self.labels[idx]
-
-        # Токенизация запроса и текста
-        query_encoding = self.tokenizer(
-            query,
-            truncation=True,
-            max_length=self.max_length,
-            padding='max_length',
-            return_tensors='pt',
-        )
+        return {
+            'query_id': self.query_ids[idx],
+            'query_input_ids': torch.from_numpy(
+                self.tokens[self.query_ids[idx]].astype(np.int64),
+            ),
+            'text_input_ids': torch.from_numpy(
+                self.tokens[self.text_ids[idx]].astype(np.int64),
+            ),
+            'label': torch.tensor(self.labels[idx], dtype=torch.float),
+        }
 
-        text_encoding = self.tokenizer(
-            text,
-            truncation=True,
-            max_length=self.max_length,
-            padding='max_length',
-            return_tensors='pt',
+    def lengths(self) -> np.ndarray:
+        """Количество токенов запроса и документа каждой пары, shape (n, 2)"""
+        lengths = self.tokens.lengths()
+        return np.stack(
+            [lengths[self.query_ids], lengths[self.text_ids]],
+            axis=1,
         )
 
-        return {
-            'query_input_ids': query_encoding['input_ids'].squeeze(),
-            'query_attention_mask': query_encoding['attention_mask'].squeeze(),
-            'text_input_ids': text_encoding['input_ids'].squeeze(),
-            'text_attention_mask': text_encoding['attention_mask'].squeeze(),
-            'label': torch.tensor(label, dtype=torch.float),
-        }
+    def collate_fn(self, batch: list[dict]) -> dict[str, torch.Tensor]:
+        """pad_collate с pad-токеном токенизатора датасета"""
+        return pad_collate(batch, self.pad_token_id)
+
+
+def _pad(
+    sequences: list[torch.Tensor],
+    pad_token_id: int,
+) -> tuple[torch.Tensor, torch.Tensor]:
+    input_ids = torch.nn.utils.rnn.pad_sequence(
+        sequences,
+        batch_first=True,
+        padding_value=pad_token_id,
+    )
+    lengths = torch.tensor([len(sequence) for sequence in sequences])
+    attention_mask = (
+        torch.arange(input_ids.shape[1]) < lengths.unsqueeze(1)
+    ).long()
+    return input_ids, attention_mask
+
+
+def pad_collate(
+    batch: list[dict],
+    pad_token_id: int = 0,
+) -> dict[str, torch.Tensor]:
+    """
+    Сборка пачки с дополнением до самой длинной последовательности
+    в пачке, а не до max_length.
+
+    Args:
+        batch: Элементы InternshipDataset
+        pad_token_id: Номер pad-токена токенизатора
+
+    Returns:
+        Тензоры input_ids и attention_mask уникальных запросов пачки
+        и документов, номера запросов пар (query_index) и оценки
+    """
+    # Одинаковые запросы пачки передаются модели один раз
+    query_positions: dict[int, int] = {}
+    unique_queries = []
+    for item in batch:
+        if item['query_id'] not in query_positions:
+            query_positions[item['query_id']] = len(unique_queries)
+            unique_queries.append(item['query_input_ids'])
+
+    query_input_ids, query_attention_mask = _pad(unique_queries, pad_token_id)
+    text_input_ids, text_attention_mask = _pad(
+        [item['text_input_ids'] for item in batch],
+        pad_token_id,
+    )
+    return {
+        'query_input_ids': query_input_ids,
+        'query_attention_mask': query_attention_mask,
+        'query_index': torch.tensor(
+            [query_positions[item['query_id']] for item in batch],
+        ),
+        'text_input_ids': text_input_ids,
+        'text_attention_mask': text_attention_mask,
+        'label': torch.stack([item['label'] for item in batch]),
+    }
 
 
 def create_training_data_from_evaluation() -> tuple[
@@ -70,14 +151,13 @@ def create_training_data_from_evaluation() -> tuple[
     train_texts = []
     train_labels = []
 
-    for query in queries:
-        results = search_internships(query, INDEX_NAME, size=50)
-        for result in results:
-            document_text = RelevanceCalculator._extract_document_text(
-                result['_source'],
-            )
+    queries_results = search_internships_many(queries, INDEX_NAME, size=50)
+    labeller = BatchRelevanceLabeller()
 
-            label = calculate_result_relevance(query, result)
+    for query, results in zip(queries, queries_results, strict=True):
+        labels = labeller.label((query, result) for result in results)
+        for result, label in zip(results, labels, strict=True):
+            document_text = get_features(result['_source'])['text']
 
             train_queries.append(query)
             train_texts.append(document_text)
@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sys
+from collections.abc import Iterable
+from itertools import batched
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from src.constants import (
+    BERT_MAX_LENGTH,
+    BERT_PRETRAINED_MODEL_NAME,
+    BERT_QUANTIZED_INFERENCE,
+    EMBEDDING_STORE_DIR,
+    EMBEDDING_STORE_DTYPE,
+    PARSER_RESULT_FILENAME,
+)
+from src.storage import iter_documents
+from src.utils import compute_content_hash
+
+if TYPE_CHECKING:
+    from src.bert.model import BERTSearchEngine
+
+EMBEDDINGS_FILENAME = 'embeddings.npy'
+IDS_FILENAME = 'ids.json'
+META_FILENAME = 'meta.json'
+
+
+def model_fingerprint(
+    checkpoint_path: str | None,
+    pretrained_model_name: str = BERT_PRETRAINED_MODEL_NAME,
+    quantized: bool = False,
+) -> str:
+    """
+    Отпечаток модели, которой вычислены эмбеддинги.
+
+    Учитывает исходную модель, путь, размер и время изменения чекпоинта,
+    квантование и параметры подготовки текста. Эмбеддинги, вычисленные
+    другой моделью (в том числе int8-версией того же чекпоинта),
+    считаются устаревшими.
+    """
+    checkpoint: dict[str, Any] | None = None
+    if checkpoint_path is not None:
+        stat = os.stat(checkpoint_path)
+        checkpoint = {
+            'path': os.path.abspath(checkpoint_path),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+        }
+
+    fingerprint = {
+        'pretrained_model_name': pretrained_model_name,
+        'checkpoint': checkpoint,
+        'max_length': BERT_MAX_LENGTH,
+    }
+    # Ключ добавляется только для квантованной модели, чтобы отпечатки
+    # хранилищ исходной модели не изменились
+    if quantized:
+        fingerprint['quantized'] = 'int8'
+    return compute_content_hash(fingerprint)
+
+
+class DocumentEmbeddingStore:
+    """
+    Предвычисленные эмбеддинги документов.
+
+    Матрица эмбеддингов хранится в .npy файле и открывается через memmap,
+    строки матрицы соответствуют идентификаторам документов. Для каждого
+    документа хранится хеш содержимого, поэтому измененные документы
+    не берутся из хранилища.
+    """
+
+    def __init__(self, directory: str) -> None:
+        with open(os.path.join(directory, META_FILENAME)) as f:
+            self.meta = json.load(f)
+        with open(os.path.join(directory, IDS_FILENAME)) as f:
+            ids = json.load(f)
+
+        self.embeddings = np.load(
+            os.path.join(directory, EMBEDDINGS_FILENAME),
+            mmap_mode='r',
+        )
+        self.ids = [doc_id for doc_id, _ in ids]
+        self.rows = {
+            doc_id: (row, content_hash)
+            for row, (doc_id, content_hash) in enumerate(ids)
+        }
+
+    @property
+    def fingerprint(self) -> str:
+        return self.meta['fingerprint']
+
+    @property
+    def dimension(self) -> int:
+        return self.embeddings.shape[1]
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def get(
+        self,
+        doc_id: str,
+        content_hash: str | None = None,
+    ) -> np.ndarray | None:
+        """
+        Эмбеддинг документа или None, если документа нет в хранилище
+        или его содержимое изменилось
+        """
+        entry = self.rows.get(doc_id)
+        if entry is None:
+            return None
+
+        row, stored_hash = entry
+        if content_hash is not None and content_hash != stored_hash:
+            return None
+        return self.embeddings[row]
+
+    @classmethod
+    def open(cls, directory: str) -> DocumentEmbeddingStore | None:
+        """Загрузка хранилища, если оно существует"""
+        if not os.path.exists(os.path.join(directory, META_FILENAME)):
+            return None
+        return cls(directory)
+
+    @classmethod
+    def load(
+        cls,
+        directory: str,
+        fingerprint: str,
+    ) -> DocumentEmbeddingStore | None:
+        """
+        Загрузка хранилища, если оно существует и построено той же моделью
+        """
+        store = cls.open(directory)
+        if store is None:
+            return None
+
+        if store.fingerprint != fingerprint:
+            logging.warning(
+                'Эмбеддинги документов вычислены другой моделью, '
+                'хранилище нужно пересобрать.',
+            )
+            return None
+        return store
+
+    @classmethod
+    def build(
+        cls,
+        directory: str,
+        documents: Iterable[dict[str, Any]],
+        engine: BERTSearchEngine,
+        fingerprint: str,
+        dtype: str = EMBEDDING_STORE_DTYPE,
+        batch_size: int = 256,
+    ) -> DocumentEmbeddingStore:
+        """
+        Вычисление эмбеддингов всех документов дообученной моделью.
+
+        Документы читаются один раз пачками по batch_size, в памяти
+        накапливаются только их эмбеддинги. Если uuid повторяется,
+        остается последняя версия документа.
+
+        Args:
+            directory: Каталог хранилища
+            documents: Документы стажировок (можно передать итератор,
+                например iter_documents)
+            engine: Обертка над дообученной моделью
+            fingerprint: Отпечаток модели (см. model_fingerprint)
+            dtype: Тип значений матрицы (float16 или float32)
+            batch_size: Количество документов, кодируемых за один шаг
+
+        Returns:
+            Построенное хранилище
+        """
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, META_FILENAME)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+        ids: list[tuple[str, str]] = []
+        # Строка хранилища по uuid и строка вычисленных эмбеддингов
+        # для каждой строки хранилища
+        rows: dict[str, int] = {}
+        order: list[int] = []
+        chunks = []
+        encoded = 0
+        for batch in batched(documents, batch_size):
+            vectors = engine.encode_texts([
+                engine.get_document_text(document) for document in batch
+            ])
+            chunks.append(vectors.float().cpu().numpy().astype(dtype))
+
+            for document in batch:
+                entry = (document['uuid'], compute_content_hash(document))
+                row = rows.setdefault(entry[0], len(ids))
+                if row == len(ids):
+                    ids.append(entry)
+                    order.append(encoded)
+                else:
+                    ids[row] = entry
+                    order[row] = encoded
+                encoded += 1
+            logging.info(f'Эмбеддинги: {encoded}')
+
+        if not ids:
+            raise ValueError('Нет документов для вычисления эмбеддингов')
+
+        np.save(
+            os.path.join(directory, EMBEDDINGS_FILENAME),
+            np.concatenate(chunks)[order],
+        )
+
+        with open(os.path.join(directory, IDS_FILENAME), 'w') as f:
+            json.dump(ids, f)
+
+        # Метаданные пишутся последними: без них хранилище не загружается
+        with open(meta_path, 'w') as f:
+            json.dump(
+                {
+                    'fingerprint': fingerprint,
+                    'dtype': dtype,
+                    'count': len(ids),
+                },
+                f,
+            )
+
+        return cls(directory)
+
+
+def build_embedding_store_pipeline(
+    checkpoint_path: str,
+    directory: str = EMBEDDING_STORE_DIR,
+    data_path: str = PARSER_RESULT_FILENAME,
+    quantized: bool = BERT_QUANTIZED_INFERENCE,
+) -> DocumentEmbeddingStore:
+    """
+    Офлайн-этап: вычисление эмбеддингов всех стажировок из data_path.
+
+    По умолчанию эмбеддинги вычисляются той же моделью (исходной или
+    int8), что используется при поиске (BERT_QUANTIZED_INFERENCE).
+    """
+    from src.bert.model import BERTSearchEngine
+
+    engine = BERTSearchEngine(
+        model=BERTSearchEngine.serialize_model_from_checkpoint(
+            checkpoint_path=checkpoint_path,
+            quantized=quantized,
+        ),
+        use_cache=False,
+        quantized=quantized,
+    )
+    return DocumentEmbeddingStore.build(
+        directory,
+        iter_documents(data_path),
+        engine,
+        fingerprint=model_fingerprint(checkpoint_path, quantized=quantized),
+    )
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    build_embedding_store_pipeline(sys.argv[1])
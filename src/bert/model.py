@@ -1,13 +1,57 @@
 from __future__ import annotations
 
-from typing import Any
+import os
+from typing import TYPE_CHECKING, Any
 
 import torch
 from transformers import AutoModel, AutoTokenizer
 
-from src.constants import BERT_PRETRAINED_MODEL_NAME
-from src.elastic_search import search_internships
-from src.eval.relevance_calculator import RelevanceCalculator
+from src.bert.batching import token_budget_batches
+from src.cache import get_result_cache
+from src.constants import (
+    BERT_MAX_LENGTH,
+    BERT_PRETRAINED_MODEL_NAME,
+    BERT_RERANK_BATCH_SIZE,
+    BERT_RERANK_MAX_TOKENS,
+)
+from src.elastic_search import (
+    hybrid_search_internships_many,
+    search_internships_many,
+)
+from src.features import get_features
+
+if TYPE_CHECKING:
+    from src.bert.embedding_store import DocumentEmbeddingStore
+
+QUANTIZED_CHECKPOINT_SUFFIX = '.int8.pth'
+
+
+def quantize_model(model: torch.nn.Module) -> torch.nn.Module:
+    """
+    Динамическое int8-квантование Linear-слоев модели (bert
+    и similarity_layer) для инференса на CPU.
+
+    Веса хранятся в int8, активации квантуются на лету,
+    квантованная модель работает только на CPU.
+    """
+    return torch.ao.quantization.quantize_dynamic(
+        model.cpu().eval(),
+        {torch.nn.Linear},
+        dtype=torch.qint8,
+    )
+
+
+def is_quantized(model: torch.nn.Module) -> bool:
+    """Модель уже квантована quantize_model"""
+    return any(
+        isinstance(module, torch.ao.nn.quantized.dynamic.Linear)
+        for module in model.modules()
+    )
+
+
+def quantized_checkpoint_path(checkpoint_path: str) -> str:
+    """Путь до квантованной версии чекпоинта"""
+    return os.path.splitext(checkpoint_path)[0] + QUANTIZED_CHECKPOINT_SUFFIX
 
 
 class BERTSearchEngineFitter(torch.nn.Module):
@@ -41,20 +85,40 @@ class BERTSearchEngineFitter(torch.nn.Module):
         query_attention_mask,
         text_input_ids,
         text_attention_mask,
+        query_index=None,
     ):
-        query_outputs = self.bert(
-            input_ids=query_input_ids,
-            attention_mask=query_attention_mask,
-        )
+        """
+        Релевантность пар (запрос, документ).
 
-        text_outputs = self.bert(
-            input_ids=text_input_ids,
-            attention_mask=text_attention_mask,
-        )
+        Если передан query_index, query_input_ids содержат только
+        уникальные запросы пачки, а query_index[i] - номер запроса
+        i-й пары среди них. Каждый запрос кодируется один раз,
+        и его эмбеддинг используется для всех пар с этим запросом.
+        """
+        query_embeddings = self.encode(query_input_ids, query_attention_mask)
+        if query_index is not None:
+            query_embeddings = query_embeddings[query_index]
+        text_embeddings = self.encode(text_input_ids, text_attention_mask)
+        return self.score(query_embeddings, text_embeddings)
 
-        query_embeddings = query_outputs.last_hidden_state[:, 0, :]
-        text_embeddings = text_outputs.last_hidden_state[:, 0, :]
+    def encode(
+        self,
+        input_ids: torch.Tensor,
+        attention_mask: torch.Tensor,
+    ) -> torch.Tensor:
+        """Эмбеддинги CLS-токена для пачки последовательностей"""
+        outputs = self.bert(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+        )
+        return outputs.last_hidden_state[:, 0, :]
 
+    def score(
+        self,
+        query_embeddings: torch.Tensor,
+        text_embeddings: torch.Tensor,
+    ) -> torch.Tensor:
+        """Релевантность пар по эмбеддингам запроса и документа"""
         query_embeddings = self.dropout(query_embeddings)
         text_embeddings = self.dropout(text_embeddings)
 
@@ -71,11 +135,66 @@ class BERTSearchEngine:
         self,
         model: torch.nn.Module,
         pretrained_model_name: str = BERT_PRETRAINED_MODEL_NAME,
+        use_cache: bool = True,
+        cache_namespace: str = 'bert',
+        rerank_batch_size: int = BERT_RERANK_BATCH_SIZE,
+        rerank_max_tokens: int = BERT_RERANK_MAX_TOKENS,
+        embedding_store: DocumentEmbeddingStore | None = None,
+        retrieval_mode: str = 'bm25',
+        quantized: bool = False,
     ) -> None:
+        """
+        Args:
+            model (torch.nn.Module): Дообученная модель
+            pretrained_model_name (str):
+                Название модели, которую дообучали.
+                Defaults to BERT_PRETRAINED_MODEL_NAME.
+            use_cache (bool, optional):
+                Кешировать результаты поиска. Следует отключать,
+                если веса модели меняются (например, во время обучения).
+                Defaults to True.
+            cache_namespace (str, optional):
+                Название движка в ключах кеша, позволяет различать
+                результаты разных моделей. Defaults to 'bert'.
+            rerank_batch_size (int, optional):
+                Количество документов, кодируемых моделью за один проход
+                при переранжировании. Defaults to BERT_RERANK_BATCH_SIZE.
+            rerank_max_tokens (int, optional):
+                Максимальное количество токенов в пачке документов
+                с учетом дополнения. Defaults to BERT_RERANK_MAX_TOKENS.
+            embedding_store (DocumentEmbeddingStore | None, optional):
+                Предвычисленные эмбеддинги документов. Документы,
+                найденные в хранилище, не кодируются при переранжировании.
+                Defaults to None.
+            retrieval_mode (str, optional):
+                Способ поиска кандидатов в ElasticSearch: 'bm25' или
+                'hybrid' (BM25 и kNN по эмбеддингам документов,
+                объединенные через RRF). Defaults to 'bm25'.
+            quantized (bool, optional):
+                Инференс на CPU int8-квантованной моделью
+                (см. quantize_model). Неквантованная модель квантуется
+                при создании, результаты кешируются отдельно
+                от результатов исходной модели. Defaults to False.
+        """
+        if retrieval_mode not in {'bm25', 'hybrid'}:
+            raise ValueError(f'Неизвестный способ поиска: {retrieval_mode}')
+
+        if quantized and not is_quantized(model):
+            model = quantize_model(model)
+
         self.tokenizer = AutoTokenizer.from_pretrained(pretrained_model_name)
         self.model = model
+        self.quantized = quantized
+        self.result_cache = get_result_cache() if use_cache else None
+        self.cache_namespace = (
+            f'{cache_namespace}:int8' if quantized else cache_namespace
+        )
+        self.rerank_batch_size = rerank_batch_size
+        self.rerank_max_tokens = rerank_max_tokens
+        self.embedding_store = embedding_store
+        self.retrieval_mode = retrieval_mode
         self.device = torch.device(
-            'cuda' if torch.cuda.is_available() else 'cpu',
+            'cuda' if torch.cuda.is_available() and not quantized else 'cpu',
         )
         self.model.to(self.device)
         self.model.eval()
@@ -84,6 +203,7 @@ class BERTSearchEngine:
     def serialize_model_from_checkpoint(
         checkpoint_path: str | None = None,
         pretrained_model_name: str = BERT_PRETRAINED_MODEL_NAME,
+        quantized: bool = False,
     ) -> torch.nn.Module:
         """Интерфейс для загрузки модели в BERTSearchEngine через чекпоинт
 
@@ -93,12 +213,37 @@ class BERTSearchEngine:
             pretrained_model_name (str):
                 Название модели, которую дообучали.
                 Defaults to BERT_PRETRAINED_MODEL_NAME.
+            quantized (bool, optional):
+                Загрузить int8-квантованную модель. Квантованная версия
+                чекпоинта сохраняется рядом с ним (<чекпоинт>.int8.pth)
+                и используется, пока она не старше чекпоинта.
+                Defaults to False.
         Returns:
             torch.nn.Module: Дообученная модель
         """
         model = BERTSearchEngineFitter(model_name=pretrained_model_name)
-        if checkpoint_path is not None:
-            model.load_state_dict(torch.load(checkpoint_path))
+        if not quantized:
+            if checkpoint_path is not None:
+                model.load_state_dict(torch.load(checkpoint_path))
+            return model
+
+        if checkpoint_path is None:
+            return quantize_model(model)
+
+        quantized_path = quantized_checkpoint_path(checkpoint_path)
+        if (
+            os.path.exists(quantized_path)
+            and os.path.getmtime(quantized_path)
+            >= os.path.getmtime(checkpoint_path)
+        ):
+            # Квантованные веса загружаются в модель той же структуры
+            model = quantize_model(model)
+            model.load_state_dict(torch.load(quantized_path))
+            return model
+
+        model.load_state_dict(torch.load(checkpoint_path))
+        model = quantize_model(model)
+        torch.save(model.state_dict(), quantized_path)
         return model
 
     def find_internships(
@@ -127,11 +272,104 @@ class BERTSearchEngine:
                 Отсортированный по релевантности список стажировок
                 после переранжирования BERT моделью
         """
-        es_results = search_internships(query, index_name, size=elastic_size)
-        return self.rerank_results(
+        return self.find_internships_many(
+            [query],
+            index_name,
+            elastic_size=elastic_size,
+            rerank_size=rerank_size,
+        )[0]
+
+    def find_internships_many(
+        self,
+        queries: list[str],
+        index_name: str,
+        elastic_size: int = 50,
+        rerank_size: int = 10,
+    ) -> list[list[dict[str, Any]]]:
+        """Поиск по нескольким запросам с переранжированием BERT моделью
+
+        Кандидаты из ElasticSearch запрашиваются одним _msearch запросом.
+        Запросы, результаты которых есть в кеше, не выполняются.
+
+        Args:
+            queries (list[str]): Поисковые запросы пользователя
+            index_name (str):
+                Название индекса ElasticSearch для поиска стажировок
+            elastic_size (int, optional):
+                Количество результатов, запрашиваемых из ElasticSearch
+                на каждый запрос. Defaults to 50.
+            rerank_size (int, optional):
+                Количество результатов на каждый запрос,
+                возвращаемых после переранжирования BERT моделью.
+                Defaults to 10.
+
+        Returns:
+            list[list[dict[str, Any]]]:
+                Переранжированные результаты в порядке запросов
+        """
+        keys = [
+            self._cache_key(query, index_name, elastic_size, rerank_size)
+            for query in queries
+        ]
+        results = [
+            self.result_cache.get(key) if key is not None else None
+            for key in keys
+        ]
+        missing = [idx for idx, hits in enumerate(results) if hits is None]
+
+        es_results = self.retrieve_candidates(
+            [queries[idx] for idx in missing],
+            index_name,
+            size=elastic_size,
+        )
+        for idx, hits in zip(missing, es_results, strict=True):
+            results[idx] = self.rerank_results(
+                queries[idx],
+                hits.copy(),
+                top_n=rerank_size,
+            )
+            if keys[idx] is not None:
+                self.result_cache.set(keys[idx], results[idx])
+
+        return results
+
+    def retrieve_candidates(
+        self,
+        queries: list[str],
+        index_name: str,
+        size: int,
+    ) -> list[list[dict[str, Any]]]:
+        """Поиск кандидатов для переранжирования в ElasticSearch"""
+        if not queries:
+            return []
+
+        if self.retrieval_mode == 'hybrid':
+            query_vectors = [
+                self.encode_query(query)[0].cpu().tolist() for query in queries
+            ]
+            return hybrid_search_internships_many(
+                queries,
+                query_vectors,
+                index_name,
+                size=size,
+            )
+
+        return search_internships_many(queries, index_name, size=size)
+
+    def _cache_key(
+        self,
+        query: str,
+        index_name: str,
+        elastic_size: int,
+        rerank_size: int,
+    ) -> str | None:
+        if self.result_cache is None:
+            return None
+        return self.result_cache.make_key(
+            f'{self.cache_namespace}:{self.retrieval_mode}:{elastic_size}',
+            index_name,
             query,
-            es_results.copy(),
-            top_n=rerank_size,
+            rerank_size,
         )
 
     def rerank_results(
@@ -146,15 +384,16 @@ class BERTSearchEngine:
         if not results:
             return results
 
-        for result in results:
-            full_text = RelevanceCalculator._extract_document_text(
-                result['_source'],
-            )
-
-            if len(full_text) > 5000:
-                full_text = full_text[:5000]
+        query_embedding = self.encode_query(query)
+        text_embeddings = self._get_document_embeddings(results)
 
-            result['_score'] = self._compute_relevance(query, full_text)
+        with torch.no_grad():
+            relevance = self.model.score(
+                query_embedding.expand(len(text_embeddings), -1),
+                text_embeddings,
+            )
+        for result, score in zip(results, relevance.squeeze(-1).tolist()):
+            result['_score'] = score
 
         results.sort(key=lambda x: x['_score'], reverse=True)
 
@@ -162,34 +401,137 @@ class BERTSearchEngine:
             return results[:top_n]
         return results
 
-    def _compute_relevance(self, query: str, text: str) -> float:
+    @staticmethod
+    def get_document_text(source: dict[str, Any]) -> str:
+        """Текст документа, по которому модель оценивает релевантность"""
+        full_text = get_features(source)['text']
+
+        if len(full_text) > 5000:
+            full_text = full_text[:5000]
+
+        return full_text
+
+    def encode_query(self, query: str) -> torch.Tensor:
+        """Эмбеддинг запроса"""
         query_encoding = self.tokenizer(
             query,
             truncation=True,
-            max_length=512,
-            padding='max_length',
+            max_length=BERT_MAX_LENGTH,
             return_tensors='pt',
-        )
+        ).to(self.device)
 
-        text_encoding = self.tokenizer(
-            text,
+        with torch.no_grad():
+            return self.model.encode(
+                query_encoding['input_ids'],
+                query_encoding['attention_mask'],
+            )
+
+    def encode_texts(self, texts: list[str]) -> torch.Tensor:
+        """
+        Эмбеддинги документов.
+
+        Документы токенизируются одним вызовом и группируются по длине
+        в пачки не больше rerank_max_tokens токенов и rerank_batch_size
+        документов (см. token_budget_batches). Пачка дополняется
+        до самой длинной последовательности в ней, а не до max_length.
+        """
+        text_encodings = self.tokenizer(
+            texts,
             truncation=True,
-            max_length=512,
-            padding='max_length',
-            return_tensors='pt',
+            max_length=BERT_MAX_LENGTH,
+        )
+        batches = token_budget_batches(
+            [len(input_ids) for input_ids in text_encodings['input_ids']],
+            max_tokens=self.rerank_max_tokens,
+            max_batch_size=self.rerank_batch_size,
         )
 
-        query_input_ids = query_encoding['input_ids'].to(self.device)
-        query_attention_mask = query_encoding['attention_mask'].to(self.device)
-        text_input_ids = text_encoding['input_ids'].to(self.device)
-        text_attention_mask = text_encoding['attention_mask'].to(self.device)
+        embeddings = None
+        with torch.no_grad():
+            for indices in batches:
+                batch = self.tokenizer.pad(
+                    {
+                        'input_ids': [
+                            text_encodings['input_ids'][idx] for idx in indices
+                        ],
+                        'attention_mask': [
+                            text_encodings['attention_mask'][idx]
+                            for idx in indices
+                        ],
+                    },
+                    padding='longest',
+                    return_tensors='pt',
+                ).to(self.device)
+
+                batch_embeddings = self.model.encode(
+                    batch['input_ids'],
+                    batch['attention_mask'],
+                )
+                if embeddings is None:
+                    embeddings = batch_embeddings.new_empty(
+                        (len(texts), batch_embeddings.shape[-1]),
+                    )
+                # Эмбеддинги возвращаются в исходном порядке документов
+                embeddings[indices] = batch_embeddings
+
+        return embeddings
+
+    def _get_document_embeddings(
+        self,
+        results: list[dict[str, Any]],
+    ) -> torch.Tensor:
+        """
+        Эмбеддинги документов из хранилища, если они там есть
+        и актуальны, иначе вычисленные моделью
+        """
+        cached = [None] * len(results)
+        if self.embedding_store is not None:
+            cached = [
+                self.embedding_store.get(
+                    result['_id'],
+                    result['_source'].get('content_hash'),
+                )
+                for result in results
+            ]
+
+        missing = [idx for idx, vector in enumerate(cached) if vector is None]
+        if len(missing) == len(results):
+            return self.encode_texts(
+                [self.get_document_text(r['_source']) for r in results],
+            )
+
+        embeddings = torch.empty(
+            (len(results), self.embedding_store.dimension),
+            device=self.device,
+        )
+        for idx, vector in enumerate(cached):
+            if vector is not None:
+                embeddings[idx] = torch.from_numpy(vector.astype('float32'))
+
+        if missing:
+            embeddings[missing] = self.encode_texts([
+                self.get_document_text(results[idx]['_source'])
+                for idx in missing
+            ])
+
+        return embeddings
+
+    def _compute_relevance(self, query: str, text: str) -> float:
+        return self._compute_relevance_batch(query, [text])[0]
+
+    def _compute_relevance_batch(
+        self,
+        query: str,
+        texts: list[str],
+    ) -> list[float]:
+        """Оценивает релевантность документов запросу"""
+        query_embedding = self.encode_query(query)
+        text_embeddings = self.encode_texts(texts)
 
         with torch.no_grad():
-            relevance = self.model(
-                query_input_ids=query_input_ids,
-                query_attention_mask=query_attention_mask,
-                text_input_ids=text_input_ids,
-                text_attention_mask=text_attention_mask,
+            relevance = self.model.score(
+                query_embedding.expand(len(text_embeddings), -1),
+                text_embeddings,
             )
 
-        return relevance.item()
+        return relevance.squeeze(-1).tolist()
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+from typing import Any
+
+import numpy as np
+
+from src.constants import BERT_MAX_LENGTH
+from src.utils import compute_content_hash
+
+TOKENS_FILENAME = 'tokens.npy'
+OFFSETS_FILENAME = 'offsets.npy'
+META_FILENAME = 'meta.json'
+
+
+def tokenizer_fingerprint(
+    tokenizer: Any,
+    texts: list[str],
+    max_length: int = BERT_MAX_LENGTH,
+) -> str:
+    """
+    Отпечаток токенизации: токенизатор, max_length и сами тексты.
+
+    Токены, полученные другим токенизатором или с другим max_length,
+    считаются устаревшими.
+    """
+    return compute_content_hash({
+        'tokenizer': type(tokenizer).__name__,
+        'name_or_path': getattr(tokenizer, 'name_or_path', None),
+        'vocab_size': len(tokenizer),
+        'max_length': max_length,
+        'texts': compute_content_hash(texts),
+    })
+
+
+class TokenStore:
+    """
+    Заранее токенизированные тексты.
+
+    Токены всех текстов записаны подряд в один .npy файл (int32)
+    и открываются через memmap, границы текстов хранятся в offsets:
+    токены i-го текста - tokens[offsets[i]:offsets[i + 1]]. Тексты
+    обрезаются до max_length, но не дополняются, дополнение делается
+    при сборке пачки (см. src.bert.dataset.pad_collate).
+    """
+
+    def __init__(self, directory: str) -> None:
+        with open(os.path.join(directory, META_FILENAME)) as f:
+            self.meta = json.load(f)
+
+        self.tokens = np.load(
+            os.path.join(directory, TOKENS_FILENAME),
+            mmap_mode='r',
+        )
+        self.offsets = np.load(os.path.join(directory, OFFSETS_FILENAME))
+
+    @property
+    def fingerprint(self) -> str:
+        return self.meta['fingerprint']
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx: int) -> np.ndarray:
+        """Токены текста с номером idx"""
+        return self.tokens[self.offsets[idx] : self.offsets[idx + 1]]
+
+    def lengths(self) -> np.ndarray:
+        """Количество токенов каждого текста"""
+        return np.diff(self.offsets)
+
+    @classmethod
+    def load_or_build(
+        cls,
+        root: str,
+        name: str,
+        texts: list[str],
+        tokenizer: Any,
+        max_length: int = BERT_MAX_LENGTH,
+    ) -> TokenStore:
+        """
+        Токены texts из кеша в каталоге root/name или токенизация texts.
+
+        Под каждым именем (например, обучающая и валидационная выборки)
+        хранится одно хранилище. Если его отпечаток устарел, токены
+        строятся во временном каталоге, который затем заменяет прежний,
+        поэтому устаревшие хранилища не накапливаются, а прерванная
+        сборка не портит прежнее.
+        """
+        fingerprint = tokenizer_fingerprint(tokenizer, texts, max_length)
+        directory = os.path.join(root, name)
+        if os.path.exists(os.path.join(directory, META_FILENAME)):
+            store = cls(directory)
+            if store.fingerprint == fingerprint:
+                return store
+            logging.info(f'Токены в {directory} устарели')
+
+        tmp_directory = os.path.join(root, f'.tmp.{name}')
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        cls.build(tmp_directory, texts, tokenizer, fingerprint, max_length)
+        _replace_directory(tmp_directory, directory)
+        return cls(directory)
+
+    @classmethod
+    def build(
+        cls,
+        directory: str,
+        texts: list[str],
+        tokenizer: Any,
+        fingerprint: str,
+        max_length: int = BERT_MAX_LENGTH,
+        batch_size: int = 1000,
+    ) -> TokenStore:
+        """
+        Токенизация текстов пачками по batch_size и запись на диск.
+
+        Args:
+            directory: Каталог хранилища
+            texts: Тексты
+            tokenizer: Токенизатор модели
+            fingerprint: Отпечаток токенизации (см. tokenizer_fingerprint)
+            max_length: Максимальная длина последовательности
+            batch_size: Количество текстов, токенизируемых за один вызов
+
+        Returns:
+            Построенное хранилище
+        """
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, META_FILENAME)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+        chunks = []
+        for start in range(0, len(texts), batch_size):
+            encodings = tokenizer(
+                texts[start : start + batch_size],
+                truncation=True,
+                max_length=max_length,
+            )
+            chunks.extend(
+                np.asarray(input_ids, dtype=np.int32)
+                for input_ids in encodings['input_ids']
+            )
+
+        offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+        np.cumsum([len(chunk) for chunk in chunks], out=offsets[1:])
+        tokens = (
+            np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int32)
+        )
+
+        np.save(os.path.join(directory, TOKENS_FILENAME), tokens)
+        np.save(os.path.join(directory, OFFSETS_FILENAME), offsets)
+
+        # Метаданные пишутся последними: без них хранилище не загружается
+        with open(meta_path, 'w') as f:
+            json.dump(
+                {
+                    'fingerprint': fingerprint,
+                    'max_length': max_length,
+                    'count': len(chunks),
+                    'tokens': len(tokens),
+                },
+                f,
+            )
+
+        logging.info(
+            f'Токенизировано {len(chunks)} текстов, {len(tokens)} токенов',
+        )
+        return cls(directory)
+
+
+def _replace_directory(src: str, dst: str) -> None:
+    """Замена каталога dst каталогом src"""
+    if not os.path.exists(dst):
+        os.replace(src, dst)
+        return
+
+    root, name = os.path.split(dst)
+    old = os.path.join(root, f'.old.{name}')
+    shutil.rmtree(old, ignore_errors=True)
+    os.replace(dst, old)
+    os.replace(src, dst)
+    # Открытые memmap прежнего хранилища остаются действительными
+    shutil.rmtree(old, ignore_errors=True)
@@ -4,6 +4,7 @@ from torch.utils.data import DataLoader
 from tqdm import tqdm
 from transformers import AutoTokenizer
 
+from src.bert.batching import LengthBucketSampler
 from src.bert.dataset import (
     InternshipDataset,
     create_training_data_from_evaluation,
@@ -11,14 +12,37 @@ from src.bert.dataset import (
 from src.bert.model import BERTSearchEngine, BERTSearchEngineFitter
 from src.constants import (
     BERT_PRETRAINED_MODEL_NAME,
-    BERT_TRAINING_BATCH_SIZE,
     BERT_TRAINING_EPOCHS,
+    BERT_TRAINING_MAX_BATCH_SIZE,
+    BERT_TRAINING_MAX_TOKENS,
     EVALUATION_QUERIES,
     INDEX_NAME,
 )
 from src.eval.evaluate import SearchEvaluator
 
 
+def batch_loss(
+    model: torch.nn.Module,
+    batch: dict[str, torch.Tensor],
+    criterion: torch.nn.Module,
+    device: torch.device,
+) -> torch.Tensor:
+    """
+    Функция потерь модели на пачке из pad_collate.
+
+    Модель возвращает оценки shape (n, 1). Сжимается только последняя
+    ось, чтобы пачка из одной пары давала shape (1,), как и labels.
+    """
+    outputs = model(
+        query_input_ids=batch['query_input_ids'].to(device),
+        query_attention_mask=batch['query_attention_mask'].to(device),
+        text_input_ids=batch['text_input_ids'].to(device),
+        text_attention_mask=batch['text_attention_mask'].to(device),
+        query_index=batch['query_index'].to(device),
+    )
+    return criterion(outputs.squeeze(-1), batch['label'].to(device))
+
+
 def train_bert_ranker(
     model: torch.nn.Module,
     train_loader: DataLoader,
@@ -49,22 +73,9 @@ def train_bert_ranker(
         total_train_loss = 0
 
         for batch in tqdm(train_loader, desc=f'Training Epoch {epoch + 1}'):
-            query_input_ids = batch['query_input_ids'].to(device)
-            query_attention_mask = batch['query_attention_mask'].to(device)
-            text_input_ids = batch['text_input_ids'].to(device)
-            text_attention_mask = batch['text_attention_mask'].to(device)
-            labels = batch['label'].to(device)
-
             optimizer.zero_grad()
 
-            outputs = model(
-                query_input_ids=query_input_ids,
-                query_attention_mask=query_attention_mask,
-                text_input_ids=text_input_ids,
-                text_attention_mask=text_attention_mask,
-            )
-
-            loss = criterion(outputs.squeeze(), labels)
+            loss = batch_loss(model, batch, criterion, device)
 
             scaler.scale(loss).backward()
             scaler.step(optimizer)
@@ -83,36 +94,24 @@ def train_bert_ranker(
                 val_loader,
                 desc=f'Validation Epoch {epoch + 1}',
             ):
-                query_input_ids = batch['query_input_ids'].to(device)
-                query_attention_mask = batch['query_attention_mask'].to(device)
-                text_input_ids = batch['text_input_ids'].to(device)
-                text_attention_mask = batch['text_attention_mask'].to(device)
-                labels = batch['label'].to(device)
-
-                outputs = model(
-                    query_input_ids=query_input_ids,
-                    query_attention_mask=query_attention_mask,
-                    text_input_ids=text_input_ids,
-                    text_attention_mask=text_attention_mask,
-                )
-
-                loss = criterion(outputs.squeeze(), labels)
+                loss = batch_loss(model, batch, criterion, device)
 
                 total_val_loss += loss.item()
 
         avg_val_loss = total_val_loss / len(val_loader)
 
         # Оценка NDCG и Precision
-        bert_wrapper = BERTSearchEngine(model=model)
-        bert_results = {}
-        for query in tqdm(
-            EVALUATION_QUERIES,
-            desc=f'Evaluation Epoch {epoch + 1}',
-        ):
-            bert_results[query] = bert_wrapper.find_internships(
-                query,
-                INDEX_NAME,
-            )
+        bert_wrapper = BERTSearchEngine(model=model, use_cache=False)
+        bert_results = dict(
+            zip(
+                EVALUATION_QUERIES,
+                bert_wrapper.find_internships_many(
+                    EVALUATION_QUERIES,
+                    INDEX_NAME,
+                ),
+                strict=True,
+            ),
+        )
 
         evaluations = SearchEvaluator.evaluate_multiple_queries(bert_results)
         current_precision = evaluations['avg_precision']
@@ -168,23 +167,35 @@ def train_model_pipeline() -> torch.nn.Module:
         train_texts,
         train_labels,
         tokenizer,
+        cache_name='train',
     )
     val_dataset = InternshipDataset(
         val_queries,
         val_texts,
         val_labels,
         tokenizer,
+        cache_name='val',
     )
 
     train_loader = DataLoader(
         train_dataset,
-        batch_size=BERT_TRAINING_BATCH_SIZE,
-        shuffle=True,
+        batch_sampler=LengthBucketSampler(
+            train_dataset.lengths(),
+            max_tokens=BERT_TRAINING_MAX_TOKENS,
+            max_batch_size=BERT_TRAINING_MAX_BATCH_SIZE,
+            shuffle=True,
+        ),
+        collate_fn=train_dataset.collate_fn,
     )
     val_loader = DataLoader(
         val_dataset,
-        batch_size=BERT_TRAINING_BATCH_SIZE,
-        shuffle=False,
+        batch_sampler=LengthBucketSampler(
+            val_dataset.lengths(),
+            max_tokens=BERT_TRAINING_MAX_TOKENS,
+            max_batch_size=BERT_TRAINING_MAX_BATCH_SIZE,
+            shuffle=False,
+        ),
+        collate_fn=val_dataset.collate_fn,
     )
 
     trained_model = train_bert_ranker(
@@ -0,0 +1,457 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from collections.abc import AsyncIterator, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from typing import Any, NamedTuple
+
+from elasticsearch import ApiError, AsyncElasticsearch, Elasticsearch
+
+from src.constants import (
+    BULK_CHUNK_SIZE,
+    BULK_INITIAL_BACKOFF,
+    BULK_MAX_CHUNK_BYTES,
+    BULK_MAX_IN_FLIGHT,
+    BULK_MAX_RETRIES,
+)
+from src.utils import backoff_delay
+
+# Статус, с которым Elasticsearch отклоняет операции при переполнении очередей
+RETRYABLE_STATUS = 429
+
+
+class BulkAction(NamedTuple):
+    """Одна операция _bulk API"""
+
+    op_type: str
+    doc_id: str
+    source: dict[str, Any] | None = None
+
+
+class SerializedAction(NamedTuple):
+    """Операция _bulk API, сериализованная в строки NDJSON"""
+
+    action: BulkAction
+    lines: tuple[str, ...]
+    size: int
+
+
+@dataclass
+class BulkStats:
+    """Статистика загрузки документов через _bulk API"""
+
+    indexed: int = 0
+    deleted: int = 0
+    failed: int = 0
+    retried: int = 0
+    chunks: int = 0
+    elapsed: float = 0.0
+    errors: list[dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def total(self) -> int:
+        return self.indexed + self.deleted + self.failed
+
+    @property
+    def docs_per_second(self) -> float:
+        if self.elapsed <= 0:
+            return 0.0
+        return self.total / self.elapsed
+
+    def merge(self, other: BulkStats) -> None:
+        self.indexed += other.indexed
+        self.deleted += other.deleted
+        self.failed += other.failed
+        self.retried += other.retried
+        self.chunks += other.chunks
+        self.errors.extend(other.errors)
+
+
+def serialize_action(action: BulkAction) -> SerializedAction:
+    """Сериализует операцию в строки NDJSON и считает их размер в байтах"""
+    header = json.dumps(
+        {action.op_type: {'_id': action.doc_id}},
+        ensure_ascii=False,
+    )
+    lines = [header]
+    if action.source is not None:
+        lines.append(
+            json.dumps(action.source, ensure_ascii=False, separators=(',', ':')),
+        )
+
+    size = sum(len(line.encode('utf-8')) + 1 for line in lines)
+    return SerializedAction(action=action, lines=tuple(lines), size=size)
+
+
+def iter_chunks(
+    actions: Iterable[BulkAction],
+    chunk_size: int = BULK_CHUNK_SIZE,
+    max_chunk_bytes: int = BULK_MAX_CHUNK_BYTES,
+) -> Iterator[list[SerializedAction]]:
+    """
+    Разбивает поток операций на пачки, ограниченные
+    количеством документов и размером тела запроса.
+
+    Args:
+        actions: Операции для отправки
+        chunk_size: Максимальное количество операций в пачке
+        max_chunk_bytes: Максимальный размер пачки в байтах
+
+    Yields:
+        Пачки сериализованных операций
+    """
+    chunk: list[SerializedAction] = []
+    chunk_bytes = 0
+
+    for action in actions:
+        serialized = serialize_action(action)
+
+        if chunk and (
+            len(chunk) >= chunk_size
+            or chunk_bytes + serialized.size > max_chunk_bytes
+        ):
+            yield chunk
+            chunk = []
+            chunk_bytes = 0
+
+        chunk.append(serialized)
+        chunk_bytes += serialized.size
+
+    if chunk:
+        yield chunk
+
+
+def chunk_operations(chunk: list[SerializedAction]) -> list[str]:
+    """Собирает тело запроса _bulk из сериализованных операций"""
+    return [line for serialized in chunk for line in serialized.lines]
+
+
+def process_bulk_response(
+    chunk: list[SerializedAction],
+    response: dict[str, Any],
+    stats: BulkStats,
+) -> list[SerializedAction]:
+    """
+    Разбирает ответ _bulk API поэлементно.
+
+    Args:
+        chunk: Отправленная пачка операций
+        response: Ответ Elasticsearch
+        stats: Статистика, которую нужно обновить
+
+    Returns:
+        Операции, отклоненные со статусом 429, для повторной отправки
+    """
+    rejected = []
+
+    for serialized, item in zip(chunk, response['items'], strict=True):
+        op_type, result = next(iter(item.items()))
+        status = result.get('status', 500)
+
+        if status == RETRYABLE_STATUS:
+            rejected.append(serialized)
+        elif op_type == 'delete' and status in {200, 404}:
+            stats.deleted += 1
+        elif status < 300:
+            stats.indexed += 1
+        else:
+            stats.failed += 1
+            stats.errors.append({
+                'op_type': op_type,
+                '_id': result.get('_id', serialized.action.doc_id),
+                'status': status,
+                'error': result.get('error'),
+            })
+
+    return rejected
+
+
+def fail_chunk(
+    chunk: list[SerializedAction],
+    stats: BulkStats,
+    status: int,
+    error: Any,
+) -> None:
+    """Отмечает все операции пачки как неудавшиеся"""
+    for serialized in chunk:
+        stats.failed += 1
+        stats.errors.append({
+            'op_type': serialized.action.op_type,
+            '_id': serialized.action.doc_id,
+            'status': status,
+            'error': error,
+        })
+
+
+class BaseBulkIndexer:
+    """Общие параметры загрузки документов через _bulk API"""
+
+    def __init__(
+        self,
+        client: Elasticsearch | AsyncElasticsearch,
+        index_name: str,
+        chunk_size: int = BULK_CHUNK_SIZE,
+        max_chunk_bytes: int = BULK_MAX_CHUNK_BYTES,
+        max_in_flight: int = BULK_MAX_IN_FLIGHT,
+        max_retries: int = BULK_MAX_RETRIES,
+        initial_backoff: float = BULK_INITIAL_BACKOFF,
+        disable_refresh: bool = True,
+    ) -> None:
+        self.client = client
+        self.index_name = index_name
+        self.chunk_size = chunk_size
+        self.max_chunk_bytes = max_chunk_bytes
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.disable_refresh = disable_refresh
+
+    @staticmethod
+    def _log_stats(stats: BulkStats) -> None:
+        logging.info(
+            f'Bulk: {stats.indexed} проиндексировано, '
+            f'{stats.deleted} удалено, {stats.failed} ошибок, '
+            f'{stats.retried} повторов за {stats.elapsed:.2f} с '
+            f'({stats.docs_per_second:.0f} док/с)',
+        )
+        for error in stats.errors[:10]:
+            logging.error(f'Ошибка bulk-операции: {error}')
+
+
+class BulkIndexer(BaseBulkIndexer):
+    """
+    Загрузка документов через _bulk API: пачки по количеству документов
+    и байтам, несколько пачек одновременно, поэлементный разбор ошибок
+    и повтор операций, отклоненных со статусом 429.
+    """
+
+    client: Elasticsearch
+
+    def run(self, actions: Iterable[BulkAction]) -> BulkStats:
+        """
+        Отправляет операции в Elasticsearch.
+
+        Args:
+            actions: Операции для отправки
+
+        Returns:
+            Статистика загрузки
+        """
+        stats = BulkStats()
+        start = time.perf_counter()
+
+        if self.disable_refresh:
+            with refresh_disabled(self.client, self.index_name):
+                self._run_chunks(actions, stats)
+        else:
+            self._run_chunks(actions, stats)
+
+        stats.elapsed = time.perf_counter() - start
+        self._log_stats(stats)
+
+        return stats
+
+    def _run_chunks(
+        self,
+        actions: Iterable[BulkAction],
+        stats: BulkStats,
+    ) -> None:
+        chunks = iter_chunks(actions, self.chunk_size, self.max_chunk_bytes)
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            in_flight: set[Future[BulkStats]] = set()
+
+            for chunk in chunks:
+                if len(in_flight) >= self.max_in_flight:
+                    done, in_flight = wait(
+                        in_flight,
+                        return_when=FIRST_COMPLETED,
+                    )
+                    for future in done:
+                        stats.merge(future.result())
+
+                in_flight.add(executor.submit(self._send_chunk, chunk))
+
+            for future in in_flight:
+                stats.merge(future.result())
+
+    def _send_chunk(self, chunk: list[SerializedAction]) -> BulkStats:
+        stats = BulkStats(chunks=1)
+        pending = chunk
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.client.bulk(
+                    index=self.index_name,
+                    operations=chunk_operations(pending),
+                )
+            except ApiError as e:
+                if e.meta.status != RETRYABLE_STATUS:
+                    fail_chunk(pending, stats, e.meta.status, str(e))
+                    return stats
+                rejected = pending
+            else:
+                rejected = process_bulk_response(pending, response, stats)
+
+            if not rejected:
+                return stats
+
+            if attempt < self.max_retries:
+                stats.retried += len(rejected)
+                time.sleep(backoff_delay(attempt, self.initial_backoff))
+            pending = rejected
+
+        fail_chunk(pending, stats, RETRYABLE_STATUS, 'Превышено число повторов')
+        return stats
+
+
+class AsyncBulkIndexer(BaseBulkIndexer):
+    """Асинхронный вариант BulkIndexer для AsyncElasticsearch"""
+
+    client: AsyncElasticsearch
+
+    async def run(self, actions: Iterable[BulkAction]) -> BulkStats:
+        """
+        Отправляет операции в Elasticsearch.
+
+        Args:
+            actions: Операции для отправки
+
+        Returns:
+            Статистика загрузки
+        """
+        stats = BulkStats()
+        start = time.perf_counter()
+
+        if self.disable_refresh:
+            async with async_refresh_disabled(self.client, self.index_name):
+                await self._run_chunks(actions, stats)
+        else:
+            await self._run_chunks(actions, stats)
+
+        stats.elapsed = time.perf_counter() - start
+        self._log_stats(stats)
+
+        return stats
+
+    async def _run_chunks(
+        self,
+        actions: Iterable[BulkAction],
+        stats: BulkStats,
+    ) -> None:
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        tasks = []
+
+        async def send(chunk: list[SerializedAction]) -> BulkStats:
+            try:
+                return await self._send_chunk(chunk)
+            finally:
+                semaphore.release()
+
+        for chunk in iter_chunks(
+            actions,
+            self.chunk_size,
+            self.max_chunk_bytes,
+        ):
+            await semaphore.acquire()
+            tasks.append(asyncio.create_task(send(chunk)))
+
+        for chunk_stats in await asyncio.gather(*tasks):
+            stats.merge(chunk_stats)
+
+    async def _send_chunk(self, chunk: list[SerializedAction]) -> BulkStats:
+        stats = BulkStats(chunks=1)
+        pending = chunk
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self.client.bulk(
+                    index=self.index_name,
+                    operations=chunk_operations(pending),
+                )
+            except ApiError as e:
+                if e.meta.status != RETRYABLE_STATUS:
+                    fail_chunk(pending, stats, e.meta.status, str(e))
+                    return stats
+                rejected = pending
+            else:
+                rejected = process_bulk_response(pending, response, stats)
+
+            if not rejected:
+                return stats
+
+            if attempt < self.max_retries:
+                stats.retried += len(rejected)
+                await asyncio.sleep(
+                    backoff_delay(attempt, self.initial_backoff),
+                )
+            pending = rejected
+
+        fail_chunk(pending, stats, RETRYABLE_STATUS, 'Превышено число повторов')
+        return stats
+
+
+def _get_refresh_intervals(response: dict[str, Any]) -> dict[str, Any]:
+    return {
+        index: settings['settings'].get('index', {}).get('refresh_interval')
+        for index, settings in response.items()
+    }
+
+
+@contextmanager
+def refresh_disabled(client: Elasticsearch, index_name: str) -> Iterator[None]:
+    """
+    Отключает обновление индекса на время загрузки
+    и восстанавливает прежнее значение refresh_interval.
+    """
+    response = client.indices.get_settings(
+        index=index_name,
+        name='index.refresh_interval',
+    )
+    previous = _get_refresh_intervals(response)
+
+    client.indices.put_settings(
+        index=index_name,
+        settings={'index': {'refresh_interval': '-1'}},
+    )
+    try:
+        yield
+    finally:
+        for index, refresh_interval in previous.items():
+            client.indices.put_settings(
+                index=index,
+                settings={'index': {'refresh_interval': refresh_interval}},
+            )
+        client.indices.refresh(index=index_name)
+
+
+@asynccontextmanager
+async def async_refresh_disabled(
+    client: AsyncElasticsearch,
+    index_name: str,
+) -> AsyncIterator[None]:
+    """Асинхронный вариант refresh_disabled"""
+    response = await client.indices.get_settings(
+        index=index_name,
+        name='index.refresh_interval',
+    )
+    previous = _get_refresh_intervals(response)
+
+    await client.indices.put_settings(
+        index=index_name,
+        settings={'index': {'refresh_interval': '-1'}},
+    )
+    try:
+        yield
+    finally:
+        for index, refresh_interval in previous.items():
+            await client.indices.put_settings(
+                index=index,
+                settings={'index': {'refresh_interval': refresh_interval}},
+            )
+        await client.indices.refresh(index=index_name)
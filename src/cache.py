@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import copy
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import cache
+from typing import Any, Protocol
+
+from src.constants import (
+    RESULT_CACHE_BACKEND,
+    RESULT_CACHE_MAX_SIZE,
+    RESULT_CACHE_PATH,
+    RESULT_CACHE_TTL,
+)
+from src.serialization import dumps, loads
+
+SearchResults = list[dict[str, Any]]
+
+
+class CacheBackend(Protocol):
+    """Хранилище записей кеша результатов поиска"""
+
+    def get(self, key: str) -> tuple[SearchResults, float] | None: ...
+
+    def set(
+        self,
+        key: str,
+        value: SearchResults,
+        expires_at: float,
+    ) -> None: ...
+
+    def delete(self, key: str) -> None: ...
+
+    def clear(self) -> None: ...
+
+
+class MemoryCacheBackend:
+    """LRU-кеш в памяти процесса"""
+
+    def __init__(self, max_size: int = RESULT_CACHE_MAX_SIZE) -> None:
+        self.max_size = max_size
+        self._entries: OrderedDict[str, tuple[SearchResults, float]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> tuple[SearchResults, float] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        value, expires_at = entry
+        return copy.deepcopy(value), expires_at
+
+    def set(self, key: str, value: SearchResults, expires_at: float) -> None:
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskCacheBackend:
+    """Кеш на диске в базе SQLite, переживает перезапуск процесса"""
+
+    def __init__(
+        self,
+        path: str = RESULT_CACHE_PATH,
+        max_size: int = RESULT_CACHE_MAX_SIZE,
+    ) -> None:
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'key TEXT PRIMARY KEY, value TEXT, expires_at REAL, '
+            'accessed_at REAL)',
+        )
+        self._connection.commit()
+
+    def get(self, key: str) -> tuple[SearchResults, float] | None:
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT value, expires_at FROM results WHERE key = ?',
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                'UPDATE results SET accessed_at = ? WHERE key = ?',
+                (time.time(), key),
+            )
+            self._connection.commit()
+        return loads(row[0]), row[1]
+
+    def set(self, key: str, value: SearchResults, expires_at: float) -> None:
+        serialized = dumps(value)
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                (key, serialized, expires_at, time.time()),
+            )
+            self._connection.execute(
+                'DELETE FROM results WHERE key IN ('
+                'SELECT key FROM results ORDER BY accessed_at DESC '
+                'LIMIT -1 OFFSET ?)',
+                (self.max_size,),
+            )
+            self._connection.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._connection.execute(
+                'DELETE FROM results WHERE key = ?',
+                (key,),
+            )
+            self._connection.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute('DELETE FROM results')
+            self._connection.commit()
+
+
+class ResultCache:
+    """
+    Кеш результатов поиска с TTL.
+
+    Ключ записи строится из названия поискового движка, индекса,
+    нормализованного запроса и количества результатов. При изменении
+    индекса кеш сбрасывается через invalidate().
+    """
+
+    def __init__(
+        self,
+        backend: CacheBackend | None,
+        ttl: float = RESULT_CACHE_TTL,
+    ) -> None:
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        return ' '.join(query.lower().split())
+
+    def make_key(
+        self,
+        engine: str,
+        index_name: str,
+        query: str,
+        size: int,
+    ) -> str:
+        return f'{engine}|{index_name}|{size}|{self.normalize_query(query)}'
+
+    def get(self, key: str) -> SearchResults | None:
+        """Результаты из кеша или None, если записи нет или она устарела"""
+        if self.backend is None:
+            return None
+
+        entry = self.backend.get(key)
+        if entry is not None and entry[1] < time.time():
+            self.backend.delete(key)
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key: str, value: SearchResults) -> None:
+        if self.backend is not None:
+            self.backend.set(key, value, time.time() + self.ttl)
+
+    def invalidate(self) -> None:
+        """Сброс кеша после изменения индекса"""
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self) -> dict[str, float]:
+        """Счетчики попаданий и промахов кеша"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+@cache
+def get_result_cache() -> ResultCache:
+    """
+    Общий кеш результатов поиска. Хранилище выбирается переменной
+    окружения RESULT_CACHE_BACKEND: memory, disk или none.
+    """
+    backend_name = os.getenv('RESULT_CACHE_BACKEND', RESULT_CACHE_BACKEND)
+    ttl = float(os.getenv('RESULT_CACHE_TTL', RESULT_CACHE_TTL))
+
+    backend: CacheBackend | None
+    if backend_name == 'memory':
+        backend = MemoryCacheBackend()
+    elif backend_name == 'disk':
+        backend = DiskCacheBackend(
+            os.getenv('RESULT_CACHE_PATH', RESULT_CACHE_PATH),
+        )
+    elif backend_name == 'none':
+        backend = None
+    else:
+        raise ValueError(f'Неизвестный тип кеша: {backend_name}')
+
+    return ResultCache(backend, ttl=ttl)
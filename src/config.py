@@ -1,6 +1,16 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Any
+
+from src.constants import EMBEDDING_DIMS
+from src.eval.category_matcher import match_categories
 from src.eval.tech_categories import COMMON_TERMS
 from src.utils import detect_tech_category
 
+# Заглушка на месте поискового запроса в шаблоне тела запроса
+QUERY_PLACEHOLDER = '{{query}}'
+
 INDEX_SETTINGS = {
     'settings': {
         'analysis': {
@@ -140,6 +150,22 @@ INDEX_SETTINGS = {
                 },
             },
             'last_position_end_date': {'type': 'date'},
+            'content_hash': {'type': 'keyword'},
+            # Эмбеддинг документа от дообученной BERT модели для kNN поиска
+            'embedding': {
+                'type': 'dense_vector',
+                'dims': EMBEDDING_DIMS,
+                'index': True,
+                'similarity': 'cosine',
+                'index_options': {
+                    'type': 'hnsw',
+                    'm': 16,
+                    'ef_construction': 100,
+                },
+            },
+            'embedding_fingerprint': {'type': 'keyword'},
+            # Признаки документа только хранятся в _source и не индексируются
+            'features': {'type': 'object', 'enabled': False},
             'positions': {
                 'type': 'nested',
                 'properties': {
@@ -208,17 +234,44 @@ INDEX_SETTINGS = {
 }
 
 
-def get_search_body(query: str) -> dict:
+def _build_search_template() -> dict:
     """
-    Улучшенная функция поиска с поддержкой различных типов запросов.
-
-    Args:
-        query: Поисковый запрос
+    Статичная часть тела запроса к Elasticsearch.
 
-    Returns:
-        Тело запроса к Elasticsearch
+    Вместо поискового запроса подставлена заглушка QUERY_PLACEHOLDER.
+    Шаблон строится один раз при импорте модуля.
     """
+    # Поиск в описании позиции
+    position_description_query = {
+        'nested': {
+            'path': 'positions.description.blocks',
+            'query': {
+                'bool': {
+                    'should': [
+                        {
+                            'match': {
+                                'positions.description.blocks.data.text': {
+                                    'query': QUERY_PLACEHOLDER,
+                                    'boost': 5,
+                                },
+                            },
+                        },
+                        {
+                            'match': {
+                                'positions.description.blocks.data.items': {
+                                    'query': QUERY_PLACEHOLDER,
+                                    'boost': 5,
+                                },
+                            },
+                        },
+                    ],
+                },
+            },
+            'score_mode': 'max',
+        },
+    }
     search_body = {
+        '_source': {'excludes': ['embedding']},
         'query': {
             'function_score': {
                 'query': {
@@ -227,7 +280,7 @@ def get_search_body(query: str) -> dict:
                             # Поиск по основным полям документа
                             {
                                 'multi_match': {
-                                    'query': query,
+                                    'query': QUERY_PLACEHOLDER,
                                     'fields': [
                                         'title^5',
                                         'title.shingle^4',
@@ -251,7 +304,7 @@ def get_search_body(query: str) -> dict:
                                     'path': 'tags',
                                     'query': {
                                         'multi_match': {
-                                            'query': query,
+                                            'query': QUERY_PLACEHOLDER,
                                             'fields': [
                                                 'tags.caption^4',
                                                 'tags.seo_description^2',
@@ -270,7 +323,7 @@ def get_search_body(query: str) -> dict:
                                     'path': 'company.directions',
                                     'query': {
                                         'multi_match': {
-                                            'query': query,
+                                            'query': QUERY_PLACEHOLDER,
                                             'fields': [
                                                 'company.directions.caption',
                                                 'company.directions.alias',
@@ -287,7 +340,7 @@ def get_search_body(query: str) -> dict:
                                     'path': 'company.industries',
                                     'query': {
                                         'multi_match': {
-                                            'query': query,
+                                            'query': QUERY_PLACEHOLDER,
                                             'fields': [
                                                 'company.industries.name^3',
                                             ],
@@ -300,7 +353,7 @@ def get_search_body(query: str) -> dict:
                             # Поиск по основным полям компании
                             {
                                 'multi_match': {
-                                    'query': query,
+                                    'query': QUERY_PLACEHOLDER,
                                     'fields': [
                                         'company.caption^4',
                                         'company.seo_description',
@@ -313,7 +366,7 @@ def get_search_body(query: str) -> dict:
                             # Поиск по типу публикации
                             {
                                 'multi_match': {
-                                    'query': query,
+                                    'query': QUERY_PLACEHOLDER,
                                     'fields': [
                                         'publication_type.name^2',
                                         'publication_type.alias',
@@ -324,7 +377,7 @@ def get_search_body(query: str) -> dict:
                             # Поиск по полям направления
                             {
                                 'multi_match': {
-                                    'query': query,
+                                    'query': QUERY_PLACEHOLDER,
                                     'fields': [
                                         'direction.caption',
                                         'direction.alias',
@@ -343,7 +396,7 @@ def get_search_body(query: str) -> dict:
                                                 {
                                                     'match': {
                                                         'positions.name': {
-                                                            'query': query,
+                                                            'query': QUERY_PLACEHOLDER,
                                                             'boost': 10,  # Высокий буст для точного совпадения в названии позиции
                                                             'fuzziness': 'AUTO',
                                                         },
@@ -353,7 +406,7 @@ def get_search_body(query: str) -> dict:
                                                 {
                                                     'match': {
                                                         'positions.name.ngram': {
-                                                            'query': query,
+                                                            'query': QUERY_PLACEHOLDER,
                                                             'boost': 6,  # Высокий буст для частичных совпадений
                                                         },
                                                     },
@@ -362,40 +415,12 @@ def get_search_body(query: str) -> dict:
                                                 {
                                                     'match': {
                                                         'positions.name.shingle': {
-                                                            'query': query,
+                                                            'query': QUERY_PLACEHOLDER,
                                                             'boost': 8,  # Высокий буст для словосочетаний
                                                         },
                                                     },
                                                 },
-                                                # Поиск в описании позиции
-                                                {
-                                                    'nested': {
-                                                        'path': 'positions.description.blocks',
-                                                        'query': {
-                                                            'bool': {
-                                                                'should': [
-                                                                    {
-                                                                        'match': {
-                                                                            'positions.description.blocks.data.text': {
-                                                                                'query': query,
-                                                                                'boost': 5,
-                                                                            },
-                                                                        },
-                                                                    },
-                                                                    {
-                                                                        'match': {
-                                                                            'positions.description.blocks.data.items': {
-                                                                                'query': query,
-                                                                                'boost': 5,
-                                                                            },
-                                                                        },
-                                                                    },
-                                                                ],
-                                                            },
-                                                        },
-                                                        'score_mode': 'max',
-                                                    },
-                                                },
+                                                position_description_query,
                                                 # Поиск в сферах позиции
                                                 {
                                                     'nested': {
@@ -403,7 +428,7 @@ def get_search_body(query: str) -> dict:
                                                         'query': {
                                                             'match': {
                                                                 'positions.spheres.caption': {
-                                                                    'query': query,
+                                                                    'query': QUERY_PLACEHOLDER,
                                                                     'boost': 6,
                                                                 },
                                                             },
@@ -449,58 +474,166 @@ def get_search_body(query: str) -> dict:
         ],
     }
 
-    tech_categories = detect_tech_category(query)
+    return search_body
 
-    if tech_categories:
-        query_terms = []
-        fields_to_search = [
-            'positions.name^10',
-            'positions.description.blocks.data.text^5',
-            'title^3',
-            'description',
-        ]
 
-        for tech, terms in tech_categories.items():
-            query_terms.append(tech)
-
-            # Проверяем, является ли запрос техническим термином
-            is_technical_term = True
-            for common_term in COMMON_TERMS:
-                if common_term in query.lower():
-                    is_technical_term = False
-                    break
-
-            # Если запрос - технический термин,
-            #   добавляем больше специфичных терминов
-            # Если общий - добавляем больше общих категорий
-            if is_technical_term:
-                specific_terms = [
-                    term for term in terms if term not in COMMON_TERMS
-                ]
-                query_terms.extend(specific_terms[:3])
-            else:
-                common_terms = [term for term in terms if term in COMMON_TERMS]
-                query_terms.extend(common_terms)
-
-        unique_terms = list(set(query_terms))
-
-        search_body['query']['function_score']['functions'].append({
-            'filter': {
-                'multi_match': {
-                    'query': ' '.join(unique_terms),
-                    'fields': fields_to_search,
-                    'type': 'best_fields',
-                    'operator': 'OR',
-                },
+def _find_query_slots(node: Any) -> dict | bool | None:
+    """
+    Находит места подстановки запроса в шаблоне.
+
+    Returns:
+        True для заглушки, словарь {ключ: вложенные места} для контейнеров
+        с заглушками внутри, None если заглушек нет
+    """
+    if isinstance(node, dict):
+        children = node.items()
+    elif isinstance(node, list):
+        children = enumerate(node)
+    else:
+        return True if node == QUERY_PLACEHOLDER else None
+
+    slots = {}
+    for key, child in children:
+        child_slots = _find_query_slots(child)
+        if child_slots is not None:
+            slots[key] = child_slots
+    return slots or None
+
+
+def _fill_query_slots(node: Any, slots: dict | bool, query: str) -> Any:
+    """
+    Подставляет запрос в шаблон, копируя только контейнеры на пути
+    к заглушкам. Остальные части шаблона переиспользуются без копирования.
+    """
+    if slots is True:
+        return query
+
+    filled = node.copy()
+    for key, child_slots in slots.items():
+        filled[key] = _fill_query_slots(node[key], child_slots, query)
+    return filled
+
+
+SEARCH_TEMPLATE = _build_search_template()
+_QUERY_SLOTS = _find_query_slots(SEARCH_TEMPLATE)
+
+
+@lru_cache(maxsize=1024)
+def _tech_boost_terms(query_lower: str) -> tuple[str | None, bool]:
+    """
+    Термины буста по технической категории запроса.
+
+    Кешируются только неизменяемые значения: словарь буста
+    вставляется в тело запроса и собирается заново в get_tech_boost.
+
+    Returns:
+        Термины фильтра через пробел (или None, если категория
+        не определена) и признак узкоспециализированного запроса
+    """
+    tech_categories = detect_tech_category(query_lower)
+
+    if not tech_categories:
+        return None, False
+
+    query_terms = []
+
+    # Проверяем, является ли запрос техническим термином
+    is_technical_term = not any(
+        common_term in query_lower for common_term in COMMON_TERMS
+    )
+
+    for tech, terms in tech_categories.items():
+        query_terms.append(tech)
+
+        # Если запрос - технический термин,
+        #   добавляем больше специфичных терминов
+        # Если общий - добавляем больше общих категорий
+        if is_technical_term:
+            specific_terms = [
+                term for term in terms if term not in COMMON_TERMS
+            ]
+            query_terms.extend(specific_terms[:3])
+        else:
+            common_terms = [term for term in terms if term in COMMON_TERMS]
+            query_terms.extend(common_terms)
+
+    unique_terms = list(set(query_terms))
+
+    # Для узкоспециализированных запросов добавляем фильтрацию нерелевантных
+    # результатов
+    is_narrow = len(query_lower.split()) <= 2 and not (
+        match_categories(query_lower).by_key.isdisjoint(tech_categories)
+    )
+
+    return ' '.join(unique_terms), is_narrow
+
+
+def get_tech_boost(query_lower: str) -> tuple[dict | None, bool]:
+    """
+    Буст по технической категории запроса.
+
+    Словарь буста создается при каждом вызове, поэтому его можно
+    изменять вместе с телом запроса.
+
+    Args:
+        query_lower: Поисковый запрос в нижнем регистре
+
+    Returns:
+        Функция буста для function_score (или None, если категория
+        не определена) и признак узкоспециализированного запроса
+    """
+    terms, is_narrow = _tech_boost_terms(query_lower)
+
+    if terms is None:
+        return None, False
+
+    tech_boost = {
+        'filter': {
+            'multi_match': {
+                'query': terms,
+                'fields': [
+                    'positions.name^10',
+                    'positions.description.blocks.data.text^5',
+                    'title^3',
+                    'description',
+                ],
+                'type': 'best_fields',
+                'operator': 'OR',
             },
-            'weight': 2.0,
-        })
-
-        # Для узкоспециализированных запросов добавляем фильтрацию нерелевантных
-        # результатов
-        if len(query.split()) <= 2 and any(
-            tech in query.lower() for tech in tech_categories.keys()
-        ):
+        },
+        'weight': 2.0,
+    }
+
+    return tech_boost, is_narrow
+
+
+def get_search_body(query: str) -> dict:
+    """
+    Улучшенная функция поиска с поддержкой различных типов запросов.
+
+    Тело запроса собирается из заранее построенного шаблона SEARCH_TEMPLATE:
+    заново создаются только словари, содержащие запрос, и буст
+    по технической категории. Общие части шаблона не копируются,
+    поэтому менять можно только ключи верхнего уровня результата.
+
+    Args:
+        query: Поисковый запрос
+
+    Returns:
+        Тело запроса к Elasticsearch
+    """
+    search_body = _fill_query_slots(SEARCH_TEMPLATE, _QUERY_SLOTS, query)
+
+    tech_boost, is_narrow = get_tech_boost(query.lower())
+
+    if tech_boost is not None:
+        function_score = search_body['query']['function_score']
+        function_score['functions'] = [
+            *function_score['functions'],
+            tech_boost,
+        ]
+
+        if is_narrow:
             search_body['min_score'] = 1.0
 
     return search_body
@@ -15,7 +15,9 @@ BAD_WORDS = {
     '</a>',
 }
 
-PARSER_RESULT_FILENAME = 'parser_result.json'
+# Результаты парсера в JSON Lines со сжатием (см. src/storage.py)
+PARSER_RESULT_FILENAME = 'parser_result.jsonl.gz'
+LEGACY_PARSER_RESULT_FILENAME = 'parser_result.json'
 
 EVALUATION_QUERIES = [
     'Python',
@@ -31,6 +33,75 @@ EVALUATION_QUERIES = [
 ]
 
 
-BERT_TRAINING_BATCH_SIZE = 4
+# Пачки обучения собираются по длине пар (см. src/bert/batching.py):
+# не больше BERT_TRAINING_MAX_TOKENS токенов запросов и документов
+# после дополнения и не больше BERT_TRAINING_MAX_BATCH_SIZE пар
+BERT_TRAINING_MAX_TOKENS = 4096
+BERT_TRAINING_MAX_BATCH_SIZE = 64
 BERT_TRAINING_EPOCHS = 5
 BERT_PRETRAINED_MODEL_NAME = 'sberbank-ai/sbert_large_mt_nlu_ru'
+
+# Параметры загрузки документов через _bulk API
+BULK_CHUNK_SIZE = 500
+BULK_MAX_CHUNK_BYTES = 10 * 1024 * 1024
+BULK_MAX_IN_FLIGHT = 4
+BULK_MAX_RETRIES = 5
+BULK_INITIAL_BACKOFF = 0.5
+
+# Пересборка индекса: версии вида internships_v<N> за алиасом INDEX_NAME
+INDEX_KEEP_VERSIONS = 1
+REBUILD_MAX_IN_FLIGHT = 1
+
+# Параметры подключения к Elasticsearch
+# (переопределяются переменными окружения ELASTICSEARCH_*)
+ES_CONNECTIONS_PER_NODE = 10
+ES_REQUEST_TIMEOUT = 30.0
+ES_MAX_RETRIES = 3
+ES_RETRY_ON_TIMEOUT = True
+ES_KEEP_ALIVE = True
+
+# Максимальное количество запросов в одном запросе _msearch
+MSEARCH_BATCH_SIZE = 50
+
+# Кеш результатов поиска (RESULT_CACHE_BACKEND: memory, disk или none)
+RESULT_CACHE_BACKEND = 'memory'
+RESULT_CACHE_TTL = 600.0
+RESULT_CACHE_MAX_SIZE = 1024
+RESULT_CACHE_PATH = 'result_cache.sqlite'
+
+# Параметры переранжирования BERT моделью
+BERT_MAX_LENGTH = 512
+BERT_RERANK_BATCH_SIZE = 16
+BERT_RERANK_MAX_TOKENS = 8192
+# Переранжирование int8-квантованной моделью на CPU
+# (сравнение с исходной моделью: python -m src.bench.quantization)
+BERT_QUANTIZED_INFERENCE = False
+
+# Хранилище предвычисленных эмбеддингов документов
+EMBEDDING_STORE_DIR = 'embedding_store'
+EMBEDDING_STORE_DTYPE = 'float16'
+
+# Кеш токенов обучающих пар (см. src/bert/token_store.py)
+TOKEN_STORE_DIR = 'token_store'
+
+# Векторный поиск по эмбеддингам документов
+EMBEDDING_DIMS = 1024
+KNN_NUM_CANDIDATES = 100
+RRF_RANK_CONSTANT = 60
+
+# Локальный ANN-индекс по эмбеддингам документов (IVF)
+ANN_INDEX_DIR = 'ann_index'
+ANN_NPROBE = 8
+ANN_KMEANS_ITERATIONS = 20
+
+# Параметры обхода сайта парсером
+CRAWL_CONCURRENCY = 8
+CRAWL_PREFETCH_PAGES = 2
+CRAWL_RATE_LIMIT = 10.0  # Запросов в секунду к одному хосту
+CRAWL_MAX_RETRIES = 5
+CRAWL_INITIAL_BACKOFF = 0.5
+CRAWL_MAX_BACKOFF = 30.0
+CRAWL_REQUEST_TIMEOUT = 30.0
+CRAWL_STREAM_FILENAME = 'parser_result.jsonl'
+CRAWL_CHECKPOINT_FILENAME = 'parser_checkpoint.json'
+CRAWL_HTTP_CACHE_PATH = 'http_cache.sqlite'
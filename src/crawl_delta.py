@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from typing import Any
+
+from src.utils import compute_content_hash
+
+
+@dataclass
+class CrawlDelta:
+    """Изменения каталога стажировок между двумя обходами"""
+
+    added: list[dict[str, Any]] = field(default_factory=list)
+    changed: list[dict[str, Any]] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.added or self.changed or self.removed)
+
+    def __str__(self) -> str:
+        return (
+            f'добавлено {len(self.added)}, изменено {len(self.changed)}, '
+            f'удалено {len(self.removed)}'
+        )
+
+    @staticmethod
+    def snapshot_hashes(snapshot: Iterable[dict[str, Any]]) -> dict[str, str]:
+        """Хеши содержимого стажировок обхода по uuid"""
+        return {
+            internship['uuid']: compute_content_hash(internship)
+            for internship in snapshot
+        }
+
+    @classmethod
+    def from_snapshots(
+        cls,
+        previous: Iterable[dict[str, Any]] | None,
+        current: Iterable[dict[str, Any]],
+    ) -> CrawlDelta:
+        """
+        Сравнение результатов двух обходов по uuid и хешу содержимого.
+
+        Args:
+            previous: Результат предыдущего обхода (None, если его нет)
+            current: Результат текущего обхода
+
+        Returns:
+            Добавленные и измененные стажировки, uuid удаленных
+        """
+        return cls.from_hashes(cls.snapshot_hashes(previous or []), current)
+
+    @classmethod
+    def from_hashes(
+        cls,
+        previous_hashes: dict[str, str],
+        current: Iterable[dict[str, Any]],
+    ) -> CrawlDelta:
+        """
+        Сравнение текущего обхода с хешами предыдущего (см. snapshot_hashes).
+
+        Текущий обход читается один раз, в памяти остаются только
+        добавленные и измененные стажировки.
+
+        Args:
+            previous_hashes: Хеши содержимого предыдущего обхода по uuid
+            current: Результат текущего обхода
+
+        Returns:
+            Добавленные и измененные стажировки, uuid удаленных
+        """
+        delta = cls()
+        current_uuids = set()
+        for internship in current:
+            uuid = internship['uuid']
+            current_uuids.add(uuid)
+            previous_hash = previous_hashes.get(uuid)
+            if previous_hash is None:
+                delta.added.append(internship)
+            elif previous_hash != compute_content_hash(internship):
+                delta.changed.append(internship)
+
+        delta.removed = [
+            uuid for uuid in previous_hashes if uuid not in current_uuids
+        ]
+        return delta
@@ -1,32 +1,276 @@
 import logging
-import os
-from typing import Any
+import re
+import threading
+import time
+from collections.abc import Iterable, Iterator, Sequence
+from itertools import batched, chain
+from typing import Any, Protocol
 
-from elasticsearch import Elasticsearch
+from elasticsearch.helpers import scan
 
+from src.bulk import BulkAction, BulkIndexer, BulkStats
+from src.cache import get_result_cache
 from src.config import INDEX_SETTINGS, get_search_body
-from src.utils import convert_to_iso_format
+from src.constants import (
+    EVALUATION_QUERIES,
+    INDEX_KEEP_VERSIONS,
+    KNN_NUM_CANDIDATES,
+    MSEARCH_BATCH_SIZE,
+    REBUILD_MAX_IN_FLIGHT,
+    RRF_RANK_CONSTANT,
+)
+from src.crawl_delta import CrawlDelta
+from src.es_client import get_client
+from src.features import with_features
+from src.utils import compute_content_hash, convert_to_iso_format
 
-es = Elasticsearch(os.getenv('ELASTICSEARCH_URL'))
+
+class EmbeddingLookup(Protocol):
+    """Источник эмбеддингов документов (см. DocumentEmbeddingStore)"""
+
+    @property
+    def fingerprint(self) -> str: ...
+
+    def get(
+        self,
+        doc_id: str,
+        content_hash: str | None = None,
+    ) -> Sequence[float] | None: ...
 
 
 def create_index(index_name: str) -> None:
     """Создание индекса в Elasticsearch"""
+    es = get_client()
     if not es.indices.exists(index=index_name):
-        es.indices.create(index=index_name, body=INDEX_SETTINGS)
+        es.indices.create(index=index_name, body=get_index_body())
         logging.info('Индекс создан.')
     else:
         logging.warning('Индекс уже существует. Пропускаем создание.')
 
 
-def index_internships(json_data: dict, index_name: str) -> None:
-    """Индексирование данных о стажировках"""
-    for idx, internship in enumerate(json_data):
-        internship['last_position_end_date'] = convert_to_iso_format(
+def index_internships(
+    json_data: Iterable[dict],
+    index_name: str,
+    use_bulk: bool = True,
+    embedding_store: EmbeddingLookup | None = None,
+) -> BulkStats | None:
+    """
+    Индексирование данных о стажировках
+
+    Args:
+        json_data: Данные о стажировках (читаются один раз,
+            можно передать итератор, например iter_documents)
+        index_name: Название индекса
+        use_bulk: Загружать документы пачками через _bulk API.
+            При False документы индексируются по одному запросу на документ.
+        embedding_store: Эмбеддинги документов для векторного поиска
+
+    Returns:
+        Статистика загрузки (только для _bulk API)
+    """
+    if use_bulk:
+        stats = BulkIndexer(get_client(), index_name).run(
+            _iter_index_actions(json_data, embedding_store),
+        )
+        get_result_cache().invalidate()
+        return stats
+
+    es = get_client()
+    start = time.perf_counter()
+    count = 0
+    for internship in json_data:
+        document = prepare_document(
+            internship,
+            embedding_store=embedding_store,
+        )
+        es.index(index=index_name, id=internship['uuid'], document=document)
+        count += 1
+    elapsed = time.perf_counter() - start
+
+    logging.info(
+        f'{count} документов проиндексировано '
+        f'за {elapsed:.2f} с ({count / max(elapsed, 1e-9):.0f} док/с).',
+    )
+    get_result_cache().invalidate()
+    return None
+
+
+def sync_internships(
+    json_data: Iterable[dict],
+    index_name: str,
+    embedding_store: EmbeddingLookup | None = None,
+) -> BulkStats | None:
+    """
+    Инкрементальная синхронизация индекса с данными о стажировках.
+
+    Документы идентифицируются по uuid стажировки. Для каждого документа
+    в индексе хранится хеш содержимого, поэтому отправляются только новые
+    и измененные документы, а отсутствующие в данных удаляются.
+    Если передано хранилище эмбеддингов, документ также
+    переиндексируется, когда для него появился или изменился эмбеддинг.
+
+    Данные читаются один раз и не накапливаются в памяти: в памяти
+    хранятся только хеши документов индекса и uuid прочитанных.
+
+    Args:
+        json_data: Данные о стажировках (можно передать итератор,
+            например iter_documents)
+        index_name: Название индекса
+        embedding_store: Эмбеддинги документов для векторного поиска
+
+    Returns:
+        Статистика загрузки или None, если индекс уже актуален
+    """
+    indexed_hashes = get_indexed_hashes(index_name)
+    actions = _iter_sync_actions(json_data, indexed_hashes, embedding_store)
+
+    # Первая операция запрашивается заранее, чтобы не отключать
+    # обновление индекса, если изменений нет
+    first_action = next(actions, None)
+    if first_action is None:
+        logging.info('Индекс актуален, переиндексация не требуется.')
+        return None
+
+    logging.info('Синхронизация индекса: отправляем изменения.')
+    stats = BulkIndexer(get_client(), index_name).run(
+        chain([first_action], actions),
+    )
+    get_result_cache().invalidate()
+    return stats
+
+
+def _iter_sync_actions(
+    json_data: Iterable[dict],
+    indexed_hashes: dict[str, tuple[str | None, str | None]],
+    embedding_store: EmbeddingLookup | None = None,
+) -> Iterator[BulkAction]:
+    """Операции синхронизации: новые и измененные, затем удаленные"""
+    seen_uuids = set()
+    for internship in json_data:
+        uuid = internship['uuid']
+        seen_uuids.add(uuid)
+        content_hash = compute_content_hash(internship)
+        indexed_hash, indexed_fingerprint = indexed_hashes.get(
+            uuid,
+            (None, None),
+        )
+        # Без хранилища эмбеддинги документов в индексе не проверяются
+        # и не удаляются
+        if indexed_hash != content_hash or (
+            embedding_store is not None
+            and indexed_fingerprint
+            != _embedding_fingerprint(embedding_store, uuid, content_hash)
+        ):
+            yield BulkAction(
+                'index',
+                uuid,
+                prepare_document(internship, content_hash, embedding_store),
+            )
+
+    for uuid in indexed_hashes.keys() - seen_uuids:
+        yield BulkAction('delete', uuid)
+
+
+def apply_delta(
+    delta: CrawlDelta,
+    index_name: str,
+    embedding_store: EmbeddingLookup | None = None,
+) -> BulkStats | None:
+    """
+    Применение изменений каталога, найденных повторным обходом
+    (см. start_incremental_parsing), без сравнения со всем индексом.
+
+    Args:
+        delta: Добавленные, измененные и удаленные стажировки
+        index_name: Название индекса
+        embedding_store: Эмбеддинги документов для векторного поиска
+
+    Returns:
+        Статистика загрузки или None, если изменений нет
+    """
+    if delta.is_empty:
+        logging.info('Каталог не изменился, переиндексация не требуется.')
+        return None
+
+    actions = [
+        *_iter_index_actions(delta.added + delta.changed, embedding_store),
+        *(BulkAction('delete', uuid) for uuid in delta.removed),
+    ]
+    logging.info(f'Применение изменений каталога: {delta}.')
+    stats = BulkIndexer(get_client(), index_name).run(actions)
+    get_result_cache().invalidate()
+    return stats
+
+
+def get_indexed_hashes(
+    index_name: str,
+) -> dict[str, tuple[str | None, str | None]]:
+    """
+    Получение хешей содержимого и отпечатков эмбеддингов
+    всех документов индекса
+    """
+    return {
+        hit['_id']: (
+            hit['_source'].get('content_hash'),
+            hit['_source'].get('embedding_fingerprint'),
+        )
+        for hit in scan(
+            get_client(),
+            index=index_name,
+            query={'_source': ['content_hash', 'embedding_fingerprint']},
+            size=1000,
+        )
+    }
+
+
+def prepare_document(
+    internship: dict,
+    content_hash: str | None = None,
+    embedding_store: EmbeddingLookup | None = None,
+) -> dict[str, Any]:
+    """Подготовка документа стажировки к индексации (без изменения исходного)"""
+    content_hash = content_hash or compute_content_hash(internship)
+    # Признаки для оценки и переранжирования вычисляются один раз
+    # при индексации и хранятся в _source (см. src/features.py)
+    document = {
+        **with_features(internship),
+        'last_position_end_date': convert_to_iso_format(
             internship['last_position_end_date'],
+        ),
+        'content_hash': content_hash,
+    }
+
+    if embedding_store is not None:
+        embedding = embedding_store.get(internship['uuid'], content_hash)
+        if embedding is not None:
+            document['embedding'] = [float(value) for value in embedding]
+            document['embedding_fingerprint'] = embedding_store.fingerprint
+
+    return document
+
+
+def _embedding_fingerprint(
+    embedding_store: EmbeddingLookup | None,
+    doc_id: str,
+    content_hash: str,
+) -> str | None:
+    if embedding_store is None:
+        return None
+    if embedding_store.get(doc_id, content_hash) is None:
+        return None
+    return embedding_store.fingerprint
+
+
+def _iter_index_actions(
+    json_data: Iterable[dict],
+    embedding_store: EmbeddingLookup | None = None,
+) -> Iterator[BulkAction]:
+    for internship in json_data:
+        yield BulkAction(
+            'index',
+            internship['uuid'],
+            prepare_document(internship, embedding_store=embedding_store),
         )
-        es.index(index=index_name, id=idx, document=internship)
-    logging.info(f'{len(json_data)} документов проиндексировано.')
 
 
 def search_internships(
@@ -37,7 +281,389 @@ def search_internships(
     """
     Расширенный поиск стажировок с учетом множества полей и вложенных объектов
     """
+    result_cache = get_result_cache()
+    key = result_cache.make_key('elastic', index_name, query, size)
+    cached = result_cache.get(key)
+    if cached is not None:
+        return cached
+
     body = get_search_body(query)
     body['size'] = size
-    response = es.search(index=index_name, body=body)
-    return response['hits']['hits']
+    response = get_client().search(index=index_name, body=body)
+    hits = response['hits']['hits']
+
+    result_cache.set(key, hits)
+    return hits
+
+
+def search_internships_many(
+    queries: list[str],
+    index_name: str,
+    size: int = 10,
+) -> list[list[dict[str, Any]]]:
+    """
+    Поиск стажировок сразу по нескольким запросам через _msearch.
+
+    Запросы отправляются пачками по MSEARCH_BATCH_SIZE,
+    поэтому сотни запросов обходятся в несколько обращений к Elasticsearch.
+    Запросы, результаты которых есть в кеше, не отправляются.
+
+    Args:
+        queries: Поисковые запросы
+        index_name: Название индекса
+        size: Количество результатов на каждый запрос
+
+    Returns:
+        Результаты поиска в порядке запросов
+    """
+    result_cache = get_result_cache()
+    keys = [
+        result_cache.make_key('elastic', index_name, query, size)
+        for query in queries
+    ]
+    results = [result_cache.get(key) for key in keys]
+    missing = [idx for idx, hits in enumerate(results) if hits is None]
+
+    for batch in batched(missing, MSEARCH_BATCH_SIZE):
+        batch_queries = tuple(queries[idx] for idx in batch)
+        response = get_client().msearch(
+            searches=build_msearch_body(batch_queries, index_name, size),
+        )
+        batch_results = parse_msearch_response(batch_queries, response)
+        for idx, hits in zip(batch, batch_results, strict=True):
+            result_cache.set(keys[idx], hits)
+            results[idx] = hits
+
+    return results
+
+
+def build_msearch_body(
+    queries: tuple[str, ...],
+    index_name: str,
+    size: int,
+) -> list[dict[str, Any]]:
+    """Формирование тела запроса _msearch из тел get_search_body"""
+    searches = []
+    for query in queries:
+        body = get_search_body(query)
+        body['size'] = size
+        searches.extend([{'index': index_name}, body])
+    return searches
+
+
+def parse_msearch_response(
+    queries: tuple[str, ...],
+    response: dict[str, Any],
+) -> list[list[dict[str, Any]]]:
+    """Разбор ответа _msearch с сохранением порядка запросов"""
+    results = []
+    for query, item in zip(queries, response['responses'], strict=True):
+        if 'error' in item:
+            raise RuntimeError(
+                f'Ошибка поиска по запросу {query!r}: {item["error"]}',
+            )
+        results.append(item['hits']['hits'])
+    return results
+
+
+def hybrid_search_internships(
+    query: str,
+    query_vector: Sequence[float],
+    index_name: str,
+    size: int = 10,
+) -> list[dict[str, Any]]:
+    """
+    Гибридный поиск стажировок: BM25 и kNN по эмбеддингам документов.
+
+    Args:
+        query: Поисковый запрос
+        query_vector: Эмбеддинг запроса от дообученной BERT модели
+        index_name: Название индекса
+        size: Количество результатов
+
+    Returns:
+        Результаты, объединенные методом reciprocal rank fusion
+    """
+    return hybrid_search_internships_many(
+        [query],
+        [query_vector],
+        index_name,
+        size=size,
+    )[0]
+
+
+def hybrid_search_internships_many(
+    queries: list[str],
+    query_vectors: Sequence[Sequence[float]],
+    index_name: str,
+    size: int = 10,
+    num_candidates: int = KNN_NUM_CANDIDATES,
+    rank_constant: int = RRF_RANK_CONSTANT,
+) -> list[list[dict[str, Any]]]:
+    """
+    Гибридный поиск по нескольким запросам.
+
+    Для каждого запроса в один _msearch добавляются два поиска: BM25
+    с телом из get_search_body и kNN по полю embedding (HNSW).
+    Списки результатов объединяются методом reciprocal rank fusion.
+
+    Args:
+        queries: Поисковые запросы
+        query_vectors: Эмбеддинги запросов
+        index_name: Название индекса
+        size: Количество результатов на каждый запрос
+        num_candidates: Количество кандидатов kNN поиска на шард
+        rank_constant: Константа k в формуле RRF: 1 / (k + rank)
+
+    Returns:
+        Результаты поиска в порядке запросов
+    """
+    result_cache = get_result_cache()
+    keys = [
+        result_cache.make_key('hybrid', index_name, query, size)
+        for query in queries
+    ]
+    results = [result_cache.get(key) for key in keys]
+    missing = [idx for idx, hits in enumerate(results) if hits is None]
+
+    # На каждый запрос приходится два поиска в _msearch
+    for batch in batched(missing, max(MSEARCH_BATCH_SIZE // 2, 1)):
+        searches = []
+        batch_queries = []
+        for idx in batch:
+            bm25_body = get_search_body(queries[idx])
+            bm25_body['size'] = size
+            knn_body = {
+                '_source': {'excludes': ['embedding']},
+                'knn': {
+                    'field': 'embedding',
+                    'query_vector': [float(v) for v in query_vectors[idx]],
+                    'k': size,
+                    'num_candidates': max(num_candidates, size),
+                },
+                'size': size,
+            }
+            searches.extend([
+                {'index': index_name},
+                bm25_body,
+                {'index': index_name},
+                knn_body,
+            ])
+            batch_queries.extend([queries[idx], queries[idx]])
+
+        response = get_client().msearch(searches=searches)
+        hits_lists = parse_msearch_response(tuple(batch_queries), response)
+
+        for pos, idx in enumerate(batch):
+            fused = reciprocal_rank_fusion(
+                hits_lists[2 * pos : 2 * pos + 2],
+                rank_constant,
+            )[:size]
+            result_cache.set(keys[idx], fused)
+            results[idx] = fused
+
+    return results
+
+
+def reciprocal_rank_fusion(
+    hits_lists: list[list[dict[str, Any]]],
+    rank_constant: int = RRF_RANK_CONSTANT,
+) -> list[dict[str, Any]]:
+    """
+    Объединение нескольких ранжированных списков результатов
+    методом reciprocal rank fusion. В поле _score записывается оценка RRF.
+    """
+    scores: dict[str, float] = {}
+    hits_by_id: dict[str, dict[str, Any]] = {}
+
+    for hits in hits_lists:
+        for rank, hit in enumerate(hits, 1):
+            scores[hit['_id']] = (
+                scores.get(hit['_id'], 0.0) + 1 / (rank_constant + rank)
+            )
+            hits_by_id.setdefault(hit['_id'], hit)
+
+    fused = []
+    for doc_id in sorted(scores, key=scores.get, reverse=True):
+        fused.append({**hits_by_id[doc_id], '_score': scores[doc_id]})
+    return fused
+
+
+def get_index_body() -> dict[str, Any]:
+    """
+    Настройки индекса с отпечатком INDEX_SETTINGS в _meta маппинга,
+    по которому определяется необходимость пересборки индекса
+    """
+    return {
+        **INDEX_SETTINGS,
+        'mappings': {
+            **INDEX_SETTINGS['mappings'],
+            '_meta': {'settings_hash': compute_content_hash(INDEX_SETTINGS)},
+        },
+    }
+
+
+def get_index_versions(alias: str) -> list[int]:
+    """Номера существующих версий индекса вида <alias>_v<N>"""
+    pattern = re.compile(rf'^{re.escape(alias)}_v(\d+)$')
+    versions = []
+    for index in get_client().indices.get(index=f'{alias}_v*'):
+        match = pattern.match(index)
+        if match:
+            versions.append(int(match.group(1)))
+    return sorted(versions)
+
+
+def get_alias_targets(alias: str) -> list[str]:
+    """Индексы, на которые сейчас указывает алиас"""
+    if not get_client().indices.exists_alias(name=alias):
+        return []
+    return list(get_client().indices.get_alias(name=alias))
+
+
+def is_index_outdated(alias: str) -> bool:
+    """Проверяет, отличаются ли настройки индекса от INDEX_SETTINGS"""
+    mappings = get_client().indices.get_mapping(index=alias)
+    expected_hash = compute_content_hash(INDEX_SETTINGS)
+    return any(
+        mapping['mappings'].get('_meta', {}).get('settings_hash')
+        != expected_hash
+        for mapping in mappings.values()
+    )
+
+
+def rebuild_index(
+    json_data: Iterable[dict],
+    alias: str,
+    keep_versions: int = INDEX_KEEP_VERSIONS,
+    embedding_store: EmbeddingLookup | None = None,
+) -> str:
+    """
+    Пересборка индекса без простоя поиска.
+
+    Новая версия <alias>_v<N> заполняется через _bulk API,
+    прогревается и атомарно подключается к алиасу. Пока идет пересборка,
+    поиск по алиасу обслуживается предыдущей версией индекса.
+
+    Args:
+        json_data: Данные о стажировках (читаются один раз)
+        alias: Алиас, по которому выполняется поиск
+        keep_versions: Количество предыдущих версий,
+            которые сохраняются для отката
+        embedding_store: Эмбеддинги документов для векторного поиска
+
+    Returns:
+        Название новой версии индекса
+    """
+    versions = get_index_versions(alias)
+    new_index = f'{alias}_v{versions[-1] + 1 if versions else 1}'
+
+    logging.info(f'Пересборка индекса: создаем {new_index}.')
+    create_index(new_index)
+    BulkIndexer(
+        get_client(),
+        new_index,
+        max_in_flight=REBUILD_MAX_IN_FLIGHT,
+    ).run(_iter_index_actions(json_data, embedding_store))
+    warm_index(new_index)
+    switch_alias(alias, new_index)
+    get_result_cache().invalidate()
+    delete_old_versions(alias, keep_versions)
+
+    return new_index
+
+
+def start_index_rebuild(
+    json_data: Iterable[dict],
+    alias: str,
+    embedding_store: EmbeddingLookup | None = None,
+) -> threading.Thread:
+    """Запуск пересборки индекса в фоновом потоке"""
+    thread = threading.Thread(
+        target=rebuild_index,
+        args=(json_data, alias),
+        kwargs={'embedding_store': embedding_store},
+        name=f'rebuild-{alias}',
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+def ensure_index(
+    json_data: Iterable[dict],
+    alias: str,
+    embedding_store: EmbeddingLookup | None = None,
+) -> threading.Thread | None:
+    """
+    Подготовка индекса к поиску.
+
+    Если алиаса еще нет, индекс собирается сразу. Если настройки индекса
+    устарели, пересборка запускается в фоне, а поиск продолжает работать
+    по текущей версии. Иначе индекс синхронизируется инкрементально.
+
+    Args:
+        json_data: Данные о стажировках (читаются один раз)
+        alias: Алиас, по которому выполняется поиск
+        embedding_store: Эмбеддинги документов для векторного поиска
+
+    Returns:
+        Поток фоновой пересборки, если она была запущена
+    """
+    es = get_client()
+
+    if not es.indices.exists(index=alias):
+        rebuild_index(json_data, alias, embedding_store=embedding_store)
+        return None
+
+    if not es.indices.exists_alias(name=alias) or is_index_outdated(alias):
+        logging.info(
+            'Настройки индекса изменились, запускаем пересборку в фоне.',
+        )
+        return start_index_rebuild(json_data, alias, embedding_store)
+
+    sync_internships(json_data, alias, embedding_store)
+    return None
+
+
+def warm_index(index_name: str) -> None:
+    """Обновление, слияние сегментов и прогрев новой версии индекса"""
+    es = get_client()
+    es.indices.refresh(index=index_name)
+    es.indices.forcemerge(index=index_name, max_num_segments=1)
+    for query in EVALUATION_QUERIES:
+        search_internships(query, index_name)
+    logging.info(f'Индекс {index_name} прогрет.')
+
+
+def switch_alias(alias: str, new_index: str) -> None:
+    """Атомарное переключение алиаса на новую версию индекса"""
+    es = get_client()
+    actions: list[dict[str, Any]] = [
+        {'remove': {'index': index, 'alias': alias}}
+        for index in get_alias_targets(alias)
+    ]
+    if es.indices.exists(index=alias) and not es.indices.exists_alias(
+        name=alias,
+    ):
+        # Индекс из предыдущих версий, созданный под именем алиаса
+        actions.append({'remove_index': {'index': alias}})
+    actions.append({'add': {'index': new_index, 'alias': alias}})
+
+    es.indices.update_aliases(actions=actions)
+    logging.info(f'Алиас {alias} переключен на {new_index}.')
+
+
+def delete_old_versions(alias: str, keep_versions: int) -> None:
+    """Удаление устаревших версий индекса"""
+    current = set(get_alias_targets(alias))
+    old_indices = [
+        f'{alias}_v{version}'
+        for version in get_index_versions(alias)
+        if f'{alias}_v{version}' not in current
+    ]
+    stale = old_indices[: max(len(old_indices) - keep_versions, 0)]
+
+    for index in stale:
+        get_client().indices.delete(index=index)
+        logging.info(f'Удалена устаревшая версия индекса {index}.')
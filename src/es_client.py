@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import os
+from functools import cache
+from typing import Any
+
+from elasticsearch import AsyncElasticsearch, Elasticsearch
+
+from src.constants import (
+    ES_CONNECTIONS_PER_NODE,
+    ES_KEEP_ALIVE,
+    ES_MAX_RETRIES,
+    ES_REQUEST_TIMEOUT,
+    ES_RETRY_ON_TIMEOUT,
+)
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in {'1', 'true', 'yes', 'y'}
+
+
+def get_client_options() -> dict[str, Any]:
+    """
+    Параметры пула соединений Elasticsearch.
+
+    Значения по умолчанию берутся из constants.py и могут быть
+    переопределены переменными окружения ELASTICSEARCH_*.
+    """
+    keep_alive = _env_bool('ELASTICSEARCH_KEEP_ALIVE', ES_KEEP_ALIVE)
+
+    return {
+        'hosts': os.getenv('ELASTICSEARCH_URL'),
+        'connections_per_node': int(
+            os.getenv(
+                'ELASTICSEARCH_CONNECTIONS_PER_NODE',
+                ES_CONNECTIONS_PER_NODE,
+            ),
+        ),
+        'request_timeout': float(
+            os.getenv('ELASTICSEARCH_REQUEST_TIMEOUT', ES_REQUEST_TIMEOUT),
+        ),
+        'max_retries': int(
+            os.getenv('ELASTICSEARCH_MAX_RETRIES', ES_MAX_RETRIES),
+        ),
+        'retry_on_timeout': _env_bool(
+            'ELASTICSEARCH_RETRY_ON_TIMEOUT',
+            ES_RETRY_ON_TIMEOUT,
+        ),
+        'headers': {'connection': 'keep-alive' if keep_alive else 'close'},
+    }
+
+
+@cache
+def get_client() -> Elasticsearch:
+    """Синхронный клиент Elasticsearch, создается при первом обращении"""
+    return Elasticsearch(**get_client_options())
+
+
+@cache
+def get_async_client() -> AsyncElasticsearch:
+    """Асинхронный клиент Elasticsearch, создается при первом обращении"""
+    return AsyncElasticsearch(**get_client_options())
+
+
+async def close_async_client() -> None:
+    """Закрытие пула соединений асинхронного клиента"""
+    # Клиент, который еще не создан, не создается ради закрытия
+    if get_async_client.cache_info().currsize:
+        await get_async_client().close()
+        get_async_client.cache_clear()
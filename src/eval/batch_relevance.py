@@ -0,0 +1,323 @@
+from __future__ import annotations
+
+from collections.abc import Hashable, Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from src.eval.category_matcher import match_categories
+from src.eval.relevance_calculator import RelevanceCalculator
+from src.eval.tech_categories import (
+    COMMON_TERMS,
+    RELEVANCE_WEIGHTS,
+    TERM_WEIGHTS,
+)
+from src.features import get_features
+from src.utils import make_query_variants
+
+_COMMON_TERMS = frozenset(COMMON_TERMS)
+
+
+@dataclass(slots=True)
+class QueryFeatures:
+    """Признаки запроса, вычисляемые один раз на пакет"""
+
+    text: str
+    parts: list[str]
+    # Категории, название или термин которых входит в запрос
+    categories: frozenset[str]
+    # Категории, название которых входит в один из вариантов запроса
+    variant_techs: frozenset[str]
+    # Категории, название которых входит в запрос
+    techs: frozenset[str]
+
+    @classmethod
+    def from_query(cls, query: str) -> QueryFeatures:
+        text = query.lower().strip()
+        query_match = match_categories(text)
+        return cls(
+            text=text,
+            parts=text.split(),
+            categories=query_match.by_key | query_match.by_term,
+            variant_techs=frozenset().union(
+                *(
+                    match_categories(variant).by_key
+                    for variant in make_query_variants(text)
+                ),
+            ),
+            techs=query_match.by_key,
+        )
+
+
+@dataclass(slots=True)
+class PositionFeatures:
+    name: str | None
+    # Категории по названию и терминам в названии позиции
+    name_categories: frozenset[str]
+    # Категории по терминам в названиях сфер позиции
+    sphere_terms: frozenset[str]
+
+
+@dataclass(slots=True)
+class DocumentFeatures:
+    """Признаки документа, вычисляемые один раз на пакет"""
+
+    title: str | None
+    title_words: list[str]
+    title_categories: frozenset[str]
+    description: str | None
+    description_words: list[str]
+    description_categories: frozenset[str]
+    positions: list[PositionFeatures]
+    # Категории по терминам во всем тексте документа
+    text_terms: frozenset[str]
+
+    @classmethod
+    def from_source(cls, source: dict[str, Any]) -> DocumentFeatures:
+        features = get_features(source)
+        title = features['title']
+        description = features['description']
+
+        positions = [
+            PositionFeatures(
+                name=name,
+                name_categories=(
+                    _all_categories(name) if name is not None else frozenset()
+                ),
+                sphere_terms=frozenset().union(
+                    *(
+                        match_categories(caption).by_term
+                        for caption in sphere_captions
+                    ),
+                ),
+            )
+            for name, sphere_captions in zip(
+                features['position_names'],
+                features['sphere_captions'],
+                strict=True,
+            )
+        ]
+
+        return cls(
+            title=title,
+            title_words=title.split() if title is not None else [],
+            title_categories=(
+                _all_categories(title) if title is not None else frozenset()
+            ),
+            description=description,
+            description_words=(
+                description.split() if description is not None else []
+            ),
+            description_categories=(
+                _all_categories(description) if description is not None
+                else frozenset()
+            ),
+            positions=positions,
+            text_terms=match_categories(features['text']).by_term,
+        )
+
+
+def _all_categories(text: str) -> frozenset[str]:
+    text_match = match_categories(text.strip())
+    return text_match.by_term | text_match.by_key
+
+
+class BatchRelevanceLabeller:
+    """
+    Пакетная оценка релевантности пар (запрос, документ).
+
+    Повторяет RelevanceCalculator.calculate_relevance, но текст
+    документа, названия позиций, сферы и технические категории
+    вычисляются один раз на документ, а признаки запроса - один раз
+    на запрос. Оценка пары сводится к проверкам подстрок в заранее
+    приведенных к нижнему регистру полях и пересечениям множеств.
+    """
+
+    def __init__(self) -> None:
+        self._queries: dict[str, QueryFeatures] = {}
+        self._documents: dict[Hashable, DocumentFeatures] = {}
+
+    def _query_features(self, query: str) -> QueryFeatures:
+        features = self._queries.get(query)
+        if features is None:
+            features = QueryFeatures.from_query(query)
+            self._queries[query] = features
+        return features
+
+    def _document_features(self, result: dict[str, Any]) -> DocumentFeatures:
+        source = result.get('_source', {})
+        key = result.get('_id', id(source))
+        features = self._documents.get(key)
+        if features is None:
+            features = DocumentFeatures.from_source(source)
+            self._documents[key] = features
+        return features
+
+    def label(self, pairs: Iterable[tuple[str, dict[str, Any]]]) -> list[float]:
+        """
+        Оценки релевантности пар (запрос, результат поиска).
+
+        Returns:
+            Оценки от 0.0 до 1.0 в порядке пар
+        """
+        return [
+            self._score(
+                self._query_features(query),
+                self._document_features(result),
+            )
+            for query, result in pairs
+        ]
+
+    def label_results(
+        self,
+        queries_results: dict[str, list[dict[str, Any]]],
+    ) -> dict[str, list[float]]:
+        """Оценки релевантности результатов поиска по каждому запросу"""
+        return {
+            query: self.label((query, result) for result in results)
+            for query, results in queries_results.items()
+        }
+
+    @staticmethod
+    def _category_score(
+        query: QueryFeatures,
+        text_categories: frozenset[str],
+    ) -> float:
+        """Аналог RelevanceCalculator._check_tech_category_match"""
+        if query.variant_techs & text_categories:
+            return RELEVANCE_WEIGHTS['category_match']
+        return 0.0
+
+    @classmethod
+    def _position_score(
+        cls,
+        query: QueryFeatures,
+        position: PositionFeatures,
+    ) -> float:
+        """Аналог RelevanceCalculator._evaluate_single_position"""
+        score = 0.0
+
+        if position.name is not None:
+            name = position.name
+            if query.text in name:
+                score = RELEVANCE_WEIGHTS['exact_position_match']
+            else:
+                term_weights = [
+                    TERM_WEIGHTS['common_term_position']
+                    if part in _COMMON_TERMS
+                    else TERM_WEIGHTS['specific_term_position']
+                    for part in query.parts
+                    if part in name and len(part) > 2
+                ]
+                category_score = cls._category_score(
+                    query,
+                    position.name_categories,
+                )
+                if term_weights:
+                    partial_score = RELEVANCE_WEIGHTS[
+                        'partial_position_match'
+                    ] * (sum(term_weights) / len(query.parts))
+                    score = max(partial_score, category_score)
+                else:
+                    score = category_score
+
+        if score < RELEVANCE_WEIGHTS['exact_position_match']:
+            spheres_score = (
+                RELEVANCE_WEIGHTS['sphere_match']
+                if query.techs & position.sphere_terms
+                else 0.0
+            )
+            score = max(score, spheres_score)
+
+        return score
+
+    @classmethod
+    def _title_description_score(
+        cls,
+        query: QueryFeatures,
+        document: DocumentFeatures,
+    ) -> float:
+        """Аналог RelevanceCalculator._evaluate_title_description"""
+        score = 0.0
+        text = query.text
+
+        if document.title is not None and text in document.title:
+            words = document.title_words
+            if text in words or any(
+                text == word or text + 's' == word for word in words
+            ):
+                score = max(score, RELEVANCE_WEIGHTS['title_match'])
+            else:
+                tech_score = cls._category_score(
+                    query,
+                    document.title_categories,
+                )
+                score = max(score, tech_score * 0.5)
+
+        if document.description is not None and text in document.description:
+            words = document.description_words
+            if text in words or any(text + 's' == word for word in words):
+                score = max(score, RELEVANCE_WEIGHTS['description_match'])
+            else:
+                tech_score = cls._category_score(
+                    query,
+                    document.description_categories,
+                )
+                score = max(score, tech_score * 0.3)
+
+        return score
+
+    @classmethod
+    def _score(cls, query: QueryFeatures, document: DocumentFeatures) -> float:
+        """Аналог RelevanceCalculator.calculate_relevance"""
+        positions_score = max(
+            (
+                cls._position_score(query, position)
+                for position in document.positions
+            ),
+            default=0.0,
+        )
+
+        if positions_score < RELEVANCE_WEIGHTS['sphere_match']:
+            score = max(
+                positions_score,
+                cls._title_description_score(query, document),
+            )
+        else:
+            score = positions_score
+
+        if (
+            score < RELEVANCE_WEIGHTS['category_match'] * 0.8
+            and query.categories
+            and not (document.text_terms & query.categories)
+            and score < RELEVANCE_WEIGHTS['category_match'] * 0.5
+        ):
+            score *= 0.5
+
+        return min(score / RELEVANCE_WEIGHTS['max_score'], 1.0)
+
+
+def check_parity(
+    queries_results: dict[str, list[dict[str, Any]]],
+) -> list[tuple[str, str, float, float]]:
+    """
+    Сравнение пакетной оценки с RelevanceCalculator.
+
+    Returns:
+        Расхождения: запрос, идентификатор документа, оценка
+        RelevanceCalculator и пакетная оценка
+    """
+    batch_scores = BatchRelevanceLabeller().label_results(queries_results)
+
+    mismatches = []
+    for query, results in queries_results.items():
+        for result, batch_score in zip(
+            results,
+            batch_scores[query],
+            strict=True,
+        ):
+            expected = RelevanceCalculator.calculate_relevance(query, result)
+            if expected != batch_score:
+                mismatches.append(
+                    (query, result.get('_id'), expected, batch_score),
+                )
+    return mismatches
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Iterable
+from functools import lru_cache
+from typing import NamedTuple
+
+from src.eval.tech_categories import TECH_CATEGORIES
+
+
+class AhoCorasick:
+    """
+    Автомат Ахо-Корасик для поиска всех вхождений набора подстрок
+    за один проход по тексту.
+
+    Переходы по несовпадению (fail-ссылки) раскрываются при построении,
+    поэтому при поиске на каждый символ приходится один переход.
+    """
+
+    def __init__(self, patterns: Iterable[str]) -> None:
+        # Префиксное дерево шаблонов
+        children: list[dict[str, int]] = [{}]
+        outputs: list[set[str]] = [set()]
+        for pattern in patterns:
+            state = 0
+            for char in pattern:
+                if char not in children[state]:
+                    children[state][char] = len(children)
+                    children.append({})
+                    outputs.append(set())
+                state = children[state][char]
+            outputs[state].add(pattern)
+
+        # Обход в ширину: fail-состояние всегда неглубже текущего,
+        # поэтому его переходы к этому моменту уже построены
+        fail = [0] * len(children)
+        transitions: list[dict[str, int]] = [{}] * len(children)
+        transitions[0] = dict(children[0])
+        queue = deque(children[0].values())
+        while queue:
+            state = queue.popleft()
+            outputs[state] |= outputs[fail[state]]
+            transitions[state] = {
+                **transitions[fail[state]],
+                **children[state],
+            }
+            for char, child in children[state].items():
+                fail[child] = (
+                    transitions[fail[state]].get(char, 0)
+                    if state
+                    else 0
+                )
+                queue.append(child)
+
+        self._transitions = transitions
+        self._outputs = [frozenset(output) for output in outputs]
+
+    def find(self, text: str) -> set[str]:
+        """Все подстроки набора, входящие в text"""
+        transitions = self._transitions
+        outputs = self._outputs
+        found: set[str] = set()
+
+        state = 0
+        for char in text:
+            state = transitions[state].get(char, 0)
+            if outputs[state]:
+                found |= outputs[state]
+        return found
+
+
+class CategoryMatch(NamedTuple):
+    """Технические категории, найденные в тексте"""
+
+    # Категории, название которых входит в текст
+    by_key: frozenset[str]
+    # Категории, хотя бы один термин которых входит в текст
+    by_term: frozenset[str]
+
+
+def _build_categories_by_term() -> dict[str, frozenset[str]]:
+    categories_by_term: dict[str, set[str]] = {}
+    for category, terms in TECH_CATEGORIES.items():
+        for term in terms:
+            categories_by_term.setdefault(term, set()).add(category)
+    return {
+        term: frozenset(categories)
+        for term, categories in categories_by_term.items()
+    }
+
+
+# Категории по термину и автомат по названиям и терминам всех категорий
+# строятся один раз при импорте
+_CATEGORIES_BY_TERM = _build_categories_by_term()
+_AUTOMATON = AhoCorasick({*TECH_CATEGORIES, *_CATEGORIES_BY_TERM})
+
+
+@lru_cache(maxsize=4096)
+def match_categories(text: str) -> CategoryMatch:
+    """
+    Поиск технических категорий в тексте за один проход.
+
+    Эквивалентно проверкам `category in text` и `term in text`
+    для всех категорий и терминов TECH_CATEGORIES.
+
+    Args:
+        text: Текст в нижнем регистре
+
+    Returns:
+        Категории, найденные по названию и по терминам
+    """
+    found = _AUTOMATON.find(text)
+    by_term = [
+        _CATEGORIES_BY_TERM[pattern]
+        for pattern in found
+        if pattern in _CATEGORIES_BY_TERM
+    ]
+    return CategoryMatch(
+        by_key=frozenset(
+            pattern for pattern in found if pattern in TECH_CATEGORIES
+        ),
+        by_term=frozenset().union(*by_term),
+    )
+
+
+def categories_with_term(term: str) -> frozenset[str]:
+    """Категории, в списке терминов которых есть term (точное совпадение)"""
+    return _CATEGORIES_BY_TERM.get(term, frozenset())
+
+
+def ordered_categories(categories: Iterable[str]) -> list[str]:
+    """Категории в порядке их объявления в TECH_CATEGORIES"""
+    categories = set(categories)
+    return [category for category in TECH_CATEGORIES if category in categories]
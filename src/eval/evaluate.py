@@ -5,7 +5,7 @@ from typing import Any
 
 import pandas as pd
 
-from src.eval.relevance_calculator import calculate_result_relevance
+from src.eval.batch_relevance import BatchRelevanceLabeller
 
 
 class SearchEvaluator:
@@ -86,6 +86,7 @@ class SearchEvaluator:
     def evaluate_search_results(
         results: list[dict[str, Any]],
         query: str,
+        relevance_scores: list[float] | None = None,
     ) -> dict[str, Any]:
         """
         Оценивает результаты поиска.
@@ -93,14 +94,16 @@ class SearchEvaluator:
         Args:
             results: Результаты поиска из Elasticsearch
             query: Поисковый запрос
-            relevance_function: Функция для оценки релевантности результата
+            relevance_scores: Заранее вычисленные оценки релевантности
+                результатов (см. BatchRelevanceLabeller)
 
         Returns:
             Словарь с метриками оценки
         """
-        relevance_scores = [
-            calculate_result_relevance(query, result) for result in results
-        ]
+        if relevance_scores is None:
+            relevance_scores = BatchRelevanceLabeller().label(
+                (query, result) for result in results
+            )
 
         precision = SearchEvaluator.calculate_precision(relevance_scores)
         dcg = SearchEvaluator.calculate_dcg(relevance_scores)
@@ -134,10 +137,17 @@ class SearchEvaluator:
         avg_precision = 0
         avg_ndcg = 0
 
+        # Документы, встречающиеся в выдаче нескольких запросов,
+        # разбираются один раз
+        relevance_scores = BatchRelevanceLabeller().label_results(
+            queries_results,
+        )
+
         for query, results in queries_results.items():
             eval_result = SearchEvaluator.evaluate_search_results(
                 results,
                 query,
+                relevance_scores[query],
             )
             evaluations[query] = eval_result
 
@@ -1,9 +1,10 @@
+from src.eval.category_matcher import match_categories
 from src.eval.tech_categories import (
     COMMON_TERMS,
     RELEVANCE_WEIGHTS,
-    TECH_CATEGORIES,
     TERM_WEIGHTS,
 )
+from src.features import TextFeatures, get_features
 from src.utils import make_query_variants
 
 
@@ -22,28 +23,23 @@ class RelevanceCalculator:
             Оценка релевантности (от 0.0 до 1.0)
         """
         query_lower = query.lower().strip()
-        source = result.get('_source', {})
+        features = get_features(result.get('_source', {}))
         query_parts = query_lower.split()
 
-        query_categories = {}
-        for tech, categories in TECH_CATEGORIES.items():
-            if (
-                tech == query_lower
-                or tech in query_lower
-                or any(term in query_lower for term in categories)
-            ):
-                query_categories[tech] = categories
+        # Категории, название или термин которых входит в запрос
+        query_match = match_categories(query_lower)
+        query_categories = query_match.by_key | query_match.by_term
 
         positions_score = cls._evaluate_positions(
             query=query_lower,
             query_parts=query_parts,
-            source=source,
+            features=features,
         )
 
         if positions_score < RELEVANCE_WEIGHTS['sphere_match']:
             title_description_score = cls._evaluate_title_description(
                 query_lower,
-                source,
+                features,
             )
             score = max(positions_score, title_description_score)
         else:
@@ -55,13 +51,9 @@ class RelevanceCalculator:
             score < RELEVANCE_WEIGHTS['category_match'] * 0.8
             and query_categories
         ):
-            document_text = cls._extract_document_text(source)
-
-            category_found = False
-            for categories in query_categories.values():
-                if any(category in document_text for category in categories):
-                    category_found = True
-                    break
+            category_found = bool(
+                match_categories(features['text']).by_term & query_categories,
+            )
 
             # Если документ не содержит ни одного термина из категории запроса,
             # и оценка низкая, еще больше снижаем её
@@ -76,7 +68,7 @@ class RelevanceCalculator:
         return normalized_score
 
     @classmethod
-    def _extract_document_text(cls, source: dict) -> str:  # noqa: C901
+    def _extract_document_text(cls, source: dict) -> str:
         """
         Извлекает весь текст из документа для комплексного анализа.
 
@@ -86,46 +78,14 @@ class RelevanceCalculator:
         Returns:
             Весь текст документа в нижнем регистре
         """
-        text_parts = []
-
-        if 'title' in source:
-            text_parts.append(source['title'].lower())
-
-        if 'description' in source:
-            text_parts.append(source['description'].lower())
-
-        if 'positions' in source and source['positions']:
-            for position in source['positions']:
-                if 'name' in position:
-                    text_parts.append(position['name'].lower())
-
-                if (
-                    'description' in position
-                    and position['description']
-                    and 'blocks' in position['description']
-                ):
-                    for block in position['description']['blocks']:
-                        if (
-                            'data' in block
-                            and block['data'].get('text') is not None
-                        ):
-                            text_parts.append(block['data']['text'].lower())
-                            if 'items' in block['data'] and isinstance(
-                                block['data']['items'],
-                                list,
-                            ):
-                                for item in block['data']['items']:
-                                    if isinstance(item, str):
-                                        text_parts.append(item.lower())
-
-        return ' '.join(text_parts)
+        return get_features(source)['text']
 
     @classmethod
     def _evaluate_positions(
         cls,
         query: str,
         query_parts: list[str],
-        source: dict,
+        features: TextFeatures,
     ) -> float:
         """
         Оценивает релевантность на основе позиций в документе.
@@ -133,21 +93,23 @@ class RelevanceCalculator:
         Args:
             query: Поисковый запрос (в нижнем регистре)
             query_parts: Запрос, разбитый на слова
-            source: Исходный документ
+            features: Признаки документа
 
         Returns:
             Оценка релевантности позиций (от 0.0 до max_score)
         """
-        if 'positions' not in source or not source['positions']:
-            return 0.0
-
         position_scores = []
 
-        for position in source['positions']:
+        for position_name, sphere_captions in zip(
+            features['position_names'],
+            features['sphere_captions'],
+            strict=True,
+        ):
             position_score = cls._evaluate_single_position(
                 query=query,
                 query_parts=query_parts,
-                position=position,
+                position_name=position_name,
+                sphere_captions=sphere_captions,
             )
             position_scores.append(position_score)
 
@@ -158,7 +120,8 @@ class RelevanceCalculator:
         cls,
         query: str,
         query_parts: list[str],
-        position: dict,
+        position_name: str | None,
+        sphere_captions: list[str],
     ) -> float:
         """
         Оценивает релевантность отдельной позиции.
@@ -166,26 +129,26 @@ class RelevanceCalculator:
         Args:
             query: Поисковый запрос (в нижнем регистре)
             query_parts: Запрос, разбитый на слова
-            position: Данные позиции
+            position_name: Название позиции (в нижнем регистре)
+            sphere_captions: Названия сфер позиции (в нижнем регистре)
 
         Returns:
             Оценка релевантности позиции (от 0.0 до max_score)
         """
         position_score = 0.0
 
-        if 'name' in position:
-            position_name = position['name'].lower()
+        if position_name is not None:
             position_score = cls._evaluate_position_name(
                 query=query,
                 query_parts=query_parts,
                 position_name=position_name,
             )
 
-        if (
-            position_score < RELEVANCE_WEIGHTS['exact_position_match']
-            and 'spheres' in position
-        ):
-            spheres_score = cls._evaluate_position_spheres(query, position)
+        if position_score < RELEVANCE_WEIGHTS['exact_position_match']:
+            spheres_score = cls._evaluate_position_spheres(
+                query,
+                sphere_captions,
+            )
             position_score = max(position_score, spheres_score)
 
         return position_score
@@ -253,64 +216,70 @@ class RelevanceCalculator:
 
         query_variants = make_query_variants(query)
 
-        for tech, categories in TECH_CATEGORIES.items():
-            tech_match = any(
-                variant == tech or tech in variant for variant in query_variants
-            )
-
-            if tech_match:
-                if any(category in text for category in categories):
-                    return RELEVANCE_WEIGHTS['category_match']
+        # Категории, название которых входит в один из вариантов запроса
+        query_techs = frozenset().union(
+            *(match_categories(variant).by_key for variant in query_variants),
+        )
+        if not query_techs:
+            return 0.0
 
-                if tech in text:
-                    return RELEVANCE_WEIGHTS['category_match']
+        # Текст содержит термин или название одной из этих категорий
+        text_match = match_categories(text)
+        if query_techs & (text_match.by_term | text_match.by_key):
+            return RELEVANCE_WEIGHTS['category_match']
 
         return 0.0
 
     @classmethod
-    def _evaluate_position_spheres(cls, query: str, position: dict) -> float:
+    def _evaluate_position_spheres(
+        cls,
+        query: str,
+        sphere_captions: list[str],
+    ) -> float:
         """
         Оценивает релевантность сфер позиции.
 
         Args:
             query: Поисковый запрос (в нижнем регистре)
-            position: Данные позиции
+            sphere_captions: Названия сфер позиции (в нижнем регистре)
 
         Returns:
             Оценка релевантности сфер позиции
         """
-        if 'spheres' not in position or not position['spheres']:
+        if not sphere_captions:
             return 0.0
 
-        for sphere in position['spheres']:
-            if 'caption' in sphere:
-                sphere_caption = sphere['caption'].lower()
+        query_techs = match_categories(query).by_key
+        if not query_techs:
+            return 0.0
 
-                # Проверка на соответствие технической категории в сферах
-                for tech, categories in TECH_CATEGORIES.items():
-                    if tech in query and any(
-                        category in sphere_caption for category in categories
-                    ):
-                        return RELEVANCE_WEIGHTS['sphere_match']
+        for sphere_caption in sphere_captions:
+            # Проверка на соответствие технической категории в сферах
+            if match_categories(sphere_caption).by_term & query_techs:
+                return RELEVANCE_WEIGHTS['sphere_match']
 
         return 0.0
 
     @classmethod
-    def _evaluate_title_description(cls, query: str, source: dict) -> float:
+    def _evaluate_title_description(
+        cls,
+        query: str,
+        features: TextFeatures,
+    ) -> float:
         """
         Оценивает релевантность на основе названия и описания стажировки.
 
         Args:
             query: Поисковый запрос (в нижнем регистре)
-            source: Исходный документ
+            features: Признаки документа
 
         Returns:
             Оценка релевантности названия и описания
         """
         score = 0.0
 
-        if 'title' in source:
-            title = source['title'].lower()
+        title = features['title']
+        if title is not None:
 
             # Если запрос полностью содержится в названии
             if query in title:
@@ -327,8 +296,8 @@ class RelevanceCalculator:
                     # Уменьшаем вес для частичных совпадений
                     score = max(score, tech_score * 0.5)
 
-        if 'description' in source:
-            description = source['description'].lower()
+        description = features['description']
+        if description is not None:
 
             if query in description:
                 words = description.split()
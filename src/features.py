@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from typing import Any, TypedDict
+
+# Поле документа в индексе, в котором хранятся признаки (см. with_features)
+FEATURES_FIELD = 'features'
+# Версия формата признаков: признаки другой версии вычисляются заново
+FEATURES_VERSION = 1
+
+
+class TextFeatures(TypedDict):
+    """Нормализованные поля стажировки для оценки и переранжирования"""
+
+    version: int
+    # Весь текст документа в нижнем регистре
+    text: str
+    title: str | None
+    description: str | None
+    # Названия позиций в порядке позиций (None, если у позиции нет названия)
+    position_names: list[str | None]
+    # Названия сфер каждой позиции
+    sphere_captions: list[list[str]]
+
+
+def _lower(value: Any) -> str | None:
+    return value.lower() if isinstance(value, str) else None
+
+
+def extract_features(source: dict[str, Any]) -> TextFeatures:
+    """
+    Обход документа стажировки с приведением текста к нижнему регистру.
+
+    Args:
+        source: Исходный документ
+
+    Returns:
+        Признаки документа
+    """
+    title = _lower(source.get('title'))
+    description = _lower(source.get('description'))
+
+    text_parts = [part for part in (title, description) if part is not None]
+    position_names = []
+    sphere_captions = []
+
+    for position in source.get('positions') or []:
+        name = _lower(position.get('name'))
+        position_names.append(name)
+        if name is not None:
+            text_parts.append(name)
+
+        blocks = (position.get('description') or {}).get('blocks') or []
+        for block in blocks:
+            data = block.get('data') or {}
+            if data.get('text') is None:
+                continue
+            text_parts.append(data['text'].lower())
+            if isinstance(data.get('items'), list):
+                text_parts.extend(
+                    item.lower() for item in data['items']
+                    if isinstance(item, str)
+                )
+
+        sphere_captions.append([
+            sphere['caption'].lower()
+            for sphere in position.get('spheres') or []
+            if isinstance(sphere.get('caption'), str)
+        ])
+
+    return {
+        'version': FEATURES_VERSION,
+        'text': ' '.join(text_parts),
+        'title': title,
+        'description': description,
+        'position_names': position_names,
+        'sphere_captions': sphere_captions,
+    }
+
+
+def get_features(source: dict[str, Any]) -> TextFeatures:
+    """
+    Признаки документа: сохраненные при индексации, если они есть
+    и актуальны, иначе вычисленные заново.
+    """
+    features = source.get(FEATURES_FIELD)
+    if features is not None and features.get('version') == FEATURES_VERSION:
+        return features
+    return extract_features(source)
+
+
+def with_features(document: dict[str, Any]) -> dict[str, Any]:
+    """Копия документа с вычисленными признаками (без изменения исходного)"""
+    return {**document, FEATURES_FIELD: extract_features(document)}
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from typing import NamedTuple
+
+from src.constants import CRAWL_HTTP_CACHE_PATH
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str | None
+    last_modified: str | None
+
+
+class HTTPCache:
+    """
+    Кеш HTTP-ответов на диске (SQLite) для условных запросов.
+
+    Для каждого URL хранятся тело ответа и заголовки ETag/Last-Modified.
+    При повторном обходе они отправляются в If-None-Match/If-Modified-Since,
+    и на ответ 304 берется сохраненное тело.
+    """
+
+    def __init__(self, path: str = CRAWL_HTTP_CACHE_PATH) -> None:
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'url TEXT PRIMARY KEY, body BLOB, etag TEXT, '
+            'last_modified TEXT, fetched_at REAL)',
+        )
+        self._connection.commit()
+
+    def get(self, url: str) -> CachedResponse | None:
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT body, etag, last_modified FROM responses '
+                'WHERE url = ?',
+                (url,),
+            ).fetchone()
+        return CachedResponse(*row) if row is not None else None
+
+    def set(
+        self,
+        url: str,
+        body: bytes,
+        etag: str | None,
+        last_modified: str | None,
+    ) -> None:
+        # Без валидаторов условный запрос невозможен, хранить нечего
+        if etag is None and last_modified is None:
+            return
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)',
+                (url, body, etag, last_modified, time.time()),
+            )
+            self._connection.commit()
+
+    @staticmethod
+    def conditional_headers(cached: CachedResponse | None) -> dict[str, str]:
+        """Заголовки условного запроса по сохраненному ответу"""
+        headers = {}
+        if cached is not None:
+            if cached.etag is not None:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified is not None:
+                headers['If-Modified-Since'] = cached.last_modified
+        return headers
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,331 @@
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import sys
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from src.constants import (
+    ANN_INDEX_DIR,
+    ANN_KMEANS_ITERATIONS,
+    ANN_NPROBE,
+    EMBEDDING_STORE_DIR,
+)
+from src.features import with_features
+from src.storage import DocumentLookup, resolve_documents_path
+
+if TYPE_CHECKING:
+    from src.bert.embedding_store import DocumentEmbeddingStore
+    from src.bert.model import BERTSearchEngine
+
+CENTROIDS_FILENAME = 'centroids.npy'
+VECTORS_FILENAME = 'vectors.npy'
+OFFSETS_FILENAME = 'offsets.npy'
+IDS_FILENAME = 'ids.json'
+META_FILENAME = 'meta.json'
+# Несжатая копия результатов парсера для чтения документов по смещению
+DOCUMENTS_FILENAME = 'documents.jsonl'
+
+# Количество строк, обрабатываемых за одно матричное умножение
+_CHUNK_SIZE = 4096
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Номер ближайшего (по косинусу) центроида для каждого вектора"""
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), _CHUNK_SIZE):
+        chunk = vectors[start : start + _CHUNK_SIZE]
+        assignments[start : start + len(chunk)] = np.argmax(
+            chunk @ centroids.T,
+            axis=1,
+        )
+    return assignments
+
+
+def spherical_kmeans(
+    vectors: np.ndarray,
+    n_clusters: int,
+    iterations: int = ANN_KMEANS_ITERATIONS,
+    seed: int = 42,
+) -> np.ndarray:
+    """
+    Кластеризация нормированных векторов по косинусной близости.
+
+    Returns:
+        Нормированные центроиды кластеров
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)]
+
+    for _ in range(iterations):
+        assignments = _assign(vectors, centroids)
+
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=n_clusters)
+
+        # Пустые кластеры переинициализируем случайными векторами
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = vectors[rng.choice(len(vectors), empty.sum())]
+
+        centroids = _normalize(sums)
+
+    return centroids
+
+
+class IVFIndex:
+    """
+    Приближенный поиск ближайших соседей по косинусной близости
+    (inverted file index).
+
+    Векторы разбиваются на кластеры сферическим k-means и хранятся
+    сгруппированными по кластерам. При поиске просматриваются только
+    nprobe кластеров с ближайшими к запросу центроидами.
+    """
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        vectors: np.ndarray,
+        offsets: np.ndarray,
+        ids: list[str],
+    ) -> None:
+        self.centroids = centroids
+        self.vectors = vectors
+        self.offsets = offsets
+        self.ids = ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        ids: list[str],
+        n_lists: int | None = None,
+        iterations: int = ANN_KMEANS_ITERATIONS,
+    ) -> IVFIndex:
+        """
+        Построение индекса.
+
+        Args:
+            vectors: Эмбеддинги документов
+            ids: Идентификаторы документов в порядке строк vectors
+            n_lists: Количество кластеров (по умолчанию корень из
+                количества документов)
+            iterations: Количество итераций k-means
+
+        Returns:
+            Построенный индекс
+        """
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        n_lists = n_lists or max(1, round(math.sqrt(len(vectors))))
+        n_lists = min(n_lists, len(vectors))
+
+        centroids = spherical_kmeans(vectors, n_lists, iterations)
+        assignments = _assign(vectors, centroids)
+
+        order = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=n_lists)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+
+        return cls(
+            centroids=centroids,
+            vectors=vectors[order],
+            offsets=offsets,
+            ids=[ids[row] for row in order],
+        )
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        k: int = 10,
+        nprobe: int = ANN_NPROBE,
+    ) -> list[tuple[str, float]]:
+        """
+        Поиск k ближайших документов.
+
+        Args:
+            query_vector: Эмбеддинг запроса
+            k: Количество результатов
+            nprobe: Количество просматриваемых кластеров
+
+        Returns:
+            Пары (идентификатор документа, косинусная близость)
+        """
+        query_vector = _normalize(np.asarray(query_vector, dtype=np.float32))
+
+        nprobe = min(nprobe, len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ query_vector), nprobe - 1)
+        rows = np.concatenate([
+            np.arange(self.offsets[i], self.offsets[i + 1])
+            for i in lists[:nprobe]
+        ])
+        if not len(rows):
+            return []
+
+        scores = np.asarray(self.vectors[rows], dtype=np.float32) @ query_vector
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        return [(self.ids[rows[i]], float(scores[i])) for i in top]
+
+    def save(self, directory: str) -> None:
+        """Сохранение индекса на диск"""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, CENTROIDS_FILENAME), self.centroids)
+        np.save(os.path.join(directory, VECTORS_FILENAME), self.vectors)
+        np.save(os.path.join(directory, OFFSETS_FILENAME), self.offsets)
+        with open(os.path.join(directory, IDS_FILENAME), 'w') as f:
+            json.dump(self.ids, f)
+        with open(os.path.join(directory, META_FILENAME), 'w') as f:
+            json.dump(
+                {
+                    'count': len(self.ids),
+                    'n_lists': len(self.centroids),
+                    'dimension': int(self.vectors.shape[1]),
+                },
+                f,
+            )
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> IVFIndex:
+        """Загрузка индекса, матрица векторов открывается через memmap"""
+        with open(os.path.join(directory, IDS_FILENAME)) as f:
+            ids = json.load(f)
+
+        return cls(
+            centroids=np.load(os.path.join(directory, CENTROIDS_FILENAME)),
+            vectors=np.load(
+                os.path.join(directory, VECTORS_FILENAME),
+                mmap_mode='r' if mmap else None,
+            ),
+            offsets=np.load(os.path.join(directory, OFFSETS_FILENAME)),
+            ids=ids,
+        )
+
+
+class LocalANNSearchEngine:
+    """
+    Поиск стажировок без Elasticsearch по эмбеддингам документов.
+
+    Результаты возвращаются в формате попаданий Elasticsearch
+    ({'_id', '_source', '_score'}), поэтому совместимы
+    с print_search_result и SearchEvaluator. Документы читаются с диска
+    только для найденных результатов (см. DocumentLookup).
+    """
+
+    def __init__(
+        self,
+        index: IVFIndex,
+        documents: DocumentLookup,
+        encoder: BERTSearchEngine,
+        nprobe: int = ANN_NPROBE,
+    ) -> None:
+        self.index = index
+        self.documents = documents
+        self.encoder = encoder
+        self.nprobe = nprobe
+
+    def find_internships(
+        self,
+        query: str,
+        index_name: str | None = None,
+        size: int = 10,
+    ) -> list[dict[str, Any]]:
+        """Поиск стажировок
+
+        Args:
+            query (str): Поисковый запрос пользователя
+            index_name (str | None, optional):
+                Не используется, оставлен для совместимости
+                с search_internships. Defaults to None.
+            size (int, optional): Количество результатов. Defaults to 10.
+
+        Returns:
+            list[dict[str, Any]]: Найденные стажировки
+        """
+        query_vector = self.encoder.encode_query(query)[0].cpu().numpy()
+        hits = self.index.search(query_vector, k=size, nprobe=self.nprobe)
+
+        results = []
+        for doc_id, score in hits:
+            document = self.documents.get(doc_id)
+            if document is not None:
+                results.append({
+                    '_id': doc_id,
+                    '_source': with_features(document),
+                    '_score': score,
+                })
+        return results
+
+
+def build_ann_index(
+    embedding_store: DocumentEmbeddingStore,
+    directory: str = ANN_INDEX_DIR,
+) -> IVFIndex:
+    """Построение и сохранение ANN-индекса по хранилищу эмбеддингов"""
+    index = IVFIndex.build(embedding_store.embeddings, embedding_store.ids)
+    index.save(directory)
+    logging.info(
+        f'ANN-индекс построен: {len(index)} документов, '
+        f'{len(index.centroids)} кластеров.',
+    )
+    return index
+
+
+def load_local_ann_engine(
+    checkpoint_path: str,
+    directory: str = ANN_INDEX_DIR,
+    data_path: str | None = None,
+) -> LocalANNSearchEngine:
+    """Загрузка локального поискового движка по сохраненному ANN-индексу"""
+    from src.bert.model import BERTSearchEngine
+
+    data_path = data_path or resolve_documents_path()
+    if data_path is None:
+        raise FileNotFoundError(
+            'Результаты парсера не найдены, сначала запустите main.py',
+        )
+
+    encoder = BERTSearchEngine(
+        model=BERTSearchEngine.serialize_model_from_checkpoint(
+            checkpoint_path=checkpoint_path,
+        ),
+        use_cache=False,
+    )
+    return LocalANNSearchEngine(
+        IVFIndex.load(directory),
+        DocumentLookup.open(
+            data_path,
+            os.path.join(directory, DOCUMENTS_FILENAME),
+        ),
+        encoder,
+    )
+
+
+if __name__ == '__main__':
+    from src.bert.embedding_store import DocumentEmbeddingStore
+
+    logging.basicConfig(level=logging.INFO)
+    store = DocumentEmbeddingStore.open(
+        sys.argv[1] if len(sys.argv) > 1 else EMBEDDING_STORE_DIR,
+    )
+    if store is None:
+        sys.exit(
+            'Хранилище эмбеддингов не найдено, сначала запустите '
+            'python src/bert/embedding_store.py <путь до веса модели>',
+        )
+    build_ann_index(store)
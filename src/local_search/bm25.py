@@ -0,0 +1,520 @@
+from __future__ import annotations
+
+import math
+import os
+import re
+import time
+from collections import Counter
+from collections.abc import Iterable
+from datetime import datetime
+from functools import lru_cache
+from typing import Any
+
+import numpy as np
+
+from src.config import get_tech_boost
+from src.constants import PARSER_RESULT_FILENAME
+from src.features import with_features
+from src.storage import iter_documents
+
+try:
+    import snowballstemmer
+except ImportError:
+    snowballstemmer = None
+
+SYNONYMS_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'analysis',
+    'synonyms.txt',
+)
+
+# Параметры BM25 по умолчанию в Elasticsearch
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Функция затухания по дате из get_search_body
+DATE_DECAY_SCALE = 60 * 24 * 60 * 60
+DATE_DECAY = 0.7
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Стоп-слова фильтра stop по умолчанию (_english_)
+ENGLISH_STOP_WORDS = frozenset({
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'if',
+    'in', 'into', 'is', 'it', 'no', 'not', 'of', 'on', 'or', 'such', 'that',
+    'the', 'their', 'then', 'there', 'these', 'they', 'this', 'to', 'was',
+    'will', 'with',
+})
+
+# Окончания для упрощенного стемминга, если snowballstemmer не установлен
+_RUSSIAN_ENDINGS = tuple(sorted(
+    {
+        'ами', 'ями', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ией',
+        'иях', 'ах', 'ях', 'ов', 'ев', 'ей', 'ой', 'ий', 'ый', 'ая', 'яя',
+        'ое', 'ее', 'ые', 'ие', 'ом', 'ем', 'ам', 'ям', 'ую', 'юю', 'ть',
+        'ия', 'ию', 'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+    },
+    key=len,
+    reverse=True,
+))
+_ENGLISH_ENDINGS = ('ing', 'ies', 'es', 'ed', 's')
+_MIN_STEM_LENGTH = 3
+
+_TOKEN_PATTERN = re.compile(r'\w+')
+_CYRILLIC_PATTERN = re.compile('[а-яё]')
+
+# Поля запроса get_search_body: (tie_breaker, [(поле, анализатор, буст)]).
+# Оценка группы - лучшее поле плюс tie_breaker от остальных, как у
+# multi_match best_fields; у bool should внутри positions tie_breaker
+# равен 1 (оценки складываются).
+# Keyword-поля (alias, seo_tags, ...) совпадают только со всем запросом
+# целиком и не учитываются, как и нечеткий поиск (fuzziness).
+QUERY_CLAUSES: list[tuple[float, list[tuple[str, str, float]]]] = [
+    (
+        0.3,
+        [
+            ('title', 'synonym', 5),
+            ('title', 'shingle', 4),
+            ('description', 'synonym', 3),
+            ('seo_title', 'standard', 3),
+            ('seo_description', 'standard', 2),
+            ('slogan', 'standard', 1),
+        ],
+    ),
+    (
+        0,
+        [
+            ('tags.caption', 'synonym', 4),
+            ('tags.seo_description', 'standard', 2),
+            ('tags.seo_title', 'standard', 1),
+        ],
+    ),
+    (0, [('company.directions.caption', 'standard', 1)]),
+    (0, [('company.industries.name', 'standard', 3)]),
+    (
+        0,
+        [
+            ('company.caption', 'standard', 4),
+            ('company.seo_description', 'standard', 1),
+            ('company.seo_title', 'standard', 1),
+        ],
+    ),
+    (0, [('publication_type.name', 'standard', 2)]),
+    (0, [('direction.caption', 'standard', 1)]),
+    (
+        1,
+        [
+            ('positions.name', 'synonym', 10),
+            ('positions.name', 'ngram', 6),
+            ('positions.name', 'shingle', 8),
+            ('positions.description.blocks.data.text', 'synonym', 5),
+            ('positions.description.blocks.data.items', 'synonym', 5),
+            ('positions.spheres.caption', 'synonym', 6),
+        ],
+    ),
+]
+
+# Поля фильтра буста по технической категории (см. get_tech_boost)
+TECH_BOOST_FIELDS = [
+    'positions.name',
+    'positions.description.blocks.data.text',
+    'title',
+    'description',
+]
+TECH_BOOST_WEIGHT = 2.0
+NARROW_QUERY_MIN_SCORE = 1.0
+
+
+def _load_synonyms(path: str = SYNONYMS_PATH) -> list[list[tuple[str, ...]]]:
+    """Группы синонимов в формате Solr: фразы через запятую"""
+    groups = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            phrases = {
+                tuple(_tokenize(phrase))
+                for phrase in line.split(',')
+            }
+            groups.append([phrase for phrase in phrases if phrase])
+    return groups
+
+
+def _tokenize(text: str) -> list[str]:
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def _light_stem(token: str) -> str:
+    """Упрощенный стемминг отбрасыванием частых окончаний"""
+    endings = (
+        _RUSSIAN_ENDINGS
+        if _CYRILLIC_PATTERN.search(token)
+        else _ENGLISH_ENDINGS
+    )
+    for ending in endings:
+        if (
+            token.endswith(ending)
+            and len(token) - len(ending) >= _MIN_STEM_LENGTH
+        ):
+            return token[: -len(ending)]
+    return token
+
+
+if snowballstemmer is not None:
+    _russian_stemmer = snowballstemmer.stemmer('russian')
+    _english_stemmer = snowballstemmer.stemmer('english')
+
+    @lru_cache(maxsize=65536)
+    def stem(token: str) -> str:
+        """Стемминг как в цепочке russian_stemmer, english_stemmer"""
+        return _english_stemmer.stemWord(_russian_stemmer.stemWord(token))
+else:
+
+    @lru_cache(maxsize=65536)
+    def stem(token: str) -> str:
+        """Стемминг как в цепочке russian_stemmer, english_stemmer"""
+        return _light_stem(token)
+
+
+def _char_ngrams(tokens: list[str], min_gram: int = 3, max_gram: int = 4):
+    for token in tokens:
+        for size in range(min_gram, max_gram + 1):
+            for start in range(len(token) - size + 1):
+                yield token[start : start + size]
+
+
+def analyze(text: str, analyzer: str) -> list[str]:
+    """
+    Разбиение текста на термы по аналогии с анализаторами INDEX_SETTINGS.
+
+    Args:
+        text: Исходный текст
+        analyzer: synonym (без синонимов, они раскрываются в запросе),
+            standard, ngram или shingle
+
+    Returns:
+        Термы текста
+    """
+    tokens = _tokenize(text)
+
+    if analyzer == 'synonym':
+        return [
+            stem(token) for token in tokens
+            if token not in ENGLISH_STOP_WORDS
+        ]
+    if analyzer == 'standard':
+        return tokens
+    if analyzer == 'ngram':
+        return list(_char_ngrams(tokens))
+    if analyzer == 'shingle':
+        stems = [stem(token) for token in tokens]
+        shingles = [
+            ' '.join(stems[start : start + size])
+            for size in (2, 3)
+            for start in range(len(stems) - size + 1)
+        ]
+        return stems + shingles
+    raise ValueError(f'Неизвестный анализатор: {analyzer}')
+
+
+def _extract_text(node: Any, path: list[str]) -> list[str]:
+    """Все строки по пути в документе с учетом вложенных списков"""
+    if isinstance(node, list):
+        return [text for item in node for text in _extract_text(item, path)]
+    if not path:
+        if isinstance(node, str):
+            return [node]
+        if isinstance(node, dict):
+            return [
+                text for value in node.values()
+                for text in _extract_text(value, [])
+            ]
+        return []
+    if isinstance(node, dict):
+        return _extract_text(node.get(path[0]), path[1:])
+    return []
+
+
+def _parse_timestamp(value: str | None) -> float:
+    if not value:
+        return math.nan
+    try:
+        return datetime.strptime(value, DATE_FORMAT).timestamp()
+    except ValueError:
+        return math.nan
+
+
+class FieldIndex:
+    """
+    Инвертированный индекс одного поля в формате CSR.
+
+    Списки документов терма лежат подряд в doc_ids, границы задает
+    indptr. Вклад BM25 каждой пары (терм, документ) вычисляется
+    при построении, поэтому поиск сводится к сложению срезов массивов.
+    """
+
+    def __init__(self, documents_terms: list[list[str]]) -> None:
+        self.vocabulary: dict[str, int] = {}
+        term_ids: list[int] = []
+        doc_ids: list[int] = []
+        frequencies: list[int] = []
+
+        doc_lengths = np.zeros(len(documents_terms), dtype=np.float32)
+        for doc_id, terms in enumerate(documents_terms):
+            doc_lengths[doc_id] = len(terms)
+            for term, frequency in Counter(terms).items():
+                term_ids.append(
+                    self.vocabulary.setdefault(term, len(self.vocabulary)),
+                )
+                doc_ids.append(doc_id)
+                frequencies.append(frequency)
+
+        term_ids = np.asarray(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids, kind='stable')
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int32)[order]
+        tf = np.asarray(frequencies, dtype=np.float32)[order]
+
+        counts = np.bincount(term_ids, minlength=len(self.vocabulary))
+        self.indptr = np.concatenate([[0], np.cumsum(counts)])
+
+        # Документы без поля не участвуют в статистике, как в Lucene
+        doc_count = max(int((doc_lengths > 0).sum()), 1)
+        avg_length = max(doc_lengths.sum() / doc_count, 1.0)
+        idf = np.log1p((doc_count - counts + 0.5) / (counts + 0.5))
+
+        norm = BM25_K1 * (
+            1 - BM25_B + BM25_B * doc_lengths[self.doc_ids] / avg_length
+        )
+        self.weights = (
+            np.repeat(idf, counts) * tf / (tf + norm)
+        ).astype(np.float32)
+
+    def postings(self, term: str) -> tuple[np.ndarray, np.ndarray] | None:
+        """Документы с термом и вклад терма в их оценку"""
+        term_id = self.vocabulary.get(term)
+        if term_id is None:
+            return None
+        start, end = self.indptr[term_id], self.indptr[term_id + 1]
+        return self.doc_ids[start:end], self.weights[start:end]
+
+    def score(self, groups: list[tuple[str, ...]], n_docs: int) -> np.ndarray:
+        """
+        BM25 оценка документов по запросу.
+
+        Args:
+            groups: Термы запроса; термы одной группы - синонимы,
+                от группы берется лучший вклад
+            n_docs: Количество документов
+
+        Returns:
+            Оценки всех документов
+        """
+        scores = np.zeros(n_docs, dtype=np.float32)
+        for group in groups:
+            postings = [
+                entry for entry in map(self.postings, group)
+                if entry is not None
+            ]
+            if len(postings) == 1:
+                docs, weights = postings[0]
+                scores[docs] += weights
+            elif postings:
+                best = np.zeros(n_docs, dtype=np.float32)
+                for docs, weights in postings:
+                    best[docs] = np.maximum(best[docs], weights)
+                scores += best
+        return scores
+
+    def match(self, terms: list[str], n_docs: int) -> np.ndarray:
+        """Маска документов, содержащих хотя бы один из термов"""
+        mask = np.zeros(n_docs, dtype=bool)
+        for entry in map(self.postings, terms):
+            if entry is not None:
+                mask[entry[0]] = True
+        return mask
+
+
+class LocalBM25SearchEngine:
+    """
+    Поиск стажировок без Elasticsearch.
+
+    Повторяет логику get_search_body: те же поля и бусты, анализ текста
+    со стеммингом и синонимами, затухание по дате last_position_end_date
+    и буст по технической категории запроса. Вложенные поля (позиции,
+    теги) индексируются как одно поле документа.
+
+    Для стемминга как в Elasticsearch нужен пакет snowballstemmer,
+    без него используется упрощенное отбрасывание окончаний.
+    """
+
+    def __init__(
+        self,
+        documents: Iterable[dict[str, Any]],
+        synonyms_path: str = SYNONYMS_PATH,
+    ) -> None:
+        # Признаки для оценки выдачи вычисляются один раз при загрузке,
+        # как при индексации в Elasticsearch
+        self.documents = [with_features(document) for document in documents]
+        self.synonyms = _load_synonyms(synonyms_path)
+
+        self.fields: dict[tuple[str, str], FieldIndex] = {}
+        field_keys = {
+            (path, analyzer)
+            for _, fields in QUERY_CLAUSES
+            for path, analyzer, _ in fields
+        }
+        for path, analyzer in field_keys:
+            self.fields[path, analyzer] = FieldIndex([
+                analyze(
+                    ' '.join(_extract_text(document, path.split('.'))),
+                    analyzer,
+                )
+                for document in self.documents
+            ])
+
+        self.timestamps = np.array(
+            [
+                _parse_timestamp(document.get('last_position_end_date'))
+                for document in self.documents
+            ],
+            dtype=np.float64,
+        )
+
+    @classmethod
+    def from_file(
+        cls,
+        path: str = PARSER_RESULT_FILENAME,
+    ) -> LocalBM25SearchEngine:
+        """Построение индекса по результатам парсера"""
+        return cls(iter_documents(path))
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _expand_synonyms(self, tokens: list[str]) -> list[tuple[str, ...]]:
+        """
+        Группы токенов запроса: каждый токен вместе с синонимами фраз,
+        в которые он входит
+        """
+        groups = [{token} for token in tokens]
+        for phrases in self.synonyms:
+            for phrase in phrases:
+                size = len(phrase)
+                for start in range(len(tokens) - size + 1):
+                    if tuple(tokens[start : start + size]) != phrase:
+                        continue
+                    alternatives = {
+                        token for other in phrases for token in other
+                    }
+                    for idx in range(start, start + size):
+                        groups[idx] |= alternatives
+        return [tuple(group) for group in groups]
+
+    def _analyze_query(self, query: str, analyzer: str) -> list[tuple]:
+        if analyzer != 'synonym':
+            return [(term,) for term in analyze(query, analyzer)]
+
+        groups = self._expand_synonyms(_tokenize(query))
+        return [
+            tuple({
+                stem(token) for token in group
+                if token not in ENGLISH_STOP_WORDS
+            })
+            for group in groups
+            if not set(group) <= ENGLISH_STOP_WORDS
+        ]
+
+    def _date_decay(self) -> np.ndarray:
+        distance = np.abs(self.timestamps - time.time())
+        decay = np.exp(math.log(DATE_DECAY) * distance / DATE_DECAY_SCALE)
+        # Для документов без даты функция не применяется
+        return np.nan_to_num(decay, nan=1.0)
+
+    def score(self, query: str) -> np.ndarray:
+        """Итоговые оценки всех документов по запросу"""
+        n_docs = len(self.documents)
+        analyzed = {
+            analyzer: self._analyze_query(query, analyzer)
+            for analyzer in ('synonym', 'standard', 'ngram', 'shingle')
+        }
+
+        text_scores = np.zeros(n_docs, dtype=np.float32)
+        for tie_breaker, fields in QUERY_CLAUSES:
+            field_scores = np.stack([
+                self.fields[path, analyzer].score(analyzed[analyzer], n_docs)
+                * boost
+                for path, analyzer, boost in fields
+            ])
+            best = field_scores.max(axis=0)
+            text_scores += best + tie_breaker * (field_scores.sum(0) - best)
+
+        scores = text_scores * self._date_decay()
+
+        tech_boost, is_narrow = get_tech_boost(query.lower())
+        if tech_boost is not None:
+            boost_terms = self._analyze_query(
+                tech_boost['filter']['multi_match']['query'],
+                'synonym',
+            )
+            terms = [term for group in boost_terms for term in group]
+            matched = np.zeros(n_docs, dtype=bool)
+            for path in TECH_BOOST_FIELDS:
+                matched |= self.fields[path, 'synonym'].match(terms, n_docs)
+            scores = np.where(matched, scores * TECH_BOOST_WEIGHT, scores)
+
+            if is_narrow:
+                scores[scores < NARROW_QUERY_MIN_SCORE] = 0
+
+        # minimum_should_match: 1 - документ должен совпасть с запросом
+        scores[text_scores <= 0] = 0
+        return scores
+
+    def find_internships(
+        self,
+        query: str,
+        index_name: str | None = None,
+        size: int = 10,
+    ) -> list[dict[str, Any]]:
+        """Поиск стажировок
+
+        Args:
+            query (str): Поисковый запрос пользователя
+            index_name (str | None, optional):
+                Не используется, оставлен для совместимости
+                с search_internships. Defaults to None.
+            size (int, optional): Количество результатов. Defaults to 10.
+
+        Returns:
+            list[dict[str, Any]]: Найденные стажировки в формате
+                попаданий Elasticsearch
+        """
+        scores = self.score(query)
+        candidates = np.flatnonzero(scores > 0)
+
+        # Сортировка по убыванию оценки, затем по возрастанию даты
+        timestamps = np.nan_to_num(
+            self.timestamps[candidates],
+            nan=np.inf,
+        )
+        order = np.lexsort((timestamps, -scores[candidates]))[:size]
+
+        return [
+            {
+                '_id': self.documents[idx]['uuid'],
+                '_source': self.documents[idx],
+                '_score': float(scores[idx]),
+            }
+            for idx in candidates[order]
+        ]
+
+    def find_internships_many(
+        self,
+        queries: list[str],
+        index_name: str | None = None,
+        size: int = 10,
+    ) -> list[list[dict[str, Any]]]:
+        """Поиск по нескольким запросам, аналог search_internships_many"""
+        return [
+            self.find_internships(query, index_name, size)
+            for query in queries
+        ]
@@ -1,37 +1,125 @@
 import logging
-import os
 from asyncio import run
+from collections.abc import Callable
+
+from bert.embedding_store import DocumentEmbeddingStore, model_fingerprint
+from constants import (
+    BERT_QUANTIZED_INFERENCE,
+    EMBEDDING_DIMS,
+    EMBEDDING_STORE_DIR,
+    INDEX_NAME,
+)
+from elastic_search import ensure_index, search_internships
 from parser import start_parsing
+from src.cache import get_result_cache
+from storage import iter_documents, resolve_documents_path
+from utils import print_search_result
 
-from constants import INDEX_NAME, PARSER_RESULT_FILENAME
-from elastic_search import create_index, index_internships, search_internships
-from utils import load_json, print_search_result
 
+def open_embedding_store(
+    checkpoint_path: str,
+) -> DocumentEmbeddingStore | None:
+    """
+    Хранилище эмбеддингов документов, если оно построено той же моделью,
+    что используется при поиске, и подходит к маппингу индекса
+    """
+    embedding_store = DocumentEmbeddingStore.load(
+        EMBEDDING_STORE_DIR,
+        model_fingerprint(checkpoint_path, quantized=BERT_QUANTIZED_INFERENCE),
+    )
+    if embedding_store is None:
+        logging.info(
+            'Эмбеддинги документов для этой модели не найдены, '
+            'их можно построить: python src/bert/embedding_store.py '
+            '<путь до веса модели>',
+        )
+        return None
 
-def main() -> None:
-    if os.path.exists(PARSER_RESULT_FILENAME):
-        logging.info('Берем сохраненные данные по стажировкам')
-        internships_data = load_json(PARSER_RESULT_FILENAME)
-    else:
-        logging.info('Собираем данные по стажировкам...')
-        internships_data = run(start_parsing())
+    if embedding_store.dimension != EMBEDDING_DIMS:
+        logging.warning(
+            f'Размерность эмбеддингов модели ({embedding_store.dimension}) '
+            f'не совпадает с маппингом индекса ({EMBEDDING_DIMS}), '
+            'векторный поиск отключен.',
+        )
+        return None
+    return embedding_store
 
-    create_index(INDEX_NAME)
-    index_internships(internships_data, INDEX_NAME)
 
-    if input('Хотите использовать BERT для поиска? (y/n): ').lower() == 'y':
+def create_elastic_search_engine(
+    documents_path: str,
+    use_bert: bool,
+) -> Callable[..., list[dict]]:
+    """
+    Подготовка индекса Elasticsearch и выбор функции поиска.
+
+    Стажировки читаются из documents_path потоком при индексации
+    и не загружаются в память целиком. Эмбеддинги документов
+    индексируются только для BERT и только если они вычислены
+    той же моделью.
+    """
+    checkpoint_path = embedding_store = None
+    if use_bert:
+        checkpoint_path = input('Укажите путь до веса модели: ')
+        embedding_store = open_embedding_store(checkpoint_path)
+
+    rebuild = ensure_index(
+        iter_documents(documents_path),
+        INDEX_NAME,
+        embedding_store,
+    )
+    if rebuild is not None:
+        logging.info(
+            'Индекс пересобирается в фоне, поиск работает по текущей версии.',
+        )
+
+    if use_bert:
         logging.info('Загружаем BERT...')
         from bert.model import BERTSearchEngine
 
-        checkpoint_path = input('Укажите путь до веса модели: ')
         bert_wrapper = BERTSearchEngine(
             model=BERTSearchEngine.serialize_model_from_checkpoint(
                 checkpoint_path=checkpoint_path,
+                quantized=BERT_QUANTIZED_INFERENCE,
             ),
+            embedding_store=embedding_store,
+            quantized=BERT_QUANTIZED_INFERENCE,
+            # Кандидаты ищутся и по BM25, и по эмбеддингам документов,
+            # если они есть в индексе
+            retrieval_mode='hybrid' if embedding_store is not None else 'bm25',
+        )
+        return bert_wrapper.find_internships
+
+    return search_internships
+
+
+def main() -> None:
+    documents_path = resolve_documents_path()
+    if documents_path is not None:
+        logging.info('Берем сохраненные данные по стажировкам')
+    else:
+        logging.info('Собираем данные по стажировкам...')
+        documents_path = run(start_parsing())
+
+    engine_name = input(
+        'Выберите поисковый движок: elastic, bert или local '
+        '(BM25 без Elasticsearch) [elastic]: ',
+    ).strip().lower() or 'elastic'
+
+    if engine_name == 'local':
+        from local_search.bm25 import LocalBM25SearchEngine
+
+        logging.info('Строим локальный индекс...')
+        search_engine = LocalBM25SearchEngine(
+            iter_documents(documents_path),
+        ).find_internships
+    elif engine_name in ('elastic', 'bert'):
+        search_engine = create_elastic_search_engine(
+            documents_path,
+            use_bert=engine_name == 'bert',
         )
-        search_engine = bert_wrapper.find_internships
     else:
-        search_engine = search_internships
+        logging.error(f'Неизвестный поисковый движок: {engine_name}')
+        return
 
     while True:
         query = input('\nВведите поисковой запрос (или "exit" для выхода): ')
@@ -49,6 +137,8 @@ def main() -> None:
         else:
             logging.info('Результаты не найдены.')
 
+    logging.info(f'Статистика кеша результатов: {get_result_cache().stats()}')
+
 
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO)
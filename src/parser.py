@@ -1,61 +1,312 @@
 from __future__ import annotations
 
 import asyncio
+import copy
 import logging
+import os
+from collections import Counter, deque
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
 from typing import Any
+from urllib.parse import urlsplit
 
 import aiohttp
 
 from src.constants import (
-    BAD_WORDS,
+    CRAWL_CHECKPOINT_FILENAME,
+    CRAWL_CONCURRENCY,
+    CRAWL_HTTP_CACHE_PATH,
+    CRAWL_INITIAL_BACKOFF,
+    CRAWL_MAX_BACKOFF,
+    CRAWL_MAX_RETRIES,
+    CRAWL_PREFETCH_PAGES,
+    CRAWL_RATE_LIMIT,
+    CRAWL_REQUEST_TIMEOUT,
+    CRAWL_STREAM_FILENAME,
     EVENTS_LIST_PATH,
+    INDEX_NAME,
     INTERNSHIP_LIST_PATH,
     PARSER_RESULT_FILENAME,
 )
-from utils import remove_bad_words, save_json
+from src.crawl_delta import CrawlDelta
+from src.http_cache import HTTPCache
+from src.sanitizer import sanitize_document
+from src.schema import decode_event_positions, decode_listing
+from src.serialization import dumps, loads
+from src.storage import (
+    iter_documents,
+    resolve_documents_path,
+    write_documents,
+)
+from src.utils import backoff_delay
 
+# Статусы, при которых запрос повторяется с задержкой
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class RequestError(Exception):
+    """Сервер ответил статусом, отличным от 200"""
+
+    def __init__(self, uri: str, status: int) -> None:
+        super().__init__(f'Failed to fetch data: {status} ({uri})')
+        self.uri = uri
+        self.status = status
+
+
+class HostRateLimiter:
+    """Ограничение частоты запросов к каждому хосту"""
+
+    def __init__(self, rate: float = CRAWL_RATE_LIMIT) -> None:
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self._next_slot: dict[str, float] = {}
+
+    async def wait(self, uri: str) -> None:
+        """Ожидание очередного слота для запроса к хосту uri"""
+        host = urlsplit(uri).netloc
+        now = asyncio.get_running_loop().time()
+
+        # Слот резервируется до ожидания, поэтому конкурентные запросы
+        # к одному хосту расходятся не чаще чем раз в interval
+        slot = max(now, self._next_slot.get(host, now))
+        self._next_slot[host] = slot + self.interval
+
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class SingleFlight:
+    """
+    Однократное выполнение запросов в пределах обхода.
+
+    Одновременные вызовы с одним ключом ждут один общий запрос,
+    успешный результат запоминается до конца обхода. Ошибки
+    не запоминаются, следующий вызов повторит запрос.
+    """
 
-class InternshipsParser:
     def __init__(self) -> None:
-        self.__session: aiohttp.ClientSession | None = None
+        self._results: dict[str, Any] = {}
+        self._in_flight: dict[str, asyncio.Task] = {}
+        # Счетчики: запросы, результаты из памяти, присоединения к запросу
+        self.stats: Counter[str] = Counter()
 
-    async def get_total_data(self) -> dict[str, Any]:
-        unique_uuids = set()
-        total_data = []
+    async def do(
+        self,
+        key: str,
+        func: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        if key in self._results:
+            self.stats['memo_hits'] += 1
+            return self._results[key]
 
-        page = 1
-        while True:
-            data = await self.get_data_by_page(page)
-            current_page_uuids: set = {row['uuid'] for row in data}
-            new_uuids = current_page_uuids - unique_uuids
-            if not new_uuids:
-                break
-            unique_uuids.update(current_page_uuids)
-
-            logging.info(
-                f'Новые найденные стажировки, на странице {page}: '
-                f'{len(new_uuids)} (всего {len(unique_uuids)})',
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.stats['coalesced'] += 1
+        else:
+            self.stats['calls'] += 1
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+            task.add_done_callback(
+                lambda done: self._on_done(key, done),
             )
-            total_data.extend(data)
-            page += 1
 
+        # shield: отмена одного из ожидающих не отменяет общий запрос
+        return await asyncio.shield(task)
+
+    def _on_done(self, key: str, task: asyncio.Task) -> None:
+        self._in_flight.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self._results[key] = task.result()
+
+
+class CrawlCheckpoint:
+    """
+    Потоковая запись результатов обхода и точка восстановления.
+
+    Стажировки дописываются в JSONL файл постранично, после каждой
+    страницы в файл контрольной точки сохраняются номер следующей
+    страницы и количество записанных строк. Прерванный обход
+    продолжается со следующей страницы, недописанный хвост JSONL файла
+    отбрасывается.
+    """
+
+    def __init__(
+        self,
+        stream_path: str = CRAWL_STREAM_FILENAME,
+        checkpoint_path: str = CRAWL_CHECKPOINT_FILENAME,
+    ) -> None:
+        self.stream_path = stream_path
+        self.checkpoint_path = checkpoint_path
+        self.rows = 0
+
+    def restore(self) -> tuple[int, set[str]]:
+        """
+        Восстановление состояния прерванного обхода.
+
+        Returns:
+            Номер страницы, с которой продолжается обход,
+            и uuid уже записанных стажировок
+        """
+        if not (
+            os.path.exists(self.checkpoint_path)
+            and os.path.exists(self.stream_path)
+        ):
+            self.reset()
+            return 1, set()
+
+        with open(self.checkpoint_path, encoding='utf-8') as f:
+            checkpoint = loads(f.read())
+
+        seen_uuids = set()
+        with open(self.stream_path, 'r+', encoding='utf-8') as f:
+            for _ in range(checkpoint['rows']):
+                seen_uuids.add(loads(f.readline())['uuid'])
+            f.truncate(f.tell())
+
+        self.rows = checkpoint['rows']
+        logging.info(
+            f'Продолжаем прерванный обход со страницы '
+            f'{checkpoint["next_page"]} (уже собрано {self.rows})',
+        )
+        return checkpoint['next_page'], seen_uuids
+
+    def reset(self) -> None:
+        """Начало обхода с нуля"""
+        open(self.stream_path, 'w').close()
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        self.rows = 0
+
+    def append(self, page: int, rows: list[dict[str, Any]]) -> None:
+        """Запись стажировок страницы page и сохранение контрольной точки"""
+        with open(self.stream_path, 'a', encoding='utf-8') as f:
+            for row in rows:
+                f.write(dumps(row) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.rows += len(rows)
+
+        # Файл точки заменяется атомарно, чтобы не оставить его пустым
+        tmp_path = f'{self.checkpoint_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(dumps({'next_page': page + 1, 'rows': self.rows}))
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def finish(self) -> Iterator[dict[str, Any]]:
+        """Завершение обхода: удаление точки и чтение всех результатов"""
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        return iter_documents(self.stream_path)
+
+
+class InternshipsParser:
+    def __init__(
+        self,
+        concurrency: int = CRAWL_CONCURRENCY,
+        prefetch_pages: int = CRAWL_PREFETCH_PAGES,
+        rate_limit: float = CRAWL_RATE_LIMIT,
+        max_retries: int = CRAWL_MAX_RETRIES,
+        initial_backoff: float = CRAWL_INITIAL_BACKOFF,
+        http_cache: HTTPCache | None = None,
+    ) -> None:
+        """
+        Args:
+            concurrency: Максимальное количество одновременных запросов
+            prefetch_pages: Сколько следующих страниц списка стажировок
+                загружается заранее
+            rate_limit: Максимум запросов в секунду к одному хосту
+            max_retries: Количество повторов при 429/5xx и сетевых ошибках
+            initial_backoff: Начальная задержка перед повтором, секунды
+            http_cache: Кеш ответов для условных запросов
+                (If-None-Match/If-Modified-Since)
+        """
+        self.__session: aiohttp.ClientSession | None = None
+        self.__semaphore = asyncio.Semaphore(concurrency)
+        self.__rate_limiter = HostRateLimiter(rate_limit)
+        self.prefetch_pages = prefetch_pages
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.http_cache = http_cache
+        # Несколько публикаций могут ссылаться на одно событие
+        self.events = SingleFlight()
+        # Счетчики запросов: requests, not_modified, retries
+        self.stats: Counter[str] = Counter()
+
+    async def get_total_data(self) -> list[dict[str, Any]]:
+        total_data = []
+        async for _, data in self.iter_pages():
+            total_data.extend(data)
         return total_data
 
+    async def iter_pages(
+        self,
+        start_page: int = 1,
+        seen_uuids: set[str] | None = None,
+    ) -> AsyncIterator[tuple[int, list[dict[str, Any]]]]:
+        """
+        Постраничный обход списка стажировок.
+
+        Следующие prefetch_pages страниц загружаются, пока обрабатывается
+        текущая. Обход заканчивается на странице без новых стажировок.
+
+        Args:
+            start_page: Страница, с которой начинается обход
+            seen_uuids: uuid уже собранных стажировок (при продолжении
+                прерванного обхода)
+
+        Yields:
+            Номер страницы и новые стажировки на ней
+        """
+        unique_uuids = seen_uuids if seen_uuids is not None else set()
+        pending: deque[tuple[int, asyncio.Task]] = deque()
+        next_page = start_page
+
+        try:
+            while True:
+                while len(pending) <= self.prefetch_pages:
+                    pending.append((
+                        next_page,
+                        asyncio.create_task(self.get_data_by_page(next_page)),
+                    ))
+                    next_page += 1
+
+                page, task = pending.popleft()
+                data = await task
+
+                new_data = []
+                for row in data:
+                    if row['uuid'] not in unique_uuids:
+                        unique_uuids.add(row['uuid'])
+                        new_data.append(row)
+                if not new_data:
+                    break
+
+                logging.info(
+                    f'Новые найденные стажировки, на странице {page}: '
+                    f'{len(new_data)} (всего {len(unique_uuids)})',
+                )
+                yield page, new_data
+        finally:
+            for _, task in pending:
+                task.cancel()
+            await asyncio.gather(
+                *(task for _, task in pending),
+                return_exceptions=True,
+            )
+
     async def get_data_by_page(self, page: int) -> list[dict[str, Any]]:
         result = await self.__send_request(
             f'{INTERNSHIP_LIST_PATH}?page={page}',
+            decode=decode_listing,
         )
-        result = result['data']
 
         if not result:
             return result
 
-        tasks = []
-        for item in result:
-            task = asyncio.create_task(self.__get_positions_data(item))
-            tasks.append(task)
-
-        await asyncio.gather(*tasks, return_exceptions=True)
+        # Количество одновременных запросов ограничено семафором
+        # в __send_request
+        await asyncio.gather(
+            *(self.__get_positions_data(item) for item in result),
+            return_exceptions=True,
+        )
 
         return result
 
@@ -64,11 +315,19 @@ class InternshipsParser:
         Приватный метод для получения данных о событии
         и добавления их в исходный элемент
         """
+        uri = f'{EVENTS_LIST_PATH}/{item["event"]}'
         try:
-            event_data = await self.__send_request(
-                f'{EVENTS_LIST_PATH}/{item["event"]}',
+            positions = await self.events.do(
+                uri,
+                lambda: self.__send_request(
+                    uri,
+                    decode=decode_event_positions,
+                ),
             )
-            item['positions'] = event_data['data']['positions']
+            # Результат общий для всех публикаций события, а документы
+            # потом изменяются на месте (sanitize_document), поэтому
+            # каждая публикация получает свою копию
+            item['positions'] = copy.deepcopy(positions)
         except Exception:
             item['positions'] = None
 
@@ -76,6 +335,7 @@ class InternshipsParser:
         connector = aiohttp.TCPConnector(ssl=False)
         self.__session = aiohttp.ClientSession(
             connector=connector,
+            timeout=aiohttp.ClientTimeout(total=CRAWL_REQUEST_TIMEOUT),
         )
         return self
 
@@ -83,19 +343,29 @@ class InternshipsParser:
         if self.__session:
             await self.__session.close()
 
-    async def __send_request(self, uri: str) -> dict[str, Any]:
+    async def __send_request(
+        self,
+        uri: str,
+        decode: Callable[[bytes], Any] = loads,
+    ) -> Any:
         """
-        Приватный метод для отправки запросов
+        Приватный метод для отправки запросов.
+
+        При ответах 429/5xx и сетевых ошибках запрос повторяется
+        с экспоненциальной задержкой и джиттером (или через Retry-After,
+        если сервер его указал). При наличии кеша запрос отправляется
+        условным, и на ответ 304 возвращается сохраненное тело.
 
         Args:
             uri: URI для запроса
+            decode: Функция разбора тела ответа (по умолчанию JSON)
 
         Returns:
-            dict[str, Any]: Ответ в формате JSON
+            Any: Разобранный ответ
 
         Raises:
             RuntimeError: Если сессия не инициализирована
-            Exception: Если запрос не удался
+            RequestError: Если запрос не удался
         """
         if not self.__session:
             raise RuntimeError(
@@ -103,17 +373,137 @@ class InternshipsParser:
                 "Use 'async with' to manage the session.",
             )
 
-        async with self.__session.get(uri) as response:
-            if response.status == 200:
-                return await response.json()
-            raise Exception(f'Failed to fetch data: {response.status}')
+        cached = self.http_cache.get(uri) if self.http_cache else None
+        headers = HTTPCache.conditional_headers(cached)
+
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            await self.__rate_limiter.wait(uri)
+            try:
+                async with (
+                    self.__semaphore,
+                    self.__session.get(uri, headers=headers) as response,
+                ):
+                    self.stats['requests'] += 1
+                    if response.status == 304 and cached is not None:
+                        # Ресурс не изменился с прошлого обхода
+                        self.stats['not_modified'] += 1
+                        return decode(cached.body)
+                    if response.status == 200:
+                        body = await response.read()
+                        if self.http_cache is not None:
+                            self.http_cache.set(
+                                uri,
+                                body,
+                                response.headers.get('ETag'),
+                                response.headers.get('Last-Modified'),
+                            )
+                        return decode(body)
+
+                    error = RequestError(uri, response.status)
+                    if response.status not in RETRYABLE_STATUSES:
+                        raise error
+                    retry_after = response.headers.get('Retry-After')
+            except (aiohttp.ClientError, TimeoutError) as exc:
+                error = exc
+
+            if attempt == self.max_retries:
+                raise error
+
+            delay = min(
+                backoff_delay(attempt, self.initial_backoff),
+                CRAWL_MAX_BACKOFF,
+            )
+            if retry_after is not None and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+
+            logging.warning(
+                f'Запрос {uri} не удался ({error}), '
+                f'повтор через {delay:.1f} с',
+            )
+            self.stats['retries'] += 1
+            await asyncio.sleep(delay)
+
+
+async def start_parsing(
+    resume: bool = True,
+    use_http_cache: bool = True,
+) -> str:
+    """
+    Обход сайта со стажировками.
+
+    Результаты пишутся на диск по мере получения, прерванный обход
+    продолжается с контрольной точки.
+
+    Args:
+        resume: Продолжать прерванный обход, а не начинать заново
+        use_http_cache: Отправлять условные запросы, чтобы не скачивать
+            заново страницы и события, не изменившиеся с прошлого обхода
+
+    Returns:
+        Путь к файлу со всеми собранными стажировками
+        (читается через iter_documents)
+    """
+    checkpoint = CrawlCheckpoint()
+    if resume:
+        start_page, seen_uuids = checkpoint.restore()
+    else:
+        checkpoint.reset()
+        start_page, seen_uuids = 1, set()
+
+    http_cache = HTTPCache(CRAWL_HTTP_CACHE_PATH) if use_http_cache else None
+    try:
+        async with InternshipsParser(http_cache=http_cache) as parser:
+            async for page, data in parser.iter_pages(start_page, seen_uuids):
+                checkpoint.append(
+                    page,
+                    [sanitize_document(row) for row in data],
+                )
+    finally:
+        if http_cache is not None:
+            http_cache.close()
+
+    logging.info(
+        f'Обход завершен: запросов {parser.stats["requests"]}, '
+        f'не изменилось {parser.stats["not_modified"]}, '
+        f'повторов {parser.stats["retries"]}; '
+        f'событий загружено {parser.events.stats["calls"]}, '
+        f'взято из памяти {parser.events.stats["memo_hits"]}, '
+        f'объединено запросов {parser.events.stats["coalesced"]}',
+    )
+
+    write_documents(PARSER_RESULT_FILENAME, checkpoint.finish())
+
+    return PARSER_RESULT_FILENAME
+
+
+async def start_incremental_parsing(resume: bool = True) -> CrawlDelta:
+    """
+    Повторный обход с вычислением изменений относительно предыдущего.
+
+    Returns:
+        Добавленные, измененные и удаленные стажировки
+    """
+    # Хеши предыдущего обхода читаются до того, как новый обход
+    # перезапишет файл с результатами
+    previous_path = resolve_documents_path()
+    previous_hashes = (
+        CrawlDelta.snapshot_hashes(iter_documents(previous_path))
+        if previous_path is not None
+        else {}
+    )
+    current_path = await start_parsing(resume=resume)
 
+    delta = CrawlDelta.from_hashes(
+        previous_hashes,
+        iter_documents(current_path),
+    )
+    logging.info(f'Изменения каталога: {delta}')
+    return delta
 
-async def start_parsing() -> dict:
-    async with InternshipsParser() as parser:  # noqa: F821
-        parser_result = await parser.get_total_data()
 
-    parser_result = remove_bad_words(parser_result, BAD_WORDS)
-    save_json(PARSER_RESULT_FILENAME, parser_result)
+if __name__ == '__main__':
+    from src.elastic_search import apply_delta
 
-    return parser_result
+    logging.basicConfig(level=logging.INFO)
+    apply_delta(asyncio.run(start_incremental_parsing()), INDEX_NAME)
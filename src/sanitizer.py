@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import html
+import re
+from typing import Any
+
+# Текстовые поля документа, которые попадают в индекс и в оценку
+# релевантности. Остальные поля (идентификаторы, ссылки, даты)
+# не изменяются.
+TEXT_FIELD_PATHS = (
+    'title',
+    'description',
+    'slogan',
+    'seo_title',
+    'seo_description',
+    'tags.caption',
+    'tags.seo_title',
+    'tags.seo_description',
+    'company.caption',
+    'company.seo_title',
+    'company.seo_description',
+    'company.description.blocks.data.text',
+    'company.directions.caption',
+    'company.industries.name',
+    'publication_type.name',
+    'direction.caption',
+    'positions.name',
+    'positions.description.blocks.data.text',
+    'positions.description.blocks.data.items',
+    'positions.spheres.caption',
+    'positions.cities.caption',
+)
+
+# Теги, разделяющие строки и блоки текста, заменяются пробелом,
+# остальные (b, i, a, span, ...) удаляются
+_BLOCK_TAG_PATTERN = re.compile(
+    r'</?(?:br|p|div|li|ul|ol|h[1-6]|tr|td|th|table)\b[^>]*>',
+    re.IGNORECASE,
+)
+_TAG_PATTERN = re.compile(r'</?[a-zA-Z][^>]*>|<!--.*?-->', re.DOTALL)
+_SPACES_PATTERN = re.compile(r'[ \t\xa0]{2,}|\xa0')
+
+
+def _build_field_tree(paths: tuple[str, ...]) -> dict[str, Any]:
+    tree: dict[str, Any] = {}
+    for path in paths:
+        *parents, leaf = path.split('.')
+        node = tree
+        for key in parents:
+            node = node.setdefault(key, {})
+        node[leaf] = True
+    return tree
+
+
+_FIELD_TREE = _build_field_tree(TEXT_FIELD_PATHS)
+
+
+def clean_text(text: str) -> str:
+    """
+    Очистка текста от HTML: удаление тегов, декодирование сущностей
+    (&nbsp;, &amp;, ...) и схлопывание повторяющихся пробелов
+    """
+    if '<' in text:
+        text = _BLOCK_TAG_PATTERN.sub(' ', text)
+        text = _TAG_PATTERN.sub('', text)
+    if '&' in text:
+        text = html.unescape(text)
+    return _SPACES_PATTERN.sub(' ', text).strip()
+
+
+def _clean_value(value: Any) -> Any:
+    if isinstance(value, str):
+        return clean_text(value)
+    if isinstance(value, list):
+        return [_clean_value(item) for item in value]
+    return value
+
+
+def _sanitize_node(node: Any, tree: dict[str, Any]) -> None:
+    if isinstance(node, list):
+        for item in node:
+            _sanitize_node(item, tree)
+        return
+    if not isinstance(node, dict):
+        return
+
+    for key, subtree in tree.items():
+        value = node.get(key)
+        if value is None:
+            continue
+        if subtree is True:
+            node[key] = _clean_value(value)
+        else:
+            _sanitize_node(value, subtree)
+
+
+def sanitize_document(document: dict[str, Any]) -> dict[str, Any]:
+    """
+    Очистка текстовых полей документа стажировки (TEXT_FIELD_PATHS)
+    на месте.
+
+    Returns:
+        Тот же документ
+    """
+    _sanitize_node(document, _FIELD_TREE)
+    return document
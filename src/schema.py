@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+from typing import Any
+
+from src.serialization import loads
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Поля публикации и позиции, которые сохраняет парсер. Остальные поля
+# ответов API не используются индексом и оценкой и отбрасываются.
+# Поле, по которому ищет get_search_body или локальный BM25, должно
+# быть в этом списке (проверяется в tests/test_schema.py)
+PUBLICATION_FIELDS = (
+    'uuid',
+    'event',
+    'alias',
+    'title',
+    'description',
+    'slogan',
+    'seo_title',
+    'seo_description',
+    'seo_tags',
+    'publication_status',
+    'status',
+    'visibility',
+    'published_at',
+    'unpublished_at',
+    'last_position_end_date',
+    'company',
+    'tags',
+    'publication_type',
+    'direction',
+    'positions',
+)
+POSITION_FIELDS = (
+    'name',
+    'description',
+    'status',
+    'status_after',
+    'field_mode',
+    'cities',
+    'spheres',
+    'accepted_registrations_number',
+    'group',
+    'external_link',
+)
+
+
+if msgspec is not None:
+    from msgspec import UNSET, UnsetType
+
+    # Поля без значения по умолчанию UNSET: отсутствующее в ответе поле
+    # не появляется в результате, а null сохраняется как None
+
+    class Position(msgspec.Struct):
+        """Позиция события (стажировка внутри публикации)"""
+
+        name: str | None | UnsetType = UNSET
+        description: dict[str, Any] | None | UnsetType = UNSET
+        status: str | int | None | UnsetType = UNSET
+        status_after: str | int | None | UnsetType = UNSET
+        field_mode: str | int | None | UnsetType = UNSET
+        cities: list[dict[str, Any]] | None | UnsetType = UNSET
+        spheres: list[dict[str, Any]] | None | UnsetType = UNSET
+        accepted_registrations_number: int | None | UnsetType = UNSET
+        group: str | int | None | UnsetType = UNSET
+        external_link: str | None | UnsetType = UNSET
+
+    class Publication(msgspec.Struct):
+        """Публикация стажировки в том виде, в каком ее сохраняет парсер"""
+
+        uuid: str
+        event: int | str | None | UnsetType = UNSET
+        alias: str | None | UnsetType = UNSET
+        title: str | None | UnsetType = UNSET
+        description: str | None | UnsetType = UNSET
+        slogan: str | None | UnsetType = UNSET
+        seo_title: str | None | UnsetType = UNSET
+        seo_description: str | None | UnsetType = UNSET
+        seo_tags: Any = UNSET
+        publication_status: str | int | None | UnsetType = UNSET
+        status: str | int | None | UnsetType = UNSET
+        visibility: str | int | None | UnsetType = UNSET
+        published_at: str | None | UnsetType = UNSET
+        unpublished_at: str | None | UnsetType = UNSET
+        last_position_end_date: str | None | UnsetType = UNSET
+        company: dict[str, Any] | None | UnsetType = UNSET
+        tags: list[dict[str, Any]] | None | UnsetType = UNSET
+        publication_type: dict[str, Any] | None | UnsetType = UNSET
+        direction: dict[str, Any] | None | UnsetType = UNSET
+        # Позиции добавляет парсер из ответа события
+        positions: list[Position] | None | UnsetType = UNSET
+
+    class ListingResponse(msgspec.Struct):
+        """Страница списка публикаций (INTERNSHIP_LIST_PATH)"""
+
+        data: list[Publication]
+
+    class Event(msgspec.Struct):
+        """Событие публикации, из него берутся только позиции"""
+
+        positions: list[Position] | None = None
+
+    class EventResponse(msgspec.Struct):
+        """Ответ EVENTS_LIST_PATH/{event}"""
+
+        data: Event
+
+    _listing_decoder = msgspec.json.Decoder(ListingResponse)
+    _event_decoder = msgspec.json.Decoder(EventResponse)
+    _publications_decoder = msgspec.json.Decoder(list[Publication])
+
+
+def _select_position(position: dict[str, Any]) -> dict[str, Any]:
+    return {key: position[key] for key in POSITION_FIELDS if key in position}
+
+
+def _select_publication(publication: dict[str, Any]) -> dict[str, Any]:
+    selected = {
+        key: publication[key]
+        for key in PUBLICATION_FIELDS
+        if key in publication
+    }
+    if selected.get('positions'):
+        selected['positions'] = [
+            _select_position(position) for position in selected['positions']
+        ]
+    return selected
+
+
+def decode_listing(body: str | bytes) -> list[dict[str, Any]]:
+    """
+    Публикации со страницы списка.
+
+    С msgspec ответ проверяется по схеме ListingResponse при разборе,
+    иначе разбирается целиком выбранной реализацией JSON. В обоих
+    случаях остаются только поля PUBLICATION_FIELDS.
+    """
+    if msgspec is not None:
+        return msgspec.to_builtins(_listing_decoder.decode(body).data)
+    return [_select_publication(item) for item in loads(body)['data']]
+
+
+def decode_event_positions(body: str | bytes) -> list[dict[str, Any]] | None:
+    """
+    Позиции события (поля POSITION_FIELDS).
+
+    С msgspec остальные поля события пропускаются при разборе
+    и не создаются в памяти.
+    """
+    if msgspec is not None:
+        return msgspec.to_builtins(_event_decoder.decode(body).data.positions)
+
+    positions = loads(body)['data']['positions']
+    if positions is None:
+        return None
+    return [_select_position(position) for position in positions]
+
+
+def decode_publications(body: str | bytes) -> list[dict[str, Any]]:
+    """
+    Публикации из JSON-массива, например parser_result.json.
+
+    С msgspec каждая публикация и ее позиции проверяются по схемам
+    Publication и Position.
+    """
+    if msgspec is not None:
+        return msgspec.to_builtins(_publications_decoder.decode(body))
+    return [_select_publication(item) for item in loads(body)]
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import json
+import os
+from collections.abc import Callable
+from typing import Any, NamedTuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+class JSONBackend(NamedTuple):
+    """Реализация чтения и записи JSON"""
+
+    name: str
+    loads: Callable[[str | bytes], Any]
+    dumps: Callable[[Any], str]
+    dumps_pretty: Callable[[Any], str]
+
+
+def _json_backend() -> JSONBackend:
+    return JSONBackend(
+        name='json',
+        loads=json.loads,
+        dumps=lambda data: json.dumps(data, ensure_ascii=False),
+        dumps_pretty=lambda data: json.dumps(
+            data,
+            ensure_ascii=False,
+            indent=4,
+        ),
+    )
+
+
+def _orjson_backend() -> JSONBackend:
+    return JSONBackend(
+        name='orjson',
+        loads=orjson.loads,
+        dumps=lambda data: orjson.dumps(data).decode(),
+        # orjson поддерживает только отступ в 2 пробела
+        dumps_pretty=lambda data: orjson.dumps(
+            data,
+            option=orjson.OPT_INDENT_2,
+        ).decode(),
+    )
+
+
+def _msgspec_backend() -> JSONBackend:
+    encoder = msgspec.json.Encoder()
+    decoder = msgspec.json.Decoder()
+    return JSONBackend(
+        name='msgspec',
+        loads=decoder.decode,
+        dumps=lambda data: encoder.encode(data).decode(),
+        dumps_pretty=lambda data: msgspec.json.format(
+            encoder.encode(data),
+            indent=4,
+        ).decode(),
+    )
+
+
+def available_backends() -> dict[str, JSONBackend]:
+    """Установленные реализации JSON"""
+    backends = {'json': _json_backend()}
+    if orjson is not None:
+        backends['orjson'] = _orjson_backend()
+    if msgspec is not None:
+        backends['msgspec'] = _msgspec_backend()
+    return backends
+
+
+def get_backend(name: str | None = None) -> JSONBackend:
+    """
+    Реализация JSON по названию.
+
+    Args:
+        name: json, orjson, msgspec или auto (по умолчанию берется
+            из переменной окружения JSON_BACKEND). auto выбирает
+            orjson, затем msgspec, если они установлены, иначе json.
+
+    Returns:
+        Реализация JSON
+    """
+    name = name or os.getenv('JSON_BACKEND', 'auto')
+    backends = available_backends()
+
+    if name == 'auto':
+        for candidate in ('orjson', 'msgspec', 'json'):
+            if candidate in backends:
+                return backends[candidate]
+
+    if name not in backends:
+        raise ValueError(f'Реализация JSON недоступна: {name}')
+    return backends[name]
+
+
+_backend = get_backend()
+
+
+def loads(data: str | bytes) -> Any:
+    """Разбор JSON выбранной реализацией"""
+    return _backend.loads(data)
+
+
+def dumps(data: Any, pretty: bool = False) -> str:
+    """
+    Сериализация в JSON выбранной реализацией (без экранирования
+    не-ASCII символов)
+    """
+    if pretty:
+        return _backend.dumps_pretty(data)
+    return _backend.dumps(data)
@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import gzip
+import io
+import logging
+import os
+import sys
+from collections.abc import Iterable, Iterator
+from typing import IO, Any
+
+from src.constants import LEGACY_PARSER_RESULT_FILENAME, PARSER_RESULT_FILENAME
+from src.serialization import dumps, loads
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+def open_text(path: str, mode: str) -> IO[str]:
+    """
+    Открытие файла в текстовом режиме со сжатием по расширению:
+    .gz - gzip, .zst - zstd (нужен пакет zstandard)
+    """
+    if path.endswith('.gz'):
+        return gzip.open(path, f'{mode}t', encoding='utf-8', compresslevel=6)
+
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise ImportError(
+                'Для чтения и записи .zst файлов установите пакет zstandard',
+            )
+        binary = open(path, f'{mode}b')
+        if mode == 'r':
+            stream = zstandard.ZstdDecompressor().stream_reader(binary)
+        else:
+            stream = zstandard.ZstdCompressor().stream_writer(binary)
+        return io.TextIOWrapper(stream, encoding='utf-8')
+
+    return open(path, mode, encoding='utf-8')
+
+
+def iter_documents(path: str = PARSER_RESULT_FILENAME) -> Iterator[dict]:
+    """
+    Потоковое чтение стажировок без загрузки всего файла в память.
+
+    Поддерживаются JSON Lines (.jsonl, .jsonl.gz, .jsonl.zst) и старый
+    формат - JSON-массив (.json), который читается целиком.
+
+    Args:
+        path: Путь к файлу с результатами парсера
+
+    Yields:
+        Документы стажировок
+    """
+    if path.endswith('.json'):
+        with open(path, 'rb') as f:
+            yield from loads(f.read())
+        return
+
+    with open_text(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield loads(line)
+
+
+def write_documents(path: str, documents: Iterable[dict]) -> int:
+    """
+    Запись стажировок в JSON Lines (со сжатием по расширению).
+
+    Файл записывается во временный и затем заменяется, поэтому
+    при прерывании записи прежний файл остается целым.
+
+    Returns:
+        Количество записанных документов
+    """
+    # Расширение сохраняется, чтобы выбрать то же сжатие
+    directory, filename = os.path.split(path)
+    tmp_path = os.path.join(directory, f'.tmp.{filename}')
+
+    count = 0
+    with open_text(tmp_path, 'w') as f:
+        for document in documents:
+            f.write(dumps(document))
+            f.write('\n')
+            count += 1
+    os.replace(tmp_path, path)
+
+    return count
+
+
+def resolve_documents_path(path: str = PARSER_RESULT_FILENAME) -> str | None:
+    """
+    Путь к сохраненным результатам парсера.
+
+    Результаты в старом формате (parser_result.json) один раз
+    конвертируются в JSON Lines.
+
+    Returns:
+        Путь к файлу или None, если данных еще нет
+    """
+    if os.path.exists(path):
+        return path
+
+    if os.path.exists(LEGACY_PARSER_RESULT_FILENAME):
+        logging.info(
+            f'Конвертируем {LEGACY_PARSER_RESULT_FILENAME} в {path}...',
+        )
+        write_documents(path, iter_documents(LEGACY_PARSER_RESULT_FILENAME))
+        return path
+
+    return None
+
+
+class DocumentLookup:
+    """
+    Чтение стажировок по uuid без загрузки всего файла в память.
+
+    В памяти хранятся только смещения строк несжатого JSON Lines файла,
+    документ читается с диска при обращении.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.offsets: dict[str, int] = {}
+
+        offset = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    # Повторный uuid заменяет прежнюю версию документа
+                    self.offsets[loads(line)['uuid']] = offset
+                offset += len(line)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def get(self, doc_id: str) -> dict | None:
+        """Документ стажировки или None, если его нет в файле"""
+        offset = self.offsets.get(doc_id)
+        if offset is None:
+            return None
+
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return loads(f.readline())
+
+    @classmethod
+    def open(cls, path: str, cache_path: str) -> DocumentLookup:
+        """
+        Поиск по результатам парсера в любом формате (см. iter_documents).
+
+        Сжатый файл и старый формат нельзя читать по смещению, поэтому
+        они распаковываются в cache_path, когда копия устарела.
+        """
+        if path.endswith('.jsonl'):
+            return cls(path)
+
+        if (
+            not os.path.exists(cache_path)
+            or os.path.getmtime(cache_path) < os.path.getmtime(path)
+        ):
+            logging.info(f'Распаковываем {path} в {cache_path}...')
+            write_documents(cache_path, iter_documents(path))
+        return cls(cache_path)
+
+
+def flatten_document(document: dict[str, Any]) -> dict[str, Any]:
+    """Плоские поля стажировки, которые используют индексация и оценка"""
+    company = document.get('company') or {}
+    positions = document.get('positions') or []
+
+    position_texts = []
+    for position in positions:
+        blocks = (position.get('description') or {}).get('blocks') or []
+        for block in blocks:
+            data = block.get('data') or {}
+            if data.get('text') is not None:
+                position_texts.append(data['text'])
+            position_texts.extend(
+                item for item in data.get('items') or []
+                if isinstance(item, str)
+            )
+
+    return {
+        'uuid': document['uuid'],
+        'alias': document.get('alias'),
+        'title': document.get('title'),
+        'description': document.get('description'),
+        'slogan': document.get('slogan'),
+        'last_position_end_date': document.get('last_position_end_date'),
+        'company_caption': company.get('caption'),
+        'company_alias': company.get('alias'),
+        'publication_type': (document.get('publication_type') or {}).get(
+            'name',
+        ),
+        'tags': [tag.get('caption') for tag in document.get('tags') or []],
+        'position_names': [position.get('name') for position in positions],
+        'sphere_captions': [
+            sphere.get('caption')
+            for position in positions
+            for sphere in position.get('spheres') or []
+        ],
+        'position_texts': position_texts,
+    }
+
+
+def _parquet_schema() -> pa.Schema:
+    strings = pa.list_(pa.string())
+    return pa.schema([
+        ('uuid', pa.string()),
+        ('alias', pa.string()),
+        ('title', pa.string()),
+        ('description', pa.string()),
+        ('slogan', pa.string()),
+        ('last_position_end_date', pa.string()),
+        ('company_caption', pa.string()),
+        ('company_alias', pa.string()),
+        ('publication_type', pa.string()),
+        ('tags', strings),
+        ('position_names', strings),
+        ('sphere_captions', strings),
+        ('position_texts', strings),
+    ])
+
+
+def export_parquet(
+    path: str,
+    documents: Iterable[dict],
+    batch_size: int = 1000,
+) -> int:
+    """
+    Выгрузка плоских полей стажировок (см. flatten_document) в Parquet.
+
+    Документы записываются группами строк по batch_size, поэтому
+    весь набор не загружается в память. Нужен пакет pyarrow.
+
+    Returns:
+        Количество записанных документов
+    """
+    if pa is None:
+        raise ImportError('Для выгрузки в Parquet установите пакет pyarrow')
+
+    schema = _parquet_schema()
+    count = 0
+    batch = []
+
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        for document in documents:
+            batch.append(flatten_document(document))
+            count += 1
+            if len(batch) >= batch_size:
+                writer.write_table(pa.Table.from_pylist(batch, schema))
+                batch.clear()
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema))
+
+    return count
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2:
+        sys.exit('Использование: python -m src.storage <путь до .parquet>')
+
+    documents_path = resolve_documents_path()
+    if documents_path is None:
+        sys.exit('Результаты парсера не найдены, сначала запустите main.py')
+
+    exported = export_parquet(sys.argv[1], iter_documents(documents_path))
+    logging.info(f'Выгружено {exported} стажировок в {sys.argv[1]}')
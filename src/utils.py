@@ -1,23 +1,36 @@
 from __future__ import annotations
 
+import hashlib
 import json
+import random
 import re
 from datetime import datetime
+from functools import lru_cache
 from typing import Any
 
+from src.eval.category_matcher import (
+    categories_with_term,
+    match_categories,
+    ordered_categories,
+)
 from src.eval.tech_categories import TECH_CATEGORIES
 
 
-def load_json(file_path: str) -> dict:
-    """Загрузка данных из JSON-файла"""
-    with open(file_path, encoding='utf-8') as f:
-        return json.load(f)
+def backoff_delay(attempt: int, initial_backoff: float) -> float:
+    """Экспоненциальная задержка с джиттером перед повторной попыткой"""
+    return initial_backoff * 2**attempt * random.uniform(0.5, 1.5)
 
 
-def save_json(file_path: str, data: dict) -> None:
-    """Сохранение данных в JSON-файл"""
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+def compute_content_hash(data: dict) -> str:
+    """Хеш содержимого документа, не зависящий от порядка ключей"""
+    # Всегда stdlib json: хеш не должен зависеть от реализации JSON
+    serialized = json.dumps(
+        data,
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(',', ':'),
+    )
+    return hashlib.sha1(serialized.encode('utf-8')).hexdigest()
 
 
 def convert_to_iso_format(date_str: str) -> str:
@@ -62,35 +75,32 @@ def detect_tech_category(query: str) -> dict[str, list[str]]:
     """
     Определяет техническую категорию запроса для настройки поиска.
 
+    Результат кешируется по запросу в нижнем регистре.
+
     Args:
         query: Поисковый запрос
 
     Returns:
         Словарь категорий и связанных с ними терминов
     """
-    query_lower = query.lower()
-    query_variants = make_query_variants(query_lower)
-
-    result = {}
-
-    for category, terms in TECH_CATEGORIES.items():
-        if any(variant == category for variant in query_variants):
-            result[category] = terms
-            continue
+    return {
+        category: TECH_CATEGORIES[category]
+        for category in _detect_tech_categories(query.lower())
+    }
 
-        if any(variant in terms for variant in query_variants):
-            result[category] = terms
-            continue
 
-        if any(category in variant for variant in query_variants):
-            result[category] = terms
-            continue
+@lru_cache(maxsize=1024)
+def _detect_tech_categories(query_lower: str) -> tuple[str, ...]:
+    query_variants = make_query_variants(query_lower)
 
-        if any(term in query_lower for term in terms):
-            result[category] = terms
-            continue
+    # Вариант запроса совпадает с категорией или с одним из ее терминов,
+    # содержит название категории или запрос содержит ее термин
+    matched = set(match_categories(query_lower).by_term)
+    for variant in query_variants:
+        matched |= categories_with_term(variant)
+        matched |= match_categories(variant).by_key
 
-    return result
+    return tuple(ordered_categories(matched))
 
 
 def print_search_result(result: dict[str, Any], verbose: bool = False) -> None:
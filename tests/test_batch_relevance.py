@@ -0,0 +1,194 @@
+import pytest
+
+from src.eval.batch_relevance import BatchRelevanceLabeller
+from src.eval.relevance_calculator import RelevanceCalculator
+from src.eval.tech_categories import RELEVANCE_WEIGHTS
+from src.features import with_features
+
+QUERIES = [
+    'python',
+    'Python разработчик',
+    'java',
+    'front end',
+    'frontend',
+    'QA',
+    'тестировщик',
+    'data science',
+    'аналитик',
+    'hr',
+    'маркетинг',
+    '  ',
+]
+
+
+def _position(name=None, text=None, items=None, spheres=None):
+    position = {'name': name}
+    if text is not None:
+        block = {'type': 'paragraph', 'data': {'text': text}}
+        if items is not None:
+            block['data']['items'] = items
+        position['description'] = {'blocks': [block]}
+    if spheres is not None:
+        position['spheres'] = [{'caption': caption} for caption in spheres]
+    return position
+
+
+CORPUS = [
+    {
+        'title': 'Стажировка Python-разработчик',
+        'description': 'Backend на Python и Django',
+        'positions': [
+            _position(
+                'Python Developer',
+                'Пишем сервисы',
+                items=['FastAPI', 'PostgreSQL', 1],
+                spheres=['Разработка', 'Backend'],
+            ),
+        ],
+    },
+    {
+        'title': 'Java',
+        'description': 'Enterprise разработка',
+        'positions': [_position('Junior Java программист')],
+    },
+    {
+        'title': 'Стажировка во frontend',
+        'description': 'React, TypeScript, веб',
+        'positions': [
+            _position('Фронтенд-разработчик', spheres=['Frontend']),
+            _position('Верстальщик', 'HTML и CSS'),
+        ],
+    },
+    {
+        'title': 'Тестирование',
+        'description': 'Ручное и автоматизированное тестирование, QA',
+        'positions': [_position('QA Engineer', spheres=['Тестирование'])],
+    },
+    {
+        'title': 'Data Science и ML',
+        'description': 'Анализ данных, машинное обучение',
+        'positions': [_position('Аналитик данных', spheres=['Аналитика'])],
+    },
+    {
+        'title': 'HRs',
+        'description': 'Подбор персонала, hr',
+        'positions': [_position('HR-менеджер', spheres=['HR'])],
+    },
+    # Пустые и отсутствующие поля
+    {},
+    {'title': None, 'description': None, 'positions': None},
+    {'title': '', 'description': '', 'positions': []},
+    {
+        'title': 'Маркетинг',
+        'positions': [
+            _position(),
+            {'name': 'SMM', 'description': None, 'spheres': None},
+            {'name': 'Контент', 'description': {'blocks': None}},
+            {
+                'name': 'Бренд',
+                'description': {'blocks': [{'data': None}, {}]},
+                'spheres': [{'caption': None}, {}],
+            },
+        ],
+    },
+    {'description': 'Стажировка для разработчиков на python'},
+    # Запрос входит в заголовок только как часть слова
+    {'title': 'Pythonista', 'description': 'Javascripters'},
+]
+
+
+# Оценки исходного RelevanceCalculator (до пакетной разметки и признаков)
+# для документов CORPUS, которые он обрабатывал без ошибок
+BASELINE_SCORES = [
+    ('python', 0, 1.0),
+    ('python', 1, 0.6),
+    ('python', 2, 0.6),
+    ('python', 3, 0.0),
+    ('python', 10, 0.2),
+    ('python', 11, 0.3),
+    ('Python разработчик', 0, 0.6),
+    ('Python разработчик', 10, 0.0),
+    ('java', 0, 0.5),
+    ('java', 1, 1.0),
+    ('java', 2, 0.6),
+    ('java', 11, 0.09),
+    ('front end', 0, 0.5),
+    ('front end', 2, 0.6),
+    ('frontend', 2, 0.6),
+    ('QA', 3, 1.0),
+    ('тестировщик', 3, 0.0),
+    ('data science', 4, 0.5),
+    ('аналитик', 4, 1.0),
+    ('hr', 5, 1.0),
+    ('hr', 6, 0.0),
+    ('маркетинг', 8, 0.0),
+    ('  ', 0, 1.0),
+    ('  ', 5, 1.0),
+    ('  ', 6, 0.0),
+    ('  ', 8, 0.0),
+]
+
+
+def _results(sources):
+    return [
+        {'_id': str(idx), '_source': source}
+        for idx, source in enumerate(sources)
+    ]
+
+
+@pytest.mark.parametrize('precomputed', [False, True])
+def test_batch_labels_match_relevance_calculator(precomputed):
+    sources = (
+        [with_features(source) for source in CORPUS] if precomputed else CORPUS
+    )
+    queries_results = {query: _results(sources) for query in QUERIES}
+
+    labels = BatchRelevanceLabeller().label_results(queries_results)
+
+    expected = {
+        query: [
+            RelevanceCalculator.calculate_relevance(query, result)
+            for result in results
+        ]
+        for query, results in queries_results.items()
+    }
+    assert labels == expected
+
+
+def test_corpus_covers_tech_boosts():
+    scores = {
+        RelevanceCalculator.calculate_relevance(query, result)
+        * RELEVANCE_WEIGHTS['max_score']
+        for query in QUERIES
+        for result in _results(CORPUS)
+    }
+    # Набор проверяет совпадения по технической категории и сферам,
+    # а не только точные совпадения и нули
+    assert RELEVANCE_WEIGHTS['category_match'] in scores
+    assert RELEVANCE_WEIGHTS['sphere_match'] in scores
+    assert RELEVANCE_WEIGHTS['exact_position_match'] in scores
+    assert 0.0 in scores
+
+
+def test_results_without_id_and_source():
+    results = [{}, {'_source': CORPUS[0]}, {'_source': CORPUS[1]}]
+    labels = BatchRelevanceLabeller().label((('python', r) for r in results))
+    assert labels == [
+        RelevanceCalculator.calculate_relevance('python', result)
+        for result in results
+    ]
+
+
+@pytest.mark.parametrize(('query', 'idx', 'expected'), BASELINE_SCORES)
+@pytest.mark.parametrize('precomputed', [False, True])
+def test_scores_match_baseline(query, idx, expected, precomputed):
+    source = with_features(CORPUS[idx]) if precomputed else CORPUS[idx]
+    result = {'_id': str(idx), '_source': source}
+
+    assert RelevanceCalculator.calculate_relevance(
+        query,
+        result,
+    ) == pytest.approx(expected)
+    assert BatchRelevanceLabeller().label([(query, result)]) == [
+        pytest.approx(expected),
+    ]
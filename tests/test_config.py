@@ -0,0 +1,14 @@
+from src.config import get_search_body, get_tech_boost
+
+
+def test_tech_boost_is_not_shared_between_bodies():
+    first = get_search_body('python')
+    [*_, tech_boost] = first['query']['function_score']['functions']
+    tech_boost['filter']['multi_match']['fields'].append('seo_tags')
+    tech_boost['weight'] = 100
+
+    second = get_search_body('python')
+    [*_, tech_boost] = second['query']['function_score']['functions']
+    assert tech_boost == get_tech_boost('python')[0]
+    assert tech_boost['weight'] == 2.0
+    assert 'seo_tags' not in tech_boost['filter']['multi_match']['fields']
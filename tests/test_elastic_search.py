@@ -0,0 +1,112 @@
+import pytest
+
+from src import elastic_search
+from src.utils import compute_content_hash
+
+
+def _internship(uuid, title):
+    return {
+        'uuid': uuid,
+        'title': title,
+        'last_position_end_date': '2025-01-31 00:00:00',
+    }
+
+
+class FakeBulkIndexer:
+    runs = []
+
+    def __init__(self, client, index_name):
+        self.index_name = index_name
+
+    def run(self, actions):
+        actions = list(actions)
+        self.runs.append(actions)
+        return len(actions)
+
+
+class FakeCache:
+    invalidated = 0
+
+    def invalidate(self):
+        FakeCache.invalidated += 1
+
+
+@pytest.fixture
+def index(monkeypatch):
+    unchanged = _internship('same', 'Без изменений')
+    indexed = {
+        'same': (compute_content_hash(unchanged), None),
+        'changed': ('old-hash', None),
+        'removed': ('hash', None),
+    }
+    FakeBulkIndexer.runs = []
+    FakeCache.invalidated = 0
+    monkeypatch.setattr(elastic_search, 'BulkIndexer', FakeBulkIndexer)
+    monkeypatch.setattr(elastic_search, 'get_client', lambda: None)
+    monkeypatch.setattr(elastic_search, 'get_result_cache', FakeCache)
+    monkeypatch.setattr(
+        elastic_search,
+        'get_indexed_hashes',
+        lambda index_name: indexed,
+    )
+    return unchanged
+
+
+def test_sync_reads_documents_once(index):
+    documents = iter([
+        index,
+        _internship('changed', 'Новый заголовок'),
+        _internship('added', 'Новая стажировка'),
+    ])
+
+    assert elastic_search.sync_internships(documents, 'internships') == 3
+
+    [actions] = FakeBulkIndexer.runs
+    assert [(action.op_type, action.doc_id) for action in actions] == [
+        ('index', 'changed'),
+        ('index', 'added'),
+        ('delete', 'removed'),
+    ]
+    assert actions[0].source['content_hash'] == compute_content_hash(
+        _internship('changed', 'Новый заголовок'),
+    )
+    assert FakeCache.invalidated == 1
+
+
+def test_sync_skips_up_to_date_index(index, monkeypatch):
+    monkeypatch.setattr(
+        elastic_search,
+        'get_indexed_hashes',
+        lambda index_name: {'same': (compute_content_hash(index), None)},
+    )
+
+    assert elastic_search.sync_internships(iter([index]), 'internships') is None
+    assert FakeBulkIndexer.runs == []
+    assert FakeCache.invalidated == 0
+
+
+class FakeEmbeddingStore:
+    fingerprint = 'model'
+
+    def get(self, doc_id, content_hash=None):
+        return [0.5, 0.5]
+
+
+def test_sync_without_store_keeps_embeddings(index, monkeypatch):
+    indexed = {'same': (compute_content_hash(index), 'other-model')}
+    monkeypatch.setattr(
+        elastic_search,
+        'get_indexed_hashes',
+        lambda index_name: indexed,
+    )
+
+    assert elastic_search.sync_internships(iter([index]), 'internships') is None
+
+    elastic_search.sync_internships(
+        iter([index]),
+        'internships',
+        FakeEmbeddingStore(),
+    )
+    [[action]] = FakeBulkIndexer.runs
+    assert action.doc_id == 'same'
+    assert action.source['embedding_fingerprint'] == 'model'
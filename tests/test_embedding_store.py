@@ -0,0 +1,70 @@
+import numpy as np
+
+from src.bert.embedding_store import DocumentEmbeddingStore, model_fingerprint
+
+
+def test_model_fingerprint_depends_on_quantization(tmp_path):
+    checkpoint = tmp_path / 'model.pth'
+    checkpoint.write_bytes(b'weights')
+
+    fp32 = model_fingerprint(str(checkpoint))
+
+    assert model_fingerprint(str(checkpoint), quantized=False) == fp32
+    assert model_fingerprint(str(checkpoint), quantized=True) != fp32
+    assert model_fingerprint(None, quantized=True) != model_fingerprint(None)
+
+
+class FakeVectors:
+    def __init__(self, array):
+        self.array = array
+
+    def float(self):
+        return self
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+
+class FakeEngine:
+    """Эмбеддинг текста - его длина и количество слов"""
+
+    def __init__(self):
+        self.encoded = []
+
+    @staticmethod
+    def get_document_text(document):
+        return document['title']
+
+    def encode_texts(self, texts):
+        self.encoded.append(len(texts))
+        return FakeVectors(
+            np.array([[len(text), len(text.split())] for text in texts]),
+        )
+
+
+def test_build_streams_documents(tmp_path):
+    documents = iter([
+        {'uuid': 'a', 'title': 'один'},
+        {'uuid': 'b', 'title': 'два слова'},
+        {'uuid': 'a', 'title': 'новая версия а'},
+    ])
+    engine = FakeEngine()
+
+    store = DocumentEmbeddingStore.build(
+        str(tmp_path),
+        documents,
+        engine,
+        fingerprint='model',
+        dtype='float32',
+        batch_size=2,
+    )
+
+    assert engine.encoded == [2, 1]
+    assert len(store) == 2
+    assert store.fingerprint == 'model'
+    # Повторный uuid заменяет прежнюю версию документа
+    assert store.get('a').tolist() == [14, 3]
+    assert store.get('b').tolist() == [9, 2]
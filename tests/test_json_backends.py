@@ -0,0 +1,16 @@
+from src.bench.json_backends import benchmark, benchmark_artifact
+from src.storage import write_documents
+
+DOCUMENTS = [
+    {'uuid': 'a', 'title': 'Стажировка', 'positions': [{'name': 'QA'}]},
+    {'uuid': 'b', 'title': 'Python', 'positions': None},
+]
+
+
+def test_benchmarks_read_pipeline_output(tmp_path):
+    path = str(tmp_path / 'parser_result.jsonl.gz')
+    write_documents(path, DOCUMENTS)
+
+    for report in (benchmark(path, repeat=1), benchmark_artifact(path, 1)):
+        assert report
+        assert all(row['decode_ms'] >= 0 for row in report)
@@ -0,0 +1,46 @@
+import asyncio
+import subprocess
+import sys
+from pathlib import Path
+
+from src.parser import InternshipsParser
+from src.sanitizer import sanitize_document
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_parser_imports_as_package_module():
+    # Так модуль загружается при запуске python -m src.parser:
+    # в sys.path только корень репозитория, без каталога src
+    completed = subprocess.run(
+        [sys.executable, '-c', 'import src.parser'],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    assert completed.returncode == 0, completed.stderr
+
+
+def test_publications_of_one_event_get_separate_positions():
+    parser = InternshipsParser()
+    calls = []
+
+    async def send_request(uri, decode=None):
+        calls.append(uri)
+        if '?page=' in uri:
+            return [{'uuid': '1', 'event': 7}, {'uuid': '2', 'event': 7}]
+        return [{'name': 'Python &amp;lt;backend&amp;gt;'}]
+
+    parser._InternshipsParser__send_request = send_request
+    data = asyncio.run(parser.get_data_by_page(1))
+
+    # Событие загружается один раз
+    assert len(calls) == 2
+    assert data[0]['positions'] == data[1]['positions']
+    assert data[0]['positions'] is not data[1]['positions']
+
+    # Повторная очистка общих позиций не срабатывает
+    for row in data:
+        sanitize_document(row)
+    assert data[0]['positions'] == data[1]['positions']
+    assert data[0]['positions'][0]['name'] == 'Python &lt;backend&gt;'
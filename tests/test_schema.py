@@ -0,0 +1,230 @@
+import json
+import re
+
+import pytest
+
+from src import schema
+from src.config import SEARCH_TEMPLATE
+from src.local_search.bm25 import QUERY_CLAUSES, TECH_BOOST_FIELDS
+from src.sanitizer import TEXT_FIELD_PATHS
+
+PUBLICATION = {
+    'uuid': 'a1',
+    'event': 7,
+    'title': 'Стажировка Python',
+    'description': None,
+    'company': {'caption': 'Компания', 'alias': 'company'},
+    'tags': [{'caption': 'IT'}],
+    'last_position_end_date': '2025-01-31 00:00:00',
+    'unknown_field': 'не сохраняется',
+}
+POSITION = {
+    'name': 'Python-разработчик',
+    'spheres': [{'caption': 'Backend'}],
+    'accepted_registrations_number': 3,
+    'unknown_field': 1,
+}
+EXPECTED_PUBLICATION = {
+    'uuid': 'a1',
+    'event': 7,
+    'title': 'Стажировка Python',
+    'description': None,
+    'last_position_end_date': '2025-01-31 00:00:00',
+    'company': {'caption': 'Компания', 'alias': 'company'},
+    'tags': [{'caption': 'IT'}],
+}
+EXPECTED_POSITION = {
+    'name': 'Python-разработчик',
+    'spheres': [{'caption': 'Backend'}],
+    'accepted_registrations_number': 3,
+}
+
+# Публикация и событие в том виде, в каком их возвращает API, включая
+# поля, которые парсер не сохраняет
+REAL_PUBLICATION = {
+    'id': 101,
+    'uuid': 'b2',
+    'event': 55,
+    'alias': 'python-internship',
+    'title': 'Стажировка Python',
+    'description': 'Backend-разработка',
+    'slogan': 'Начни карьеру',
+    'seo_title': 'Стажировка Python в Компании',
+    'seo_description': 'Оплачиваемая стажировка',
+    'seo_tags': ['python', 'backend'],
+    'publication_status': 'published',
+    'status': 'active',
+    'visibility': 'public',
+    'published_at': '2025-01-01 00:00:00',
+    'unpublished_at': '2025-03-01 00:00:00',
+    'last_position_end_date': '2025-02-28 00:00:00',
+    'created_at': '2024-12-20 12:00:00',
+    'cover': {'url': 'https://example.com/cover.png'},
+    'company': {
+        'id': 9,
+        'caption': 'Компания',
+        'alias': 'company',
+        'seo_title': 'Компания - стажировки',
+        'seo_description': 'Стажировки в Компании',
+        'rating': 5,
+        'percentages': 0.8,
+        'logo': {'url': 'https://example.com/logo.png'},
+        'description': {
+            'blocks': [{'type': 'paragraph', 'data': {'text': 'О нас'}}],
+        },
+        'directions': [{'caption': 'IT', 'alias': 'it'}],
+        'industries': [{'name': 'Финтех'}],
+    },
+    'tags': [
+        {
+            'caption': 'Python',
+            'seo_title': 'Python',
+            'seo_description': 'Стажировки Python',
+            'seo_uri': 'python',
+        },
+    ],
+    'publication_type': {'name': 'Стажировка', 'alias': 'internship'},
+    'direction': {'caption': 'Разработка', 'alias': 'development'},
+}
+REAL_POSITION = {
+    'id': 12,
+    'name': 'Python-разработчик',
+    'description': {
+        'blocks': [
+            {
+                'type': 'list',
+                'data': {'text': 'Задачи', 'items': ['API', 'SQL']},
+            },
+        ],
+    },
+    'status': 'open',
+    'status_after': 'closed',
+    'field_mode': 'office',
+    'cities': [{'id': 1, 'caption': 'Москва'}],
+    'spheres': [{'id': 2, 'caption': 'Backend'}],
+    'accepted_registrations_number': 3,
+    'group': 'it',
+    'external_link': 'https://example.com/apply',
+    'created_at': '2024-12-20 12:00:00',
+}
+# Поля, которые выводит utils.print_search_result
+DISPLAY_PATHS = (
+    'title',
+    'description',
+    'slogan',
+    'alias',
+    'published_at',
+    'unpublished_at',
+    'company.caption',
+    'company.alias',
+    'company.description.blocks.data.text',
+    'positions.name',
+    'positions.external_link',
+)
+# Подполя маппинга с другим анализатором того же поля документа
+_SUBFIELD_PATTERN = re.compile(r'\.(?:ngram|shingle|keyword)$')
+
+LISTING = json.dumps({'data': [PUBLICATION]}).encode()
+EVENT = json.dumps({'data': {'id': 7, 'positions': [POSITION]}}).encode()
+ARTIFACT = json.dumps([{**PUBLICATION, 'positions': [POSITION]}]).encode()
+
+
+@pytest.fixture(params=['msgspec', 'fallback'])
+def backend(request, monkeypatch):
+    if request.param == 'msgspec':
+        pytest.importorskip('msgspec')
+    else:
+        monkeypatch.setattr(schema, 'msgspec', None)
+    return request.param
+
+
+def test_decode_listing(backend):
+    assert schema.decode_listing(LISTING) == [EXPECTED_PUBLICATION]
+
+
+def test_decode_event_positions(backend):
+    assert schema.decode_event_positions(EVENT) == [EXPECTED_POSITION]
+    empty = b'{"data": {"positions": null}}'
+    assert schema.decode_event_positions(empty) is None
+
+
+def test_decode_publications(backend):
+    assert schema.decode_publications(ARTIFACT) == [
+        {**EXPECTED_PUBLICATION, 'positions': [EXPECTED_POSITION]},
+    ]
+
+
+def test_structs_mirror_field_lists():
+    msgspec = pytest.importorskip('msgspec')
+    assert tuple(
+        field.name for field in msgspec.structs.fields(schema.Publication)
+    ) == schema.PUBLICATION_FIELDS
+    assert tuple(
+        field.name for field in msgspec.structs.fields(schema.Position)
+    ) == schema.POSITION_FIELDS
+
+
+def test_invalid_position_is_rejected():
+    msgspec = pytest.importorskip('msgspec')
+    body = json.dumps({'data': {'positions': [{'name': 1}]}})
+    with pytest.raises(msgspec.ValidationError):
+        schema.decode_event_positions(body)
+
+
+def _template_paths(node):
+    """Поля документа, по которым ищет шаблон запроса"""
+    if isinstance(node, list):
+        for item in node:
+            yield from _template_paths(item)
+        return
+    if not isinstance(node, dict):
+        return
+    for key, value in node.items():
+        if key == 'fields':
+            yield from (field.split('^')[0] for field in value)
+        elif key in {'match', 'exp'}:
+            yield from value
+        elif key == 'path':
+            yield value
+        else:
+            yield from _template_paths(value)
+
+
+def _searched_paths():
+    paths = {*_template_paths(SEARCH_TEMPLATE['query'])}
+    paths.update(
+        field
+        for _, fields in QUERY_CLAUSES
+        for field, _, _ in fields
+    )
+    paths.update(TECH_BOOST_FIELDS)
+    paths.update(TEXT_FIELD_PATHS)
+    paths.update(DISPLAY_PATHS)
+    return sorted({_SUBFIELD_PATTERN.sub('', path) for path in paths})
+
+
+def _values(node, keys):
+    if isinstance(node, list):
+        return [value for item in node for value in _values(item, keys)]
+    if not keys:
+        return [node] if node is not None else []
+    if not isinstance(node, dict) or keys[0] not in node:
+        return []
+    return _values(node[keys[0]], keys[1:])
+
+
+def test_searched_fields_survive_decoding(backend):
+    listing = json.dumps({'data': [REAL_PUBLICATION]})
+    event = json.dumps({'data': {'id': 55, 'positions': [REAL_POSITION]}})
+
+    [publication] = schema.decode_listing(listing)
+    publication['positions'] = schema.decode_event_positions(event)
+
+    paths = _searched_paths()
+    assert 'direction.caption' in paths
+    missing = [
+        path for path in paths if not _values(publication, path.split('.'))
+    ]
+    assert missing == []
+    assert 'id' not in publication
+    assert 'created_at' not in publication['positions'][0]
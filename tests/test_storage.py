@@ -0,0 +1,32 @@
+from src.storage import DocumentLookup, write_documents
+
+DOCUMENTS = [
+    {'uuid': 'a', 'title': 'Стажировка Python'},
+    {'uuid': 'b', 'title': 'Стажировка Go'},
+    {'uuid': 'a', 'title': 'Новая версия'},
+]
+
+
+def test_lookup_reads_documents_by_offset(tmp_path):
+    path = str(tmp_path / 'documents.jsonl')
+    write_documents(path, DOCUMENTS)
+
+    lookup = DocumentLookup.open(path, str(tmp_path / 'cache.jsonl'))
+
+    assert lookup.path == path
+    assert len(lookup) == 2
+    assert lookup.get('b') == DOCUMENTS[1]
+    assert lookup.get('a') == DOCUMENTS[2]
+    assert lookup.get('missing') is None
+
+
+def test_lookup_unpacks_compressed_documents(tmp_path):
+    path = str(tmp_path / 'documents.jsonl.gz')
+    cache_path = str(tmp_path / 'cache.jsonl')
+    write_documents(path, DOCUMENTS)
+
+    lookup = DocumentLookup.open(path, cache_path)
+
+    assert lookup.path == cache_path
+    assert 'b' in lookup
+    assert lookup.get('b') == DOCUMENTS[1]
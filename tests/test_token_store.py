@@ -0,0 +1,54 @@
+import os
+
+from src.bert.token_store import TokenStore
+
+
+class FakeTokenizer:
+    name_or_path = 'fake'
+
+    def __init__(self):
+        self.calls = 0
+
+    def __len__(self):
+        return 100
+
+    def __call__(self, texts, truncation, max_length):
+        self.calls += 1
+        return {
+            'input_ids': [
+                [len(word) for word in text.split()][:max_length]
+                for text in texts
+            ],
+        }
+
+
+def test_load_or_build_reuses_store(tmp_path):
+    tokenizer = FakeTokenizer()
+    texts = ['a bb ccc', 'dddd']
+
+    store = TokenStore.load_or_build(str(tmp_path), 'train', texts, tokenizer)
+    assert store[0].tolist() == [1, 2, 3]
+    assert store.lengths().tolist() == [3, 1]
+
+    TokenStore.load_or_build(str(tmp_path), 'train', texts, tokenizer)
+    assert tokenizer.calls == 1
+
+
+def test_load_or_build_replaces_stale_store(tmp_path):
+    tokenizer = FakeTokenizer()
+    TokenStore.load_or_build(str(tmp_path), 'train', ['a bb'], tokenizer)
+    TokenStore.load_or_build(str(tmp_path), 'val', ['ccc'], tokenizer)
+
+    store = TokenStore.load_or_build(
+        str(tmp_path),
+        'train',
+        ['dddd eeeee'],
+        tokenizer,
+    )
+
+    assert store[0].tolist() == [4, 5]
+    # Устаревшее хранилище заменено, хранилище другой выборки сохранено
+    assert sorted(os.listdir(tmp_path)) == ['train', 'val']
+    val = TokenStore.load_or_build(str(tmp_path), 'val', ['ccc'], tokenizer)
+    assert val[0].tolist() == [3]
+    assert tokenizer.calls == 3
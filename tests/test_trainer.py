@@ -0,0 +1,49 @@
+import pytest
+
+torch = pytest.importorskip('torch')
+pytest.importorskip('sklearn')
+pytest.importorskip('tqdm')
+pytest.importorskip('transformers')
+
+from src.bert.dataset import pad_collate  # noqa: E402
+from src.bert.trainer import batch_loss  # noqa: E402
+
+
+class FakeRanker(torch.nn.Module):
+    """Оценки shape (n, 1), как у BERTSearchEngineFitter"""
+
+    def __init__(self):
+        super().__init__()
+        self.linear = torch.nn.Linear(1, 1)
+
+    def forward(
+        self,
+        query_input_ids,
+        query_attention_mask,
+        text_input_ids,
+        text_attention_mask,
+        query_index=None,
+    ):
+        lengths = text_attention_mask.sum(dim=1, keepdim=True).float()
+        return torch.sigmoid(self.linear(lengths))
+
+
+def _item(query_id, text_length, label):
+    return {
+        'query_id': query_id,
+        'query_input_ids': torch.tensor([101, 5, 102]),
+        'text_input_ids': torch.arange(1, text_length + 1),
+        'label': torch.tensor(label, dtype=torch.float),
+    }
+
+
+@pytest.mark.parametrize('size', [1, 3])
+def test_batch_loss_shapes(size):
+    batch = pad_collate([_item(0, idx + 2, 1.0) for idx in range(size)])
+    model = FakeRanker()
+
+    loss = batch_loss(model, batch, torch.nn.BCELoss(), torch.device('cpu'))
+    loss.backward()
+
+    assert loss.shape == ()
+    assert model.linear.weight.grad is not None